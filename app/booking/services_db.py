@@ -6,6 +6,7 @@ from sqlalchemy import select, and_, or_, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.booking.models import Place, PlaceType, AdminMessage
+from app.services.hot_queries import VENUES_BY_TYPE, VENUES_BY_TYPE_AND_CITY
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -27,37 +28,28 @@ class VenueService:
             # Создаем базовый запрос с явным приведением типа к строке для надежности
             logger.info(f"Запрос заведений типа '{place_type}' - поиск по точному совпадению")
             
-            # Используем текстовый SQL для более точного контроля над запросом
-            query = text("""
-                SELECT * FROM dating_bot.places 
-                WHERE type = :place_type
-            """).bindparams(place_type=place_type)
-            
+            # Горячий запрос: SQL скомпилирован заранее и выполняется как подготовленное выражение
             if city:
-                query = text("""
-                    SELECT * FROM dating_bot.places 
-                    WHERE type = :place_type
-                    AND city ILIKE :city_pattern
-                """).bindparams(place_type=place_type, city_pattern=f"%{city}%")
-            
-            # Выполняем запрос
-            result = await session.execute(query)
-            rows = result.fetchall()
+                rows = await VENUES_BY_TYPE_AND_CITY.fetch(
+                    session, place_type=place_type, city_pattern=f"%{city}%"
+                )
+            else:
+                rows = await VENUES_BY_TYPE.fetch(session, place_type=place_type)
             logger.info(f"SQL запрос вернул {len(rows)} строк")
             
             # Преобразуем результаты в список словарей
             venues = []
             for row in rows:
                 venue_dict = {
-                    "id": row.id,
-                    "name": row.name,
-                    "url": row.link or "#",  # Используем поле link вместо url
-                    "city": row.city
+                    "id": row["id"],
+                    "name": row["name"],
+                    "url": row["link"] or "#",  # Используем поле link вместо url
+                    "city": row["city"]
                 }
                 
                 # Добавляем координаты, если они есть
-                if row.latitude and row.longitude:
-                    venue_dict["coordinates"] = (row.latitude, row.longitude)
+                if row["latitude"] and row["longitude"]:
+                    venue_dict["coordinates"] = (row["latitude"], row["longitude"])
                 
                 # У нас нет image_url в БД, но можно добавить статическое фото, если нужно
                 venue_dict["photo_url"] = None
@@ -66,13 +58,13 @@ class VenueService:
                 try:
                     # Получаем админское сообщение из базы данных с использованием SQLAlchemy
                     from app.booking.services_admin_message import AdminMessageService
-                    logger.info(f"[DEBUG] Запрос админского сообщения для заведения '{row.name}', город '{row.city}', тип '{place_type}'")
+                    logger.info(f"[DEBUG] Запрос админского сообщения для заведения '{row['name']}', город '{row['city']}', тип '{place_type}'")
                     
                     # Выводим типы параметров для отладки
-                    logger.info(f"[DEBUG] Типы параметров: city={type(row.city).__name__}, place_type={type(place_type).__name__}")
+                    logger.info(f"[DEBUG] Типы параметров: city={type(row['city']).__name__}, place_type={type(place_type).__name__}")
                     
                     # Проверяем наличие значения row.city
-                    city_value = row.city if row.city else "Unknown"
+                    city_value = row["city"] if row["city"] else "Unknown"
                     
                     admin_message = await AdminMessageService.get_admin_message(
                         session=session,
@@ -81,18 +73,18 @@ class VenueService:
                     )
                     
                     if admin_message:
-                        logger.info(f"Найдено админское сообщение для '{row.name}': {admin_message}")
+                        logger.info(f"Найдено админское сообщение для '{row['name']}': {admin_message}")
                         venue_dict["admin_message"] = admin_message
                     else:
-                        logger.info(f"Админское сообщение для '{row.name}' не найдено, проверяем тестовые данные")
+                        logger.info(f"Админское сообщение для '{row['name']}' не найдено, проверяем тестовые данные")
                         # Если в БД нет сообщения, ищем в тестовых данных как запасной вариант
                         from app.booking.handlers_fixed import default_venues
                         for test_venue in default_venues.get(place_type, []):
-                            if test_venue["name"] == row.name:
+                            if test_venue["name"] == row["name"]:
                                 venue_dict["admin_message"] = test_venue.get("admin_message", "")
-                                logger.info(f"Найдено тестовое сообщение для '{row.name}': {venue_dict['admin_message']}")
+                                logger.info(f"Найдено тестовое сообщение для '{row['name']}': {venue_dict['admin_message']}")
                 except (ImportError, AttributeError, Exception) as e:
-                    logger.error(f"Ошибка при получении админского сообщения для '{row.name}': {e}")
+                    logger.error(f"Ошибка при получении админского сообщения для '{row['name']}': {e}")
                     pass
                 
                 venues.append(venue_dict)
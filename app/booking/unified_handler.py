@@ -14,7 +14,7 @@ from aiogram import types, Dispatcher
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from app.database import get_session
+from app.database import get_session, read_session
 from app.booking.keyboards import create_place_keyboard, create_place_type_keyboard
 from app.booking.services_db import VenueService
 from app.booking.services_admin_message import AdminMessageService
@@ -185,7 +185,7 @@ async def process_place_type(callback_query: types.CallbackQuery, state: FSMCont
         # Get venues with safe error handling
         venues = []
         try:
-            async for session in get_session():
+            async for session in read_session():
                 try:
                     venues = await VenueService.get_venues_by_type_and_city(session, place_type, city)
                     logger.info(f"[PLACE_TYPE] Got {len(venues)} venues for {city}/{place_type}")
@@ -333,7 +333,7 @@ async def process_place(callback_query: types.CallbackQuery, state: FSMContext):
         
         # Get place details
         place_name = "Selected venue"  # Fallback name
-        async for session in get_session():
+        async for session in read_session():
             try:
                 place = await VenueService.get_venue_by_id(session, place_id)
                 if place:
@@ -1,15 +1,31 @@
 # файл: app/bot.py
 
+import time
+
+# Початок старту процесу бота (для розбивки часу старту по фазах)
+_STARTED = time.perf_counter()
+
 import asyncio
+import importlib
 import logging
 import sys
 import traceback
+from contextlib import contextmanager
 from aiogram import Bot, Dispatcher, types
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.utils.exceptions import BotBlocked, Unauthorized, InvalidQueryID, TelegramAPIError
 from app.config import TELEGRAM_BOT_TOKEN
 from app.database import init_db
-from app.cinema import register_cinema_handlers
+from app.instance_lock import instance_lock
+from app.services.seen_set import seen_sets
+from app.services.swipe_buffer import swipe_buffer
+from app.services.user_index import user_index
+from app.services.like_index import like_index
+from app.services.block_index import block_index
+from app.services.message_buffer import message_buffer
+from app.services.answer_vectors import answer_index
+from app.middlewares import LoaderMiddleware, SessionMiddleware, SqlStatsMiddleware
+from app.db_metrics import sql_stats
+from app.fsm_storage import create_storage, PostgresStorage
 
 # Configure logging
 logging.basicConfig(
@@ -23,21 +39,112 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-# Імпортуємо всі обробники
-from app.handlers.start import register_start_handlers
-from app.handlers.registration import register_registration_handlers
-from app.handlers.swipes import register_swipe_handlers
-from app.handlers.chat import register_chat_handlers
-from app.handlers.search_settings import register_search_settings_handlers
-from app.handlers.tokens import register_token_handlers
-from app.handlers.admin import register_admin_handlers
-from app.handlers.reservations import register_reservation_handlers
-from app.booking import register_booking_handlers, register_admin_venue_dialog_handlers, register_admin_venue_list_handlers, register_admin_message_handlers
+# Обробники у порядку реєстрації: (назва, модуль, функція реєстрації).
+# Модулі імпортуються ліниво — у фоновому потоці, поки йде ініціалізація бази
+HANDLER_MODULES = [
+    ("cinema_handlers", "app.cinema", "register_cinema_handlers"),
+    ("start_handlers", "app.handlers.start", "register_start_handlers"),
+    ("search_settings_handlers", "app.handlers.search_settings", "register_search_settings_handlers"),
+    ("registration_handlers", "app.handlers.registration", "register_registration_handlers"),
+    ("swipe_handlers", "app.handlers.swipes", "register_swipe_handlers"),
+    ("chat_handlers", "app.handlers.chat", "register_chat_handlers"),
+    ("token_handlers", "app.handlers.tokens", "register_token_handlers"),
+    ("admin_handlers", "app.handlers.admin", "register_admin_handlers"),
+    ("reservation_handlers", "app.handlers.reservations", "register_reservation_handlers"),
+    ("booking_handlers", "app.booking", "register_booking_handlers"),
+    ("admin_venue_dialog_handlers", "app.booking", "register_admin_venue_dialog_handlers"),
+    ("admin_venue_list_handlers", "app.booking", "register_admin_venue_list_handlers"),
+    ("admin_message_handlers", "app.booking", "register_admin_message_handlers"),
+]
+
+
+def import_handlers() -> list:
+    """
+    Імпортує модулі обробників. Повертає [(назва, функція або виняток)]
+    """
+    loaded = []
+    for handler_name, module_name, function_name in HANDLER_MODULES:
+        try:
+            module = importlib.import_module(module_name)
+            loaded.append((handler_name, getattr(module, function_name)))
+        except Exception as e:
+            loaded.append((handler_name, e))
+    return loaded
+
+
+class StartupTimer:
+    """
+    Тривалість фаз старту бота; фази можуть виконуватися паралельно
+    """
+
+    def __init__(self, started: float):
+        self.started = started
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def report(self) -> str:
+        parts = [f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases]
+        parts.append(f"total {(time.perf_counter() - self.started) * 1000:.0f} ms")
+        return ", ".join(parts)
+
+
+async def load_indexes():
+    """
+    Індекси в пам'яті: анкети з векторами відповідей і, паралельно, лайки та блокування.
+
+    Завантажуються у фоні, коли бот уже приймає апдейти: поки прапорець ready
+    індексу не виставлено, його споживачі звертаються до SQL
+    """
+    started = time.perf_counter()
+    async def load_profiles():
+        # Колоночный индекс анкет для подбора кандидатов без запросов к users
+        try:
+            await user_index.load()
+        except Exception as index_error:
+            logger.error(f"User index loading error, falling back to SQL feed: {index_error}")
+            return
+
+        # Векторы ответов анкеты для подбора совместимых кандидатов
+        try:
+            await answer_index.load()
+        except Exception as index_error:
+            logger.error(f"Answer index loading error, compatibility ranking disabled: {index_error}")
+
+    async def load_likes():
+        # Индекс лайков без ответа для мгновенной проверки взаимности
+        try:
+            await like_index.load()
+        except Exception as index_error:
+            logger.error(f"Like index loading error, falling back to SQL match check: {index_error}")
+
+    async def load_blocks():
+        # Блокировки в памяти для пересылки сообщений чата
+        try:
+            await block_index.load()
+        except Exception as index_error:
+            logger.error(f"Block index loading error, falling back to SQL block check: {index_error}")
+
+    await asyncio.gather(load_profiles(), load_likes(), load_blocks())
+    logger.info(f"In-memory indexes loaded in {(time.perf_counter() - started) * 1000:.0f} ms")
 
 bot = Bot(token=TELEGRAM_BOT_TOKEN)
-storage = MemoryStorage()
+# Состояния FSM в Postgres (общие для процессов, переживают рестарт) или в памяти
+storage = create_storage()
 dp = Dispatcher(bot, storage=storage)
 
+# Одна сессия БД на апдейт и пакетные загрузчики (users, фото, настройки)
+dp.middleware.setup(SessionMiddleware())
+dp.middleware.setup(LoaderMiddleware())
+# Учёт SQL по хендлерам и поиск N+1 (подключается последним, чтобы захватить commit апдейта)
+dp.middleware.setup(SqlStatsMiddleware())
+
 # Global error handler to prevent bot crashes
 @dp.errors_handler()
 async def errors_handler(update, exception):
@@ -101,14 +208,23 @@ async def errors_handler(update, exception):
 async def main():
     max_retries = 5
     retry_count = 0
+    timer = StartupTimer(_STARTED)
+    timer.phases.append(("imports", time.perf_counter() - _STARTED))
+    # Модулі обробників імпортуються паралельно з ініціалізацією бази
+    handlers_future = asyncio.get_running_loop().run_in_executor(None, import_handlers)
     
     while retry_count < max_retries:
         try:
             # Ініціалізація бази
             logger.info("Initializing database...")
             try:
-                await init_db()
+                with timer.phase("database"):
+                    await init_db()
                 logger.info("Database initialized successfully")
+
+                # Індекси й буфери живуть у процесі — з базою працює лише один процес бота
+                with timer.phase("instance lock"):
+                    await instance_lock.acquire()
             except Exception as db_error:
                 logger.critical(f"Database initialization error: {db_error}")
                 logger.critical(traceback.format_exc())
@@ -120,51 +236,71 @@ async def main():
             # Реєстрація обробників (each handler registration wrapped individually)
             logger.info("Registering handlers...")
             
-            handler_registrations = [
-                ("start_handlers", register_start_handlers),
-                ("search_settings_handlers", register_search_settings_handlers),
-                ("registration_handlers", register_registration_handlers),
-                ("swipe_handlers", register_swipe_handlers),
-                ("chat_handlers", register_chat_handlers),
-                ("token_handlers", register_token_handlers),
-                ("admin_handlers", register_admin_handlers),
-                ("reservation_handlers", register_reservation_handlers),
-                ("booking_handlers", register_booking_handlers),
-                ("admin_venue_dialog_handlers", register_admin_venue_dialog_handlers),
-                ("admin_venue_list_handlers", register_admin_venue_list_handlers),
-                ("admin_message_handlers", register_admin_message_handlers)
-            ]
-            
-            # Регистрация хендлеров кинотеатра
-            try:
-                register_cinema_handlers(dp)
-                logger.info("✅ cinema_handlers registered successfully")
-            except Exception as e:
-                logger.error(f"❌ Error registering cinema_handlers: {e}")
-                logger.error(traceback.format_exc())
-            
-            for handler_name, handler_func in handler_registrations:
-                try:
-                    handler_func(dp)
-                    logger.info(f"✅ {handler_name} registered successfully")
-                except Exception as handler_error:
-                    logger.error(f"❌ Error registering {handler_name}: {handler_error}")
-                    logger.error(traceback.format_exc())
+            with timer.phase("handlers"):
+                handler_registrations = await handlers_future
+                for handler_name, handler_func in handler_registrations:
+                    if isinstance(handler_func, Exception):
+                        logger.error(f"❌ Error importing {handler_name}: {handler_func}")
+                        continue
+                    try:
+                        handler_func(dp)
+                        logger.info(f"✅ {handler_name} registered successfully")
+                    except Exception as handler_error:
+                        logger.error(f"❌ Error registering {handler_name}: {handler_error}")
+                        logger.error(traceback.format_exc())
             
             logger.info("Handler registration completed")
 
+            # Кеш и фоновая запись состояний FSM
+            if isinstance(storage, PostgresStorage):
+                await storage.start()
+
+            # Індекси в пам'яті завантажуються у фоні, не затримуючи старт опитування
+            indexes_task = asyncio.create_task(load_indexes())
+            # Якщо блокування процесу перехопив інший процес — зупиняємо опитування
+            lock_task = asyncio.create_task(instance_lock.run_watchdog(dp.stop_polling))
+
+            # Периодическое сохранение снимков просмотренных анкет и запись буфера свайпов
+            snapshot_task = asyncio.create_task(seen_sets.run_snapshot_loop())
+            swipe_flush_task = asyncio.create_task(swipe_buffer.run_flush_loop())
+            # Пакетная запись сообщений чата
+            message_flush_task = asyncio.create_task(message_buffer.run_flush_loop())
+            # Периодическая сводка SQL по хендлерам
+            sql_stats_task = asyncio.create_task(sql_stats.run_log_loop())
+            # Секции сообщений наперёд и архивирование старых месяцев
+            from app.message_partitions import run_maintenance_loop
+            partitions_task = asyncio.create_task(run_maintenance_loop())
+
             # Log the start of the bot
+            logger.info(f"Startup time: {timer.report()}")
             logger.info("Starting bot with error recovery settings...")
             
             # Запуск бота с параметрами для автоматического восстановления после ошибок
             # Версія aiogram 2.25.1 
-            await dp.start_polling(
-                reset_webhook=True, 
-                timeout=30,      # Timeout for long polling
-                relax=0.1,       # Time between requests
-                fast=True,       # Skip old updates
-                allowed_updates=types.AllowedUpdates.all()  # Process all update types
-            )
+            try:
+                await dp.start_polling(
+                    reset_webhook=True, 
+                    timeout=30,      # Timeout for long polling
+                    relax=0.1,       # Time between requests
+                    fast=True,       # Skip old updates
+                    allowed_updates=types.AllowedUpdates.all()  # Process all update types
+                )
+            finally:
+                indexes_task.cancel()
+                lock_task.cancel()
+                snapshot_task.cancel()
+                swipe_flush_task.cancel()
+                message_flush_task.cancel()
+                sql_stats_task.cancel()
+                partitions_task.cancel()
+                # Свайпы из буфера записываем до снимков, чтобы не потерять их при остановке
+                await swipe_buffer.flush()
+                await message_buffer.flush()
+                if isinstance(storage, PostgresStorage):
+                    await storage.close()
+                await seen_sets.save_snapshots()
+                # Наступний процес стартує лише після запису буферів і знімків
+                await instance_lock.release()
             
             # If we got here, the bot exited normally
             logger.info("Bot stopped normally")
@@ -0,0 +1,290 @@
+# файл: app/bulk_copy.py
+"""
+Массовый экспорт и импорт таблиц через COPY (asyncpg).
+
+Данные идут потоком между файлом и сервером кусками по COPY_CHUNK_BYTES,
+поэтому память не зависит от размера таблицы. Форматы — csv (с заголовком)
+и binary, файлы можно сжимать gzip (--gzip при экспорте, .gz при импорте).
+
+Экспорт пишет в каталог файлы {таблица}.csv|.bin[.gz] и manifest.json с
+колонками и числом строк. Импорт загружает файл во временную таблицу и
+переносит строки одним INSERT ... ON CONFLICT (upsert по ключу таблицы) в
+одной транзакции на таблицу. Если ключевых колонок в файле нет (например,
+CSV с местами без id), строки просто добавляются.
+
+Запуск:
+    python -m app.bulk_copy export --dir dump/ [--format binary] [--gzip] [--tables users swipes]
+    python -m app.bulk_copy import --dir dump/ [--on-conflict ignore] [--tables places]
+
+Binary-файлы переносимы только между базами с одинаковыми типами колонок.
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import time
+from datetime import datetime
+import asyncpg
+from app.config import POSTGRES_URL
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = "dating_bot"
+COPY_CHUNK_BYTES = 1024 * 1024
+# Как часто выводить прогресс, секунды
+PROGRESS_INTERVAL = 2.0
+
+# Таблицы в порядке внешних ключей и их ключи для upsert при импорте
+TABLES = {
+    "users": ("id",),
+    "user_photos": ("id",),
+    # id свайпов не переносится: пара (swiper_id, swiped_id) уникальна (uq_swiper_swiped)
+    "swipes": ("swiper_id", "swiped_id"),
+    "matches": ("id",),
+    # Секционированная таблица: уникален только (id, created_at)
+    "messages": ("id", "created_at"),
+    "places": ("id",),
+    "admin_messages": ("id",),
+}
+
+# Колонки, которые не выгружаются (значения выдаёт последовательность целевой базы)
+_SKIP_COLUMNS = {
+    "swipes": ("id",),
+}
+
+_EXTENSIONS = {"csv": "csv", "binary": "bin"}
+
+
+def _dsn(url: str) -> str:
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def _table_columns(conn, table: str) -> list:
+    rows = await conn.fetch(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = $1 AND table_name = $2 ORDER BY ordinal_position",
+        SCHEMA, table
+    )
+    if not rows:
+        raise RuntimeError(f"Таблица {SCHEMA}.{table} не найдена")
+    skip = _SKIP_COLUMNS.get(table, ())
+    return [row["column_name"] for row in rows if row["column_name"] not in skip]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class Progress:
+    """Прогресс потока COPY по байтам (для импорта — в процентах от размера файла)"""
+
+    def __init__(self, table: str, total_bytes: int = None):
+        self.table = table
+        self.total = total_bytes
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self._printed = self.started
+
+    def add(self, size: int):
+        self.bytes += size
+        now = time.perf_counter()
+        if now - self._printed >= PROGRESS_INTERVAL:
+            self._printed = now
+            self.print()
+
+    def print(self, end: str = ""):
+        elapsed = time.perf_counter() - self.started
+        done = f" ({self.bytes / self.total:.0%})" if self.total else ""
+        rate = self.bytes / elapsed / 1e6 if elapsed else 0
+        print(f"\r  {self.table}: {self.bytes / 1e6:,.1f} MB{done}, {rate:.1f} MB/s", end=end, flush=True)
+
+
+def _open(path: str, mode: str):
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+
+async def _read_chunks(f, progress: Progress):
+    # Чтение с диска короткое по сравнению с передачей, поэтому без executor
+    while True:
+        chunk = f.read(COPY_CHUNK_BYTES)
+        if not chunk:
+            return
+        progress.add(len(chunk))
+        yield chunk
+
+
+async def export_table(conn, table: str, directory: str, fmt: str = "csv", compress: bool = False) -> dict:
+    """
+    Выгружает таблицу в файл. Возвращает запись манифеста
+    """
+    columns = await _table_columns(conn, table)
+    filename = f"{table}.{_EXTENSIONS[fmt]}" + (".gz" if compress else "")
+    path = os.path.join(directory, filename)
+    progress = Progress(table)
+
+    with _open(path, "wb") as f:
+        async def sink(data):
+            f.write(data)
+            progress.add(len(data))
+
+        status = await conn.copy_from_table(
+            table, schema_name=SCHEMA, columns=columns, output=sink,
+            format=fmt, header=True if fmt == "csv" else None,
+        )
+    progress.print(end="\n")
+
+    rows = int(status.split()[-1])
+    elapsed = time.perf_counter() - progress.started
+    logger.info(f"✅ {table}: {rows:,} строк за {elapsed:.1f} с")
+    return {"file": filename, "format": fmt, "columns": columns, "rows": rows}
+
+
+def _csv_header(path: str) -> list:
+    with _open(path, "rb") as f:
+        line = f.readline().decode("utf-8")
+    return next(csv.reader(io.StringIO(line)))
+
+
+def _upsert_sql(table: str, staging: str, columns: list, key: tuple, on_conflict: str) -> str:
+    names = ", ".join(_quote(column) for column in columns)
+    sql = f"INSERT INTO {SCHEMA}.{table} ({names}) SELECT {names} FROM {staging}"
+    if not all(column in columns for column in key):
+        # Ключа в файле нет — строки добавляются как новые
+        return sql
+
+    target = ", ".join(_quote(column) for column in key)
+    updates = [column for column in columns if column not in key]
+    if on_conflict == "ignore" or not updates:
+        return f"{sql} ON CONFLICT ({target}) DO NOTHING"
+    assignments = ", ".join(f"{_quote(column)} = EXCLUDED.{_quote(column)}" for column in updates)
+    return f"{sql} ON CONFLICT ({target}) DO UPDATE SET {assignments}"
+
+
+async def import_table(conn, table: str, path: str, fmt: str, columns: list = None,
+                       on_conflict: str = "update") -> dict:
+    """
+    Загружает файл в таблицу с upsert по ключу из TABLES
+    """
+    if columns is None:
+        if fmt != "csv":
+            raise RuntimeError(f"Для binary-файла {path} нужен manifest.json с колонками")
+        columns = _csv_header(path)
+
+    staging = f"_import_{table}"
+    progress = Progress(table, os.path.getsize(path) if not path.endswith(".gz") else None)
+
+    async with conn.transaction():
+        # Только колонки файла и без ограничений: проверки выполнит INSERT в целевую таблицу
+        names = ", ".join(_quote(column) for column in columns)
+        await conn.execute(
+            f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {names} FROM {SCHEMA}.{table} WITH NO DATA"
+        )
+        with _open(path, "rb") as f:
+            status = await conn.copy_to_table(
+                staging, source=_read_chunks(f, progress), columns=columns,
+                format=fmt, header=True if fmt == "csv" else None,
+            )
+        progress.print(end="\n")
+        loaded = int(status.split()[-1])
+
+        status = await conn.execute(_upsert_sql(table, staging, columns, TABLES[table], on_conflict))
+        written = int(status.split()[-1])
+
+        if "id" in columns:
+            # id заданы явно — последовательность сдвигается за максимальный
+            await conn.execute(
+                f"SELECT setval(pg_get_serial_sequence('{SCHEMA}.{table}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 1) FROM {SCHEMA}.{table}))"
+            )
+
+    await conn.execute(f"ANALYZE {SCHEMA}.{table}")
+    elapsed = time.perf_counter() - progress.started
+    logger.info(f"✅ {table}: загружено {loaded:,}, записано {written:,} строк за {elapsed:.1f} с")
+    return {"loaded": loaded, "written": written, "seconds": round(elapsed, 3)}
+
+
+async def export_tables(url: str, directory: str, tables: list, fmt: str = "csv", compress: bool = False) -> dict:
+    os.makedirs(directory, exist_ok=True)
+    manifest = {"exported_at": datetime.utcnow().isoformat(timespec="seconds") + "Z", "tables": {}}
+    # COPY больших таблиц дольше DB_COMMAND_TIMEOUT бота, поэтому отдельное соединение без таймаута
+    conn = await asyncpg.connect(_dsn(url), command_timeout=None)
+    try:
+        # Все таблицы выгружаются из одного согласованного снимка
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            for table in tables:
+                manifest["tables"][table] = await export_table(conn, table, directory, fmt, compress)
+    finally:
+        await conn.close()
+
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def _find_file(directory: str, table: str):
+    for fmt, extension in _EXTENSIONS.items():
+        for suffix in ("", ".gz"):
+            path = os.path.join(directory, f"{table}.{extension}{suffix}")
+            if os.path.exists(path):
+                return path, fmt
+    return None, None
+
+
+async def import_tables(url: str, directory: str, tables: list, on_conflict: str = "update") -> dict:
+    manifest_path = os.path.join(directory, "manifest.json")
+    manifest = {"tables": {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    results = {}
+    conn = await asyncpg.connect(_dsn(url), command_timeout=None)
+    try:
+        for table in tables:
+            entry = manifest["tables"].get(table)
+            if entry:
+                path, fmt, columns = os.path.join(directory, entry["file"]), entry["format"], entry["columns"]
+            else:
+                (path, fmt), columns = _find_file(directory, table), None
+            if path is None:
+                logger.info(f"Файла для {table} нет — пропускаем")
+                continue
+            results[table] = await import_table(conn, table, path, fmt, columns, on_conflict)
+    finally:
+        await conn.close()
+    return results
+
+
+async def _main(args):
+    url = args.database_url or POSTGRES_URL
+    tables = args.tables or list(TABLES)
+    unknown = [table for table in tables if table not in TABLES]
+    if unknown:
+        raise SystemExit(f"Неизвестные таблицы: {', '.join(unknown)}")
+    # Импорт идёт в порядке внешних ключей независимо от порядка в --tables
+    tables = [table for table in TABLES if table in tables]
+
+    if args.command == "export":
+        await export_tables(url, args.dir, tables, args.format, args.gzip)
+    else:
+        await import_tables(url, args.dir, tables, args.on_conflict)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Экспорт и импорт таблиц dating_bot через COPY")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("--dir", required=True, help="Каталог с файлами таблиц и manifest.json")
+    parser.add_argument("--tables", nargs="+", default=None, help=f"Таблицы (по умолчанию: {' '.join(TABLES)})")
+    parser.add_argument("--format", choices=tuple(_EXTENSIONS), default="csv", help="Формат экспорта")
+    parser.add_argument("--gzip", action="store_true", help="Сжимать файлы экспорта")
+    parser.add_argument("--on-conflict", choices=("update", "ignore"), default="update",
+                        help="Строки с существующим ключом: обновить или оставить как есть")
+    parser.add_argument("--database-url", default=None, help="База (по умолчанию POSTGRES_URL)")
+    asyncio.run(_main(parser.parse_args()))
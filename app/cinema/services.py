@@ -6,6 +6,7 @@ import logging
 from app.models import User  # твоя таблиця користувачів
 from app.database import SessionLocal
 from app.cinema.models import FilmPurchase
+from app.services.identity_cache import user_identities
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from uuid import uuid4
@@ -107,6 +108,7 @@ async def process_film_purchase(user_id: int, film_id: str, film_title: str) ->
                 logger.info(f"✅ Запись о покупке фильма создана")
                 
             await session.commit()
+            user_identities.invalidate_user(user_id)
             logger.info(f"✅ Транзакция успешно завершена")
             return room_url
     except Exception as e:
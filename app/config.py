@@ -20,6 +20,58 @@ STRIPE_SUBSCRIPTION_URL = os.getenv("STRIPE_SUBSCRIPTION_URL")
 OPENTABLE_API_KEY = os.getenv("OPENTABLE_API_KEY", "")
 EVENTBRITE_TOKEN = os.getenv("EVENTBRITE_TOKEN", "")
 
+# Очередь кандидатов для ленты свайпов
+CANDIDATE_BATCH_SIZE = int(os.getenv("CANDIDATE_BATCH_SIZE", "20"))
+CANDIDATE_LOW_WATER = int(os.getenv("CANDIDATE_LOW_WATER", "5"))
+CANDIDATE_MAX_USERS = int(os.getenv("CANDIDATE_MAX_USERS", "10000"))
+CANDIDATE_MAX_SCAN_PAGES = int(os.getenv("CANDIDATE_MAX_SCAN_PAGES", "10"))
+
+# Ранжирование ленты
+FEED_RANKER = os.getenv("FEED_RANKER", "weighted")
+RANKING_POOL_SIZE = int(os.getenv("RANKING_POOL_SIZE", "10000"))
+# Сколько пачек отранжированного пула держать наперёд для каждого пользователя
+RANKED_BATCHES_AHEAD = int(os.getenv("RANKED_BATCHES_AHEAD", "5"))
+
+# Совместимость по ответам анкеты
+ANSWER_BRUTE_FORCE_MAX = int(os.getenv("ANSWER_BRUTE_FORCE_MAX", "200000"))
+ANSWER_LSH_TABLES = int(os.getenv("ANSWER_LSH_TABLES", "8"))
+ANSWER_LSH_BITS = int(os.getenv("ANSWER_LSH_BITS", "8"))
+
+# Кеш карточек анкет
+PROFILE_CARD_CACHE_MB = int(os.getenv("PROFILE_CARD_CACHE_MB", "32"))
+
+# Кеш снимков пользователей по telegram_id
+IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", "300"))  # секунды
+IDENTITY_CACHE_MAX = int(os.getenv("IDENTITY_CACHE_MAX", "100000"))
+
+# Множества просмотренных анкет
+SEEN_SET_MAX_USERS = int(os.getenv("SEEN_SET_MAX_USERS", "50000"))
+SEEN_SNAPSHOT_INTERVAL = int(os.getenv("SEEN_SNAPSHOT_INTERVAL", "300"))  # секунды
+
+# Буфер записи свайпов
+SWIPE_BUFFER_MAX = int(os.getenv("SWIPE_BUFFER_MAX", "500"))
+SWIPE_FLUSH_INTERVAL = float(os.getenv("SWIPE_FLUSH_INTERVAL", "2"))  # секунды
+
+# Секции и архив сообщений чата (app/message_partitions.py)
+MESSAGES_HOT_MONTHS = int(os.getenv("MESSAGES_HOT_MONTHS", "6"))  # сколько месяцев хранить в базе
+MESSAGES_PARTITIONS_AHEAD = int(os.getenv("MESSAGES_PARTITIONS_AHEAD", "2"))
+MESSAGES_ARCHIVE_DIR = os.getenv("MESSAGES_ARCHIVE_DIR", "archive/messages")
+MESSAGES_MAINTENANCE_INTERVAL = float(os.getenv("MESSAGES_MAINTENANCE_INTERVAL", "86400"))  # секунды
+
+# Пересылка сообщений чата: кеш участников тредов и буфер записи сообщений
+CHAT_THREAD_CACHE_TTL = float(os.getenv("CHAT_THREAD_CACHE_TTL", "600"))  # секунды
+CHAT_THREAD_CACHE_MAX = int(os.getenv("CHAT_THREAD_CACHE_MAX", "50000"))
+MESSAGE_BUFFER_MAX = int(os.getenv("MESSAGE_BUFFER_MAX", "200"))
+MESSAGE_FLUSH_INTERVAL = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "0.5"))  # секунды
+
+# Хранилище состояний FSM (app/fsm_storage.py): postgres или memory
+FSM_STORAGE = os.getenv("FSM_STORAGE", "postgres").lower()
+FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", "604800"))  # секунды без записи до удаления сценария
+FSM_CACHE_MAX = int(os.getenv("FSM_CACHE_MAX", "10000"))
+FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", "60"))  # секунды
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.2"))  # секунды
+FSM_CLEANUP_INTERVAL = float(os.getenv("FSM_CLEANUP_INTERVAL", "3600"))  # секунды
+
 def get_config(key, default=None):
     """Получение значения из переменных среды с возможностью указать значение по умолчанию"""
     return os.getenv(key, default)
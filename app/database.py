@@ -3,9 +3,16 @@
 import os
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.asyncio import async_sessionmaker
-from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy import text, event
 from dotenv import load_dotenv
+from contextvars import ContextVar
+from app.db_pool import engine_options
+from app.db_metrics import instrument_engine
 import asyncio
+import logging
+import time
 
 # Import all models to ensure they're registered with SQLAlchemy's metadata
 from app.models import Base, User, UserPhoto, Swipe, Match, Report, Message
@@ -14,15 +21,41 @@ load_dotenv()
 
 POSTGRES_URL = os.getenv("POSTGRES_URL")
 DB_SCHEMA = os.getenv("DB_SCHEMA")
+# Швидкий старт: якщо відбиток схеми в базі збігається з кодом, init_db нічого не перевіряє
+FAST_START = os.getenv("FAST_START", "1") == "1"
 
-engine = create_async_engine(POSTGRES_URL, echo=False, future=True)
+# Розмір пулу, таймаути, кеш виразів asyncpg і режим pgbouncer — з оточення (app/db_pool.py)
+engine = create_async_engine(POSTGRES_URL, **engine_options())
 SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+# Кількість і час запитів по обробниках, пошук N+1 (app/db_metrics.py)
+instrument_engine(engine)
 
+# Необов'язкова репліка для читання (read_session); без неї всі читання йдуть на primary
+REPLICA_POSTGRES_URL = os.getenv("REPLICA_POSTGRES_URL")
+# Скільки секунд після запису користувач читає з primary (з запасом на лаг репліки)
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
 
-async def init_db():
+replica_engine = create_async_engine(REPLICA_POSTGRES_URL, **engine_options()) if REPLICA_POSTGRES_URL else None
+ReplicaSessionLocal = (
+    async_sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False)
+    if replica_engine is not None else None
+)
+if replica_engine is not None:
+    instrument_engine(replica_engine)
+
+
+async def init_db(fast: bool = FAST_START):
     """
     Перевіряє наявність таблиць у схемі та створює їх із schema.sql при першому запуску.
+    З fast=True спершу звіряє один рядок schema_state і, якщо схема актуальна, пропускає решту.
     """
+    from app.migrations import schema_is_current, mark_schema_current, migrate
+
+    if fast and await schema_is_current():
+        print("✅ Схема актуальна — швидкий старт без перевірки таблиць.")
+        return
+
+    failed = False
     async with engine.begin() as conn:
         # Створюємо схему, якщо її ще нема
         await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {DB_SCHEMA}"))
@@ -51,6 +84,7 @@ async def init_db():
                         try:
                             await conn.execute(text(command.strip()))
                         except Exception as e:
+                            failed = True
                             print(f"Помилка при виконанні команди: {e}")
             print("✅ Створено всі таблиці.")
         else:
@@ -71,7 +105,16 @@ async def init_db():
                 await conn.execute(text(f"ALTER TABLE {DB_SCHEMA}.users ADD COLUMN language TEXT"))
                 print("✅ Колонку language додано.")
         except Exception as e:
+            failed = True
             print(f"Помилка при перевірці колонки language: {e}")
+
+        # Колонки геолокації користувача
+        try:
+            await conn.execute(text(f"ALTER TABLE {DB_SCHEMA}.users ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION"))
+            await conn.execute(text(f"ALTER TABLE {DB_SCHEMA}.users ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION"))
+        except Exception as e:
+            failed = True
+            print(f"Помилка при перевірці колонок геолокації: {e}")
             
         try:
             # Create tables from models if needed
@@ -80,15 +123,178 @@ async def init_db():
             await conn.run_sync(Base.metadata.create_all)
             print("✅ Моделі оновлено через SQLAlchemy.")
         except Exception as e:
+            failed = True
             print(f"❌ Помилка при створенні таблиць через SQLAlchemy: {e}")
 
+    # Версіоновані міграції з migrations/ (індекси будуються CONCURRENTLY, поза транзакцією)
+    try:
+        await migrate()
+    except Exception as e:
+        failed = True
+        print(f"❌ Помилка при застосуванні міграцій: {e}")
+
+    # Відбиток записується лише після повністю успішної ініціалізації
+    if not failed:
+        try:
+            await mark_schema_current()
+        except Exception as e:
+            print(f"Помилка при збереженні відбитка схеми: {e}")
+
+
+class UnitOfWork:
+    """
+    Одна сесія на апдейт Telegram: створюється при першому зверненні і
+    фіксується (або відкочується) один раз після обробки апдейту
+    """
+
+    __slots__ = ("session", "owner", "failed", "actor")
+
+    def __init__(self, actor: str = None):
+        self.session = None
+        # Telegram ID користувача апдейту (для read-your-writes при читанні з репліки)
+        self.actor = actor
+        # Сесію отримує лише задача апдейту; фонові задачі, запущені з неї,
+        # працюють зі своїми сесіями (AsyncSession не можна ділити між задачами)
+        self.owner = asyncio.current_task()
+        self.failed = False
+
+    def get(self) -> AsyncSession:
+        if self.session is None:
+            self.session = SessionLocal()
+            # Після commit об'єкти від'єднуються, щоб наступні запити в тому ж
+            # апдейті читали свіжі дані, а не закешовані в identity map
+            event.listen(self.session.sync_session, "after_commit", lambda session: session.expunge_all())
+        return self.session
+
+
+_unit_of_work = ContextVar("unit_of_work", default=None)
+
+
+def begin_unit_of_work(actor: str = None):
+    """
+    Починає unit of work для поточного апдейту. Повертає токен для end_unit_of_work
+    """
+    return _unit_of_work.set(UnitOfWork(actor))
+
+
+def current_unit_of_work():
+    uow = _unit_of_work.get()
+    if uow is not None and uow.owner is asyncio.current_task():
+        return uow
+    return None
+
+
+async def end_unit_of_work(token):
+    """
+    Фіксує зміни апдейту (або відкочує, якщо обробка впала) і закриває сесію
+    """
+    uow = _unit_of_work.get()
+    _unit_of_work.reset(token)
+    if uow is None or uow.session is None:
+        return
+
+    try:
+        if uow.failed:
+            await uow.session.rollback()
+        elif uow.session.in_transaction():
+            await uow.session.commit()
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Помилка при завершенні транзакції апдейту: {e}")
+        await uow.session.rollback()
+    finally:
+        await uow.session.close()
 
-# Генератор сесій
+
+def current_actor():
+    """Telegram ID користувача поточного апдейту (також у фонових задачах апдейту)"""
+    uow = _unit_of_work.get()
+    return uow.actor if uow is not None else None
+
+
+# Read-your-writes: коли користувач востаннє щось записав (monotonic)
+_recent_writes = {}
+
+
+def remember_write(actor: str = None):
+    actor = actor or current_actor()
+    if not actor:
+        return
+    now = time.monotonic()
+    _recent_writes[actor] = now
+    if len(_recent_writes) > 10000:
+        for key, written_at in list(_recent_writes.items()):
+            if now - written_at > REPLICA_STICKY_SECONDS:
+                del _recent_writes[key]
+
+
+def wrote_recently(actor: str = None) -> bool:
+    actor = actor or current_actor()
+    written_at = _recent_writes.get(actor) if actor else None
+    return written_at is not None and time.monotonic() - written_at < REPLICA_STICKY_SECONDS
+
+
+# Сесія позначається як така, що писала: ORM-flush або INSERT/UPDATE/DELETE
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_execute(orm_execute_state):
+    statement = orm_execute_state.statement
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+    elif isinstance(statement, TextClause) and not str(statement).lstrip().upper().startswith(("SELECT", "WITH")):
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_commit(session):
+    if session.info.pop("wrote", False):
+        remember_write()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rollback(session):
+    session.info.pop("wrote", None)
+
+
+# Генератор сесій: у межах апдейту — спільна сесія unit of work, інакше — нова
 async def get_session():
+    uow = current_unit_of_work()
+    if uow is not None:
+        yield uow.get()
+        return
+
     async with SessionLocal() as session:
         yield session
 
 
+async def write_session():
+    """
+    Сесія для запису — завжди primary (те саме, що get_session)
+    """
+    async for session in get_session():
+        yield session
+
+
+async def read_session():
+    """
+    Сесія для читання: репліка, якщо вона налаштована і користувач апдейту
+    нічого не записував останні REPLICA_STICKY_SECONDS (інакше — primary,
+    щоб він бачив власні зміни)
+    """
+    uow = current_unit_of_work()
+    pending_writes = uow is not None and uow.session is not None and uow.session.sync_session.info.get("wrote")
+    if ReplicaSessionLocal is None or pending_writes or wrote_recently():
+        async for session in get_session():
+            yield session
+        return
+
+    async with ReplicaSessionLocal() as session:
+        yield session
+
+
 # Локальний запуск для перевірки
 if __name__ == "__main__":
     asyncio.run(init_db())
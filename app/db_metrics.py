@@ -0,0 +1,249 @@
+# файл: app/db_metrics.py
+"""
+Учёт SQL по хендлерам aiogram.
+
+Каждый запрос (события engine before/after_cursor_execute и горячие запросы
+app/services/hot_queries.py) приписывается текущему хендлеру — aiogram
+держит его в current_handler на время вызова. По хендлеру считаются число
+запросов, суммарное время в БД и самый медленный запрос.
+
+SqlStatsMiddleware (app/middlewares) ведёт трассу апдейта: если запрос
+одной формы выполнен в одном апдейте больше SQL_N_PLUS_ONE_THRESHOLD раз,
+это N+1 — он попадает в предупреждение в логе и в сводку.
+
+Сводка выводится в лог раз в SQL_STATS_LOG_INTERVAL секунд и командой /sqlstats.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from aiogram.dispatcher.handler import current_handler
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Сколько повторов одной формы запроса в апдейте ещё не считаются N+1
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+# Период сводки в логе, секунды (0 — не выводить)
+SQL_STATS_LOG_INTERVAL = float(os.getenv("SQL_STATS_LOG_INTERVAL", "300"))
+
+# Запросы вне хендлера: фильтры и middleware апдейта, фоновые задачи
+_BEFORE_HANDLER = "(filters/middleware)"
+_BACKGROUND = "(background)"
+
+_PARAMS = re.compile(r"\$\d+(?:::[\w ]+(?:\[\])?)?(?:\s*,\s*\$\d+(?:::[\w ]+(?:\[\])?)?)*")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def statement_shape(statement: str) -> str:
+    """
+    Форма запроса: без лишних пробелов, списки параметров IN (...) схлопнуты
+    """
+    return _PARAMS.sub("?", _SPACES.sub(" ", statement).strip())
+
+
+def _handler_name(handler) -> str:
+    module = getattr(handler, "__module__", "") or ""
+    name = getattr(handler, "__qualname__", None) or repr(handler)
+    return f"{module.rsplit('.', 1)[-1]}.{name}" if module else name
+
+
+class HandlerStats:
+    """Накопленные показатели одного хендлера"""
+
+    __slots__ = ("updates", "queries", "db_time", "max_queries", "slowest", "slowest_sql", "n_plus_one")
+
+    def __init__(self):
+        self.updates = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.max_queries = 0
+        self.slowest = 0.0
+        self.slowest_sql = None
+        self.n_plus_one = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "updates": self.updates,
+            "queries": self.queries,
+            "queries_per_update": round(self.queries / self.updates, 2) if self.updates else None,
+            "max_queries_per_update": self.max_queries,
+            "db_time_ms": round(self.db_time * 1000, 2),
+            "db_time_per_update_ms": round(self.db_time / self.updates * 1000, 2) if self.updates else None,
+            "slowest_ms": round(self.slowest * 1000, 2),
+            "slowest_sql": self.slowest_sql,
+            "n_plus_one_updates": self.n_plus_one,
+        }
+
+
+class _UpdateTrace:
+    """Запросы одного апдейта: (хендлер, форма) -> число выполнений"""
+
+    __slots__ = ("shapes", "queries", "handler")
+
+    def __init__(self):
+        self.shapes = {}
+        self.queries = {}
+        # Последний хендлер апдейта: ему же приписывается flush при фиксации транзакции
+        self.handler = None
+
+
+_trace = ContextVar("sql_update_trace", default=None)
+
+
+class SqlStats:
+    def __init__(self, threshold: int = SQL_N_PLUS_ONE_THRESHOLD):
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self):
+        self.handlers = {}
+        # (хендлер, форма) -> [апдейтов с N+1, максимум повторов в апдейте]
+        self.n_plus_one = {}
+        self.since = time.time()
+
+    def observe(self, statement: str, seconds: float):
+        """
+        Учитывает один выполненный запрос
+        """
+        handler = current_handler.get(None)
+        trace = _trace.get()
+        if handler is not None:
+            name = _handler_name(handler)
+            if trace is not None:
+                trace.handler = name
+        elif trace is not None:
+            name = trace.handler or _BEFORE_HANDLER
+        else:
+            name = _BACKGROUND
+
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = HandlerStats()
+        stats.queries += 1
+        stats.db_time += seconds
+        if seconds > stats.slowest:
+            stats.slowest = seconds
+            stats.slowest_sql = statement_shape(statement)[:300]
+
+        if trace is None:
+            stats.updates += 1
+            stats.max_queries = max(stats.max_queries, 1)
+            return
+        key = (name, statement_shape(statement))
+        trace.shapes[key] = trace.shapes.get(key, 0) + 1
+        trace.queries[name] = trace.queries.get(name, 0) + 1
+
+    def begin_update(self):
+        return _trace.set(_UpdateTrace())
+
+    def end_update(self, token):
+        trace = _trace.get()
+        _trace.reset(token)
+        if trace is None:
+            return
+
+        for name, count in trace.queries.items():
+            stats = self.handlers.get(name)
+            if stats is None:
+                # Статистику сбросили посреди апдейта
+                continue
+            stats.updates += 1
+            stats.max_queries = max(stats.max_queries, count)
+
+        flagged = set()
+        for (name, shape), count in trace.shapes.items():
+            if count <= self.threshold:
+                continue
+            entry = self.n_plus_one.get((name, shape))
+            if entry is None:
+                self.n_plus_one[(name, shape)] = [1, count]
+                logger.warning(f"N+1 в {name}: запрос выполнен {count} раз за апдейт: {shape[:200]}")
+            else:
+                entry[0] += 1
+                entry[1] = max(entry[1], count)
+            flagged.add(name)
+        for name in flagged:
+            if name in self.handlers:
+                self.handlers[name].n_plus_one += 1
+
+    def snapshot(self) -> dict:
+        """
+        Метрики для экспорта: по хендлерам и найденные N+1
+        """
+        return {
+            "since": self.since,
+            "handlers": {name: stats.as_dict() for name, stats in self.handlers.items()},
+            "n_plus_one": [
+                {"handler": name, "sql": shape, "updates": updates, "max_repeats": repeats}
+                for (name, shape), (updates, repeats) in self.n_plus_one.items()
+            ],
+        }
+
+    def summary(self, top: int = 10) -> str:
+        """
+        Текстовая сводка: хендлеры с наибольшим временем в БД и N+1
+        """
+        ranked = sorted(self.handlers.items(), key=lambda item: item[1].db_time, reverse=True)[:top]
+        lines = [f"SQL по хендлерам за {time.time() - self.since:.0f} с:"]
+        for name, stats in ranked:
+            info = stats.as_dict()
+            lines.append(
+                f"  {name}: {info['updates']} апд., {info['queries']} запр. "
+                f"({info['queries_per_update']}/апд., макс. {info['max_queries_per_update']}), "
+                f"БД {info['db_time_ms']} мс ({info['db_time_per_update_ms']} мс/апд.), "
+                f"медленнейший {info['slowest_ms']} мс"
+                + (f", N+1 в {stats.n_plus_one} апд." if stats.n_plus_one else "")
+            )
+        for (name, shape), (updates, repeats) in sorted(self.n_plus_one.items(), key=lambda item: -item[1][0])[:top]:
+            lines.append(f"  N+1 {name}: до {repeats} повторов, {updates} апд.: {shape[:120]}")
+        return "\n".join(lines)
+
+    async def run_log_loop(self, interval: float = SQL_STATS_LOG_INTERVAL):
+        """
+        Периодически пишет сводку в лог (вместе со статистикой пула соединений)
+        """
+        from app.database import engine
+        from app.db_pool import pool_status
+
+        while interval > 0:
+            await asyncio.sleep(interval)
+            if not self.handlers:
+                continue
+            pool = pool_status(engine)
+            logger.info(
+                f"{self.summary()}\n"
+                f"Пул: выдано {pool['acquired']}, ждут {pool['waiting']} (макс. {pool['max_waiting']}), "
+                f"ожидание p99 ≤{pool['wait_p99_ms']} мс, таймаутов {pool['timeouts']}"
+            )
+
+
+sql_stats = SqlStats()
+
+
+def instrument_engine(engine):
+    """
+    Подключает учёт запросов к engine (AsyncEngine или Engine)
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_sql_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["_sql_started"].pop()
+        sql_stats.observe(statement, time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("_sql_started"):
+            conn.info["_sql_started"].pop()
+
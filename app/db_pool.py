@@ -0,0 +1,165 @@
+# файл: app/db_pool.py
+
+import os
+import time
+import uuid
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Настройки пула соединений (все — из окружения)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # ожидание свободного соединения, секунды
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # пересоздавать соединения старше, секунды
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+# Режим pgbouncer (pool_mode=transaction): без кеша подготовленных выражений
+# и с уникальными именами, т.к. соседние транзакции попадают на разные серверные соединения
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"
+# С pgbouncer можно не держать свой пул (NullPool): пулом управляет pgbouncer
+DB_NULL_POOL = os.getenv("DB_NULL_POOL", "0") == "1"
+
+# Границы корзин гистограммы ожидания соединения, мс
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolStats:
+    """
+    Счётчики пула: сколько задач ждут соединение и сколько длилось ожидание.
+    У каждого пула (primary, реплика) свои счётчики
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def observe(self, seconds: float):
+        self.acquired += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        ms = seconds * 1000
+        for index, bound in enumerate(WAIT_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, share: float):
+        """Верхняя граница корзины, в которую попадает перцентиль (мс)"""
+        if not self.acquired:
+            return None
+        rank = share * self.acquired
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return WAIT_BUCKETS_MS[index] if index < len(WAIT_BUCKETS_MS) else float("inf")
+        return float("inf")
+
+    def histogram(self) -> dict:
+        labels = [f"<={bound}ms" for bound in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+        return dict(zip(labels, self.buckets))
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Очередь соединений SQLAlchemy, измеряющая время получения соединения
+    (ожидание свободного и установку нового, если пул растёт)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        pool_stats = self.stats
+        pool_stats.waiting += 1
+        pool_stats.max_waiting = max(pool_stats.max_waiting, pool_stats.waiting)
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.waiting -= 1
+        pool_stats.observe(time.perf_counter() - started)
+        return connection
+
+
+def engine_options() -> dict:
+    """
+    Аргументы create_async_engine по настройкам окружения
+    """
+    connect_args = {
+        "timeout": DB_CONNECT_TIMEOUT,
+        "command_timeout": DB_COMMAND_TIMEOUT,
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    }
+    options = {"echo": False, "future": True, "pool_pre_ping": DB_POOL_PRE_PING}
+
+    if DB_PGBOUNCER:
+        connect_args["statement_cache_size"] = 0
+        # Кеш подготовленных выражений диалекта SQLAlchemy и уникальные имена выражений
+        connect_args["prepared_statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+
+    if DB_NULL_POOL:
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=InstrumentedPool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    options["connect_args"] = connect_args
+    return options
+
+
+def pool_stats_of(engine) -> PoolStats:
+    """
+    Счётчики пула движка (у NullPool их нет — пустые)
+    """
+    return getattr(engine.pool, "stats", None) or PoolStats()
+
+
+def pool_status(engine) -> dict:
+    """
+    Текущее состояние пула и статистика ожидания соединений
+    """
+    pool = engine.pool
+    pool_stats = pool_stats_of(engine)
+    status = {
+        "pool": type(pool).__name__,
+        "pgbouncer": DB_PGBOUNCER,
+        "waiting": pool_stats.waiting,
+        "max_waiting": pool_stats.max_waiting,
+        "acquired": pool_stats.acquired,
+        "timeouts": pool_stats.timeouts,
+        "wait_avg_ms": round(pool_stats.wait_total / pool_stats.acquired * 1000, 2) if pool_stats.acquired else None,
+        "wait_p50_ms": pool_stats.percentile(0.5),
+        "wait_p99_ms": pool_stats.percentile(0.99),
+        "wait_max_ms": round(pool_stats.wait_max * 1000, 2),
+        "wait_histogram": pool_stats.histogram(),
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+    return status
@@ -0,0 +1,431 @@
+# файл: app/fsm_storage.py
+"""
+Хранилище состояний FSM aiogram в Postgres (dating_bot.fsm_states, миграция 0012).
+
+Состояния переживают рестарт бота, а само хранилище рассчитано на несколько
+процессов с общей таблицей — кеш каждого сбрасывается по NOTIFY:
+
+- чтение идёт из ограниченного кеша в памяти (FSM_CACHE_MAX записей,
+  не старше FSM_CACHE_TTL секунд); промахи одного шага цикла событий
+  читаются одним SELECT через соединение LISTEN, без соединений из пула;
+- запись сначала меняет кеш, а в базу строки попадают пачкой раз в
+  FSM_FLUSH_INTERVAL секунд: set_state + update_data одного хендлера
+  дают одну запись. Запись за другого пользователя (например, состояние
+  получателя в чате) сбрасывается сразу, не дожидаясь таймера;
+- после записи процесс шлёт NOTIFY со списком ключей, и остальные
+  процессы удаляют эти ключи из своих кешей;
+- брошенные сценарии (без записи дольше FSM_STATE_TTL секунд) не читаются
+  и периодически удаляются.
+
+При одновременной записи одного ключа из двух процессов побеждает
+последняя. FSM_STORAGE=memory возвращает MemoryStorage aiogram.
+
+Известное ограничение: остальные кеши бота (индексы лайков, блокировок и
+анкет, просмотренные анкеты, буферы записи) между процессами не
+синхронизируются, поэтому пока бот запускается одним процессом на базу
+(app/instance_lock.py).
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import time
+import typing
+import uuid
+from collections import OrderedDict
+import asyncpg
+from aiogram import types
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.dispatcher.storage import BaseStorage
+from app.config import (
+    POSTGRES_URL, FSM_STORAGE, FSM_STATE_TTL, FSM_CACHE_MAX, FSM_CACHE_TTL, FSM_FLUSH_INTERVAL,
+    FSM_CLEANUP_INTERVAL
+)
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+_CHANNEL = "dating_bot_fsm"
+# Лимит полезной нагрузки NOTIFY — 8000 байт
+_NOTIFY_LIMIT = 7000
+# Строку, которую читают, но не пишут, продлеваем раз в сутки, чтобы TTL её не удалил
+_TOUCH_AFTER = 86400
+# Через сколько секунд переподключать потерянный LISTEN
+_RECONNECT_INTERVAL = 30
+
+_UPSERT = (
+    "INSERT INTO dating_bot.fsm_states (chat_id, user_id, state, data, bucket, updated_at) "
+    "VALUES ($1, $2, $3, $4::jsonb, $5::jsonb, now()) "
+    "ON CONFLICT (chat_id, user_id) DO UPDATE SET "
+    "state = EXCLUDED.state, data = EXCLUDED.data, bucket = EXCLUDED.bucket, updated_at = now()"
+)
+_SELECT_MANY = (
+    "SELECT k.chat_id, k.user_id, s.state, s.data, s.bucket, "
+    "s.updated_at < now() - make_interval(secs => $4) AS stale "
+    "FROM unnest($1::bigint[], $2::bigint[]) AS k(chat_id, user_id) "
+    "JOIN dating_bot.fsm_states s ON s.chat_id = k.chat_id AND s.user_id = k.user_id "
+    "WHERE s.updated_at > now() - make_interval(secs => $3)"
+)
+_DELETE = "DELETE FROM dating_bot.fsm_states WHERE chat_id = $1 AND user_id = $2"
+_EXPIRE = "DELETE FROM dating_bot.fsm_states WHERE updated_at < now() - make_interval(secs => $1)"
+
+
+class _Entry:
+    __slots__ = ("state", "data", "bucket", "loaded_at")
+
+    def __init__(self, state=None, data=None, bucket=None):
+        self.state = state
+        self.data = data or {}
+        self.bucket = bucket or {}
+        self.loaded_at = time.monotonic()
+
+    def is_empty(self) -> bool:
+        return self.state is None and not self.data and not self.bucket
+
+
+def _dumps(value: dict) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class PostgresStorage(BaseStorage):
+    """Состояния FSM в Postgres с кешем чтения и пакетной записью"""
+
+    def __init__(self, ttl: float = FSM_STATE_TTL, cache_size: int = FSM_CACHE_MAX,
+                 cache_ttl: float = FSM_CACHE_TTL, flush_interval: float = FSM_FLUSH_INTERVAL,
+                 cleanup_interval: float = FSM_CLEANUP_INTERVAL):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.flush_interval = flush_interval
+        self.cleanup_interval = cleanup_interval
+        # (chat, user) -> _Entry
+        self._cache = OrderedDict()
+        self._dirty = set()
+        # Ключи, которые пишет текущий flush(): до фиксации в базе старая строка
+        # ещё видна, поэтому кеш по ним не перечитывается и не сбрасывается
+        self._flushing = set()
+        self._loading = {}
+        # Промахи, ждущие общего SELECT: key -> future
+        self._pending = {}
+        self._read_lock = asyncio.Lock()
+        # Свои уведомления процесс пропускает
+        self._instance = uuid.uuid4().hex[:8]
+        self._lock = asyncio.Lock()
+        self._listener = None
+        self._listen_attempt = 0.0
+        self._loop_task = None
+        self._flush_task = None
+        self.hits = 0
+        self.misses = 0
+
+    # --- жизненный цикл ---
+
+    async def start(self):
+        """
+        Запускает LISTEN и фоновую запись (вызывается при старте бота)
+        """
+        # После рестарта main() в том же процессе — новый цикл событий
+        self._lock = asyncio.Lock()
+        self._read_lock = asyncio.Lock()
+        self._cache.clear()
+        await self._listen()
+        self._loop_task = asyncio.ensure_future(self._run_loop())
+
+    async def close(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        await self.flush()
+        if self._listener is not None:
+            try:
+                await self._listener.close()
+            except Exception:
+                pass
+            self._listener = None
+
+    async def wait_closed(self):
+        pass
+
+    async def _listen(self):
+        try:
+            dsn = POSTGRES_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+            self._listener = await asyncpg.connect(dsn)
+            await self._listener.add_listener(_CHANNEL, self._on_notify)
+        except Exception as e:
+            # Без уведомлений кеш всё равно устаревает через FSM_CACHE_TTL
+            self._listener = None
+            logger.error(f"FSM: не удалось подписаться на {_CHANNEL}: {e}")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        instance, _, keys = payload.partition("|")
+        if instance == self._instance:
+            return
+        for key in keys.split(","):
+            chat, _, user = key.partition(":")
+            if user:
+                key = (int(chat), int(user))
+                # Несохранённые изменения этого процесса не теряем
+                if not self._unsaved(key):
+                    self._cache.pop(key, None)
+
+    async def _run_loop(self):
+        last_cleanup = 0.0
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if self._listener is None or self._listener.is_closed():
+                    if time.monotonic() - self._listen_attempt > _RECONNECT_INTERVAL:
+                        self._listen_attempt = time.monotonic()
+                        await self._listen()
+                if time.monotonic() - last_cleanup > self.cleanup_interval:
+                    last_cleanup = time.monotonic()
+                    await self.expire()
+            except Exception as e:
+                logger.error(f"FSM: ошибка фоновой записи: {e}")
+
+    # --- кеш ---
+
+    def _unsaved(self, key: tuple) -> bool:
+        """Кеш по ключу новее базы: изменён и ещё не записан или записывается"""
+        return key in self._dirty or key in self._flushing
+
+    def _key(self, chat, user) -> tuple:
+        chat, user = self.check_address(chat=chat, user=user)
+        return int(chat), int(user)
+
+    async def _entry(self, key: tuple) -> _Entry:
+        entry = self._cache.get(key)
+        if entry is not None and (self._unsaved(key) or time.monotonic() - entry.loaded_at < self.cache_ttl):
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        future = self._loading.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key))
+            self._loading[key] = future
+            future.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _load(self, key: tuple) -> _Entry:
+        future = asyncio.get_event_loop().create_future()
+        if not self._pending:
+            # Промахи, накопившиеся за этот шаг цикла событий, читаются вместе
+            asyncio.ensure_future(self._read_pending())
+        self._pending[key] = future
+        row = await future
+
+        entry = self._cache.get(key)
+        if entry is not None and self._unsaved(key):
+            # Пока шла загрузка, ключ изменили в этом процессе
+            return entry
+
+        if row is None:
+            entry = _Entry()
+        else:
+            entry = _Entry(row["state"], json.loads(row["data"]), json.loads(row["bucket"]))
+            if row["stale"]:
+                self._dirty.add(key)
+        self._cache[key] = entry
+        self._evict()
+        return entry
+
+    async def _read_pending(self):
+        await asyncio.sleep(0)
+        pending, self._pending = self._pending, {}
+        keys = list(pending)
+        try:
+            rows = await self._fetch([chat for chat, _ in keys], [user for _, user in keys])
+        except Exception as e:
+            for future in pending.values():
+                future.set_exception(e)
+            return
+        found = {(row["chat_id"], row["user_id"]): row for row in rows}
+        for key, future in pending.items():
+            future.set_result(found.get(key))
+
+    async def _fetch(self, chats: list, users: list) -> list:
+        args = (_SELECT_MANY, chats, users, float(self.ttl), float(_TOUCH_AFTER))
+        listener = self._listener
+        if listener is not None and not listener.is_closed():
+            # Соединение LISTEN выполняет по одному запросу за раз
+            async with self._read_lock:
+                return await listener.fetch(*args)
+        async with engine.connect() as sa_conn:
+            conn = (await sa_conn.get_raw_connection()).driver_connection
+            return await conn.fetch(*args)
+
+    def _evict(self):
+        # Несохранённые записи не вытесняются
+        for _ in range(len(self._cache)):
+            if len(self._cache) <= self.cache_size:
+                return
+            key = next(iter(self._cache))
+            if self._unsaved(key):
+                self._cache.move_to_end(key)
+            else:
+                del self._cache[key]
+
+    def _changed(self, key: tuple):
+        self._dirty.add(key)
+        entry = self._cache.get(key)
+        if entry is not None:
+            # Своя запись — самая свежая версия ключа, TTL кеша отсчитывается заново
+            entry.loaded_at = time.monotonic()
+        current = types.User.get_current()
+        if current is None or current.id != key[1]:
+            # Состояние другого пользователя ждёт его следующий апдейт,
+            # возможно в другом процессе, — пишем сразу
+            if not (self._flush_task and not self._flush_task.done()):
+                self._flush_task = asyncio.ensure_future(self.flush())
+
+    # --- запись ---
+
+    async def flush(self) -> int:
+        """
+        Пишет изменённые ключи одной транзакцией и оповещает другие процессы
+        """
+        if not self._dirty:
+            return 0
+
+        async with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            self._flushing = dirty
+            upserts, deletes = [], []
+            for key in dirty:
+                entry = self._cache.get(key)
+                if entry is None or entry.is_empty():
+                    deletes.append(key)
+                else:
+                    upserts.append((key[0], key[1], entry.state, _dumps(entry.data), _dumps(entry.bucket)))
+
+            try:
+                async with engine.connect() as sa_conn:
+                    conn = (await sa_conn.get_raw_connection()).driver_connection
+                    async with conn.transaction():
+                        if upserts:
+                            await conn.executemany(_UPSERT, upserts)
+                        if deletes:
+                            await conn.executemany(_DELETE, deletes)
+                        for payload in self._payloads(dirty):
+                            await conn.execute("SELECT pg_notify($1, $2)", _CHANNEL, payload)
+            except Exception as e:
+                # Вернём ключи, чтобы записать их при следующей попытке
+                self._dirty |= dirty
+                logger.error(f"FSM: ошибка записи {len(dirty)} состояний: {e}")
+                return 0
+            finally:
+                self._flushing = set()
+
+            return len(dirty)
+
+    def _payloads(self, keys):
+        prefix = f"{self._instance}|"
+        chunk = []
+        size = len(prefix)
+        for chat, user in keys:
+            item = f"{chat}:{user}"
+            if chunk and size + len(item) + 1 > _NOTIFY_LIMIT:
+                yield prefix + ",".join(chunk)
+                chunk, size = [], len(prefix)
+            chunk.append(item)
+            size += len(item) + 1
+        if chunk:
+            yield prefix + ",".join(chunk)
+
+    async def expire(self) -> int:
+        """
+        Удаляет брошенные сценарии старше FSM_STATE_TTL
+        """
+        async with engine.connect() as sa_conn:
+            conn = (await sa_conn.get_raw_connection()).driver_connection
+            status = await conn.execute(_EXPIRE, float(self.ttl))
+        deleted = int(status.split()[-1])
+        if deleted:
+            logger.info(f"FSM: удалено {deleted} устаревших состояний")
+        return deleted
+
+    # --- интерфейс BaseStorage ---
+
+    async def get_state(self, *, chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        default: typing.Optional[str] = None) -> typing.Optional[str]:
+        entry = await self._entry(self._key(chat, user))
+        return entry.state if entry.state is not None else self.resolve_state(default)
+
+    async def get_data(self, *, chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       default: typing.Optional[dict] = None) -> typing.Dict:
+        entry = await self._entry(self._key(chat, user))
+        return copy.deepcopy(entry.data)
+
+    async def set_state(self, *, chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        state: typing.AnyStr = None):
+        key = self._key(chat, user)
+        entry = await self._entry(key)
+        entry.state = self.resolve_state(state)
+        self._changed(key)
+
+    async def set_data(self, *, chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       data: typing.Dict = None):
+        key = self._key(chat, user)
+        entry = await self._entry(key)
+        entry.data = copy.deepcopy(data) if data else {}
+        self._changed(key)
+
+    async def update_data(self, *, chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          data: typing.Dict = None, **kwargs):
+        key = self._key(chat, user)
+        entry = await self._entry(key)
+        entry.data.update(copy.deepcopy(data or {}), **kwargs)
+        self._changed(key)
+
+    async def reset_state(self, *, chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          with_data: typing.Optional[bool] = True):
+        key = self._key(chat, user)
+        entry = await self._entry(key)
+        entry.state = None
+        if with_data:
+            entry.data = {}
+        self._changed(key)
+
+    def has_bucket(self):
+        return True
+
+    async def get_bucket(self, *, chat: typing.Union[str, int, None] = None,
+                         user: typing.Union[str, int, None] = None,
+                         default: typing.Optional[dict] = None) -> typing.Dict:
+        entry = await self._entry(self._key(chat, user))
+        return copy.deepcopy(entry.bucket)
+
+    async def set_bucket(self, *, chat: typing.Union[str, int, None] = None,
+                         user: typing.Union[str, int, None] = None,
+                         bucket: typing.Dict = None):
+        key = self._key(chat, user)
+        entry = await self._entry(key)
+        entry.bucket = copy.deepcopy(bucket) if bucket else {}
+        self._changed(key)
+
+    async def update_bucket(self, *, chat: typing.Union[str, int, None] = None,
+                            user: typing.Union[str, int, None] = None,
+                            bucket: typing.Dict = None, **kwargs):
+        key = self._key(chat, user)
+        entry = await self._entry(key)
+        entry.bucket.update(copy.deepcopy(bucket or {}), **kwargs)
+        self._changed(key)
+
+
+def create_storage() -> BaseStorage:
+    """
+    Хранилище FSM по FSM_STORAGE: postgres (по умолчанию) или memory
+    """
+    if FSM_STORAGE == "memory":
+        return MemoryStorage()
+    return PostgresStorage()
@@ -264,6 +264,71 @@ async def on_admin_back(callback_query: types.CallbackQuery):
     await callback_query.message.edit_text(admin_message, reply_markup=markup, parse_mode="Markdown")
     await callback_query.answer()
 
+def _pool_status_lines(title: str, status: dict) -> list:
+    lines = [
+        title,
+        f"Тип: {status['pool']}" + (" (pgbouncer)" if status["pgbouncer"] else ""),
+    ]
+    if "size" in status:
+        lines.append(
+            f"Занято: {status['checked_out']} / {status['size']} + overflow {status['overflow']}/{status['max_overflow']}, "
+            f"свободно: {status['idle']}"
+        )
+    lines += [
+        f"Ждут соединения: {status['waiting']} (максимум {status['max_waiting']})",
+        f"Выдано: {status['acquired']}, таймаутов: {status['timeouts']}",
+        f"Ожидание: avg {status['wait_avg_ms']} мс, p50 ≤{status['wait_p50_ms']} мс, "
+        f"p99 ≤{status['wait_p99_ms']} мс, max {status['wait_max_ms']} мс",
+        "Гистограмма ожидания:",
+    ]
+    lines += [f"`{label:>9}` {count}" for label, count in status["wait_histogram"].items() if count]
+    return lines
+
+# Обработчик команды /dbpool - состояние пула соединений с БД
+async def cmd_db_pool(message: types.Message):
+    telegram_id = str(message.from_user.id)
+
+    if not is_admin(telegram_id):
+        return
+
+    from app.database import engine, replica_engine
+    from app.db_pool import pool_status, pool_stats_of
+
+    # У primary и реплики свои пулы и своя статистика ожидания
+    engines = [("🗄 *Пул соединений*", engine)]
+    if replica_engine is not None:
+        engines.append(("📖 *Пул реплики*", replica_engine))
+
+    lines = []
+    for title, pool_engine in engines:
+        if lines:
+            lines.append("")
+        lines += _pool_status_lines(title, pool_status(pool_engine))
+
+    if len(message.text.split()) > 1 and message.text.split()[1] == "reset":
+        for _, pool_engine in engines:
+            pool_stats_of(pool_engine).reset()
+        lines.append("\nСтатистика сброшена")
+
+    await message.answer("\n".join(lines), parse_mode="Markdown")
+
+# Обработчик команды /sqlstats - запросы к БД по хендлерам и найденные N+1
+async def cmd_sql_stats(message: types.Message):
+    telegram_id = str(message.from_user.id)
+
+    if not is_admin(telegram_id):
+        return
+
+    from app.db_metrics import sql_stats
+
+    text = sql_stats.summary()
+    if len(message.text.split()) > 1 and message.text.split()[1] == "reset":
+        sql_stats.reset()
+        text += "\n\nСтатистика сброшена"
+
+    # Сводка содержит SQL, поэтому без разметки; длинная режется по лимиту Telegram
+    await message.answer(text[:4000])
+
 # Обработчик команды для быстрой обработки заявки
 async def cmd_admin_withdrawal(message: types.Message):
     telegram_id = str(message.from_user.id)
@@ -360,6 +425,8 @@ async def on_admin_view_withdrawal(callback_query: types.CallbackQuery):
 def register_admin_handlers(dp: Dispatcher):
     dp.register_message_handler(cmd_admin, commands="admin", state="*")
     dp.register_message_handler(cmd_admin_withdrawal, commands="admin_withdrawal", state="*")
+    dp.register_message_handler(cmd_db_pool, commands="dbpool", state="*")
+    dp.register_message_handler(cmd_sql_stats, commands="sqlstats", state="*")
     
     dp.register_callback_query_handler(on_admin_withdrawals, lambda c: c.data == "admin_withdrawals", state="*")
     dp.register_callback_query_handler(on_admin_approve_withdrawal, lambda c: c.data.startswith("admin_approve_"), state="*")
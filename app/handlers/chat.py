@@ -1,14 +1,23 @@
 ﻿from aiogram import types, Dispatcher
 from aiogram.dispatcher import Dispatcher, FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup
 from sqlalchemy import select, or_
 from app.models.match import Match
 from app.models.user import User
 from app.models.messages import Message
 from app.models.reports import Report
-from app.database import get_session
+from app.database import get_session, read_session
 from app.services.assistant import analyze_message, analyze_chat
+from app.services.loaders import load_users
+from app.services.identity_cache import user_identities
+from app.services.user_service import get_user_language
+from app.services.pagination import Page, NEXT, fetch_page, nav_buttons, page_request, is_page_callback
+from app.services.match_summaries import summary_page, create_for_user, mark_read
+from app.services.chat_threads import chat_threads
+from app.services.block_index import block_index
+from app.services.block_service import is_user_blocked
+from app.services.message_buffer import message_buffer
 import logging
 
 # Налаштування логування
@@ -40,13 +49,15 @@ async def ai_advice_handler(message: types.Message, state: FSMContext):
             
         # Get user ID for context
         async for session in get_session():
-            user = await session.scalar(select(User).where(User.telegram_id == tg_id))
+            user = await user_identities.get(tg_id)
             if not user:
                 await message.answer("⚠️ Помилка доступу.")
                 await ChatState.in_chat.set()
                 return
                 
-            # Get AI analysis
+            # Get AI analysis (спершу записуємо повідомлення з буфера)
+            if message_buffer.has_pending(thread_id):
+                await message_buffer.flush()
             logger.info(f"Запит на аналіз для thread_id={thread_id}, user_id={user.id}")
             analysis = await analyze_chat(thread_id, user.id)
             
@@ -65,45 +76,161 @@ async def ai_advice_handler(message: types.Message, state: FSMContext):
         await message.answer(f"❌ Помилка при отриманні поради: {str(e)}")
         await ChatState.in_chat.set()
 
+# Ключі списків у callback_data навігації (app/services/pagination.py)
+MATCH_PAGES = "mt"
+HISTORY_PAGES = "ms"
+# Довгі повідомлення в історії обрізаються, щоб сторінка вмістилась у 4096 символів
+HISTORY_TEXT_LIMIT = 300
+
+# Скільки символів останнього повідомлення показувати у списку матчів
+PREVIEW_TEXT_LIMIT = 40
+
+async def _match_page(session, me_id: int, after: tuple = None, direction: str = NEXT) -> Page:
+    """Сторінка матчів користувача з match_summaries, нещодавня активність першою"""
+    page = await summary_page(session, me_id, after, direction)
+    if not page.items and after is None and await create_for_user(session, me_id):
+        # Матчі старші за read-модель ще не заповнені — заповнюємо й читаємо знову
+        await session.commit()
+        page = await summary_page(session, me_id)
+    return page
+
+async def _send_match_page(message: types.Message, me, page: Page):
+    kb = ReplyKeyboardMarkup(resize_keyboard=True)
+    lines = ["Оберіть, з ким хочеш поспілкуватися:", ""]
+    for row in page.items:
+        summary = row.MatchSummary
+        unread = f" 🔴{summary.unread_count}" if summary.unread_count else ""
+        kb.add(KeyboardButton(f"💬 {summary.counterpart_name}{unread} ({summary.thread_id})"))
+        if summary.last_message_text:
+            author = "Ви: " if summary.last_sender_id == me.id else ""
+            preview = summary.last_message_text[:PREVIEW_TEXT_LIMIT]
+            lines.append(f"• {summary.counterpart_name}{unread} — {author}{preview}")
+        else:
+            lines.append(f"• {summary.counterpart_name} — новий матч ✨")
+    
+    # Add exit button in user's language
+    kb.add(KeyboardButton("⬅️ Вийти з чату"))
+
+    await message.answer("\n".join(lines), reply_markup=kb)
+
+    # Reply-клавіатура не має callback_data, тому гортання — окремим повідомленням
+    nav = nav_buttons(MATCH_PAGES, page, "◀️ Новіші", "Старіші ▶️")
+    if nav:
+        await message.answer("Інші матчі:", reply_markup=InlineKeyboardMarkup().row(*nav))
+
 # Команда /chat або "Мої матчі"
 async def choose_match(message: types.Message, state: FSMContext):
     tg_id = str(message.from_user.id)
 
     async for session in get_session():
-        me = await session.scalar(select(User).where(User.telegram_id == tg_id))
+        me = await user_identities.get(tg_id)
         if not me:
             return await message.answer("⚠️ Ти ще не зареєстрований.")
 
-        stmt = select(Match).where(or_(
-            Match.user_1_id == me.id,
-            Match.user_2_id == me.id
-        ))
-        matches = await session.scalars(stmt)
-        matches = matches.all()
+        page = await _match_page(session, me.id)
 
-        if not matches:
+        if not page.items:
             # Import the main menu keyboard
             from app.keyboards.main_menu import get_main_menu
             lang = getattr(me, 'language', 'ua')  # Default to 'ua' if not set
             main_menu = get_main_menu(lang)
             return await message.answer("😔 У тебе ще немає матчів.", reply_markup=main_menu)
 
-        kb = ReplyKeyboardMarkup(resize_keyboard=True)
-        for m in matches:
-            other_id = m.user_2_id if m.user_1_id == me.id else m.user_1_id
-            other = await session.scalar(select(User).where(User.id == other_id))
-            if other:
-                kb.add(KeyboardButton(f"💬 {other.first_name} ({m.thread_id})"))
-        
-        # Add exit button in user's language
-        kb.add(KeyboardButton("⬅️ Вийти з чату"))
-
-        await message.answer("Оберіть, з ким хочеш поспілкуватися:", reply_markup=kb)
+        await _send_match_page(message, me, page)
         await ChatState.in_chat.set()
         
         # Clear any previous chat state data
         await state.update_data(thread_id=None)
 
+# Гортання списку матчів
+async def match_page_handler(callback_query: types.CallbackQuery, state: FSMContext):
+    tg_id = str(callback_query.from_user.id)
+    # Пошкоджений курсор — перша сторінка
+    direction, after = page_request(callback_query.data)
+
+    me = await user_identities.get(tg_id)
+    if not me:
+        return await callback_query.answer("⚠️ Ти ще не зареєстрований.")
+
+    async for session in get_session():
+        page = await _match_page(session, me.id, after, direction)
+
+    await callback_query.answer()
+    if not page.items:
+        return
+    # Стара навігація замінюється новою разом з клавіатурою сторінки
+    await callback_query.message.delete()
+    await _send_match_page(callback_query.message, me, page)
+    await ChatState.in_chat.set()
+    await state.update_data(thread_id=None)
+
+# Історія активного чату сторінками, нові повідомлення першими
+async def chat_history_handler(message: types.Message, state: FSMContext):
+    await _show_history(message, state)
+
+async def history_page_handler(callback_query: types.CallbackQuery, state: FSMContext):
+    # Пошкоджений курсор — перша сторінка
+    direction, after = page_request(callback_query.data)
+    await _show_history(callback_query.message, state, callback_query.from_user.id, after, direction)
+    await callback_query.answer()
+
+async def _is_member(thread_id: str, user_id: int) -> bool:
+    """Тред існує і користувач — його учасник (thread_id приходить з тексту повідомлення)"""
+    thread = await chat_threads.get(thread_id)
+    return thread is not None and thread.member(user_id) is not None
+
+async def _show_history(message: types.Message, state: FSMContext, tg_id: int = None,
+                        after: tuple = None, direction: str = NEXT):
+    tg_id = str(tg_id or message.from_user.id)
+    data = await state.get_data()
+    thread_id = data.get("thread_id")
+    if not thread_id:
+        return await message.answer("❌ Спочатку оберіть співрозмовника.")
+
+    me = await user_identities.get(tg_id)
+    if not me:
+        return await message.answer("⚠️ Помилка доступу.")
+    if not await _is_member(thread_id, me.id):
+        return await message.answer("❌ Чат не знайдено.")
+
+    # Щойно надіслані повідомлення ще можуть бути в буфері запису
+    if message_buffer.has_pending(thread_id):
+        await message_buffer.flush()
+
+    async for session in read_session():
+        stmt = select(Message.id, Message.sender_id, Message.message_text, Message.created_at).where(
+            Message.thread_id == thread_id
+        )
+        page = await fetch_page(
+            session, stmt, [Message.created_at, Message.id],
+            lambda row: (row.created_at, row.id), after, direction
+        )
+
+    if not page.items:
+        return await message.answer("📭 У цьому чаті ще немає повідомлень.")
+
+    names = {me.id: "Ви"}
+    senders = {row.sender_id for row in page.items} - names.keys()
+    for user in await load_users(senders):
+        if user:
+            names[user.id] = user.first_name
+
+    # Усередині сторінки — у хронологічному порядку
+    lines = [
+        f"{row.created_at:%d.%m %H:%M} {names.get(row.sender_id, '?')}: {row.message_text[:HISTORY_TEXT_LIMIT]}"
+        for row in reversed(page.items)
+    ]
+    markup = None
+    nav = nav_buttons(HISTORY_PAGES, page, "Новіші ▶️", "◀️ Старіші")
+    if nav:
+        markup = InlineKeyboardMarkup().row(*reversed(nav))
+
+    text = "📜 Історія чату:\n\n" + "\n".join(lines)
+    if after is None:
+        await message.answer(text, reply_markup=markup)
+    else:
+        await message.edit_text(text, reply_markup=markup)
+
 from aiogram.dispatcher.filters import Text
 
 # Прийом повідомлення під час активного чату
@@ -117,120 +244,91 @@ async def in_chat_handler(message: types.Message, state: FSMContext):
     if "Вийти з чату" in text or "⬅️" in text:
         return
         
-    async for session in get_session():
-        me = await session.scalar(select(User).where(User.telegram_id == tg_id))
-        if not me:
-            return await message.answer("⚠️ Помилка доступу.")
+    me = await user_identities.get(tg_id)
+    if not me:
+        return await message.answer("⚠️ Помилка доступу.")
 
-        current = await state.get_state()
-        if current != ChatState.in_chat.state:
-            return
+    current = await state.get_state()
+    if current != ChatState.in_chat.state:
+        return
 
-        # Витягаємо активний thread_id
-        data = await state.get_data()
-        thread_id = data.get("thread_id")
+    # Витягаємо активний thread_id
+    data = await state.get_data()
+    thread_id = data.get("thread_id")
 
-        if not thread_id:
-            # Вперше обрано співрозмовника
-            if "(" in text and ")" in text:
-                thread_id = text.split("(")[-1].strip(")")
-                await state.update_data(thread_id=thread_id)
-                # Add a back button
-                kb = ReplyKeyboardMarkup(resize_keyboard=True)
-                kb.add(KeyboardButton("⬅️ Вийти з чату"))
-                return await message.answer("🔸 Напиши повідомлення — я передам його твоєму метчу.", reply_markup=kb)
-            else:
-                # Return to match selection if message format is invalid
-                return await message.answer("❌ Не знайдено thread_id, спробуйте знову обрати співрозмовника.")
+    if not thread_id:
+        # Вперше обрано співрозмовника
+        if "(" in text and ")" in text:
+            thread_id = text.split("(")[-1].strip(")")
+            if not await _is_member(thread_id, me.id):
+                return await message.answer("❌ Чат не знайдено, спробуйте знову обрати співрозмовника.")
+            await state.update_data(thread_id=thread_id)
+            async for session in get_session():
+                await mark_read(session, me.id, thread_id)
+                await session.commit()
+            kb = ReplyKeyboardMarkup(resize_keyboard=True)
+            kb.add(KeyboardButton("🤖 AI Порада"), KeyboardButton("📜 Історія"))
+            kb.add(KeyboardButton("⬅️ Вийти з чату"))
+            return await message.answer("🔸 Напиши повідомлення — я передам його твоєму метчу.", reply_markup=kb)
+        else:
+            # Return to match selection if message format is invalid
+            return await message.answer("❌ Не знайдено thread_id, спробуйте знову обрати співрозмовника.")
 
-        try:
-            # Зберігаємо повідомлення в БД
-            msg = Message(
-                thread_id=thread_id,
-                sender_id=me.id,
-                message_text=text
-            )
-            session.add(msg)
-            await session.flush()  # Make sure message is saved before proceeding
-            
-            # Знаходимо одержувача
-            match = await session.scalar(select(Match).where(Match.thread_id == thread_id))
-            if not match:
-                await message.answer("❌ Помилка: чат не знайдено. Спробуйте знову.")
-                await state.finish()
-                from app.keyboards.main_menu import get_main_menu
-                return await message.answer("Повертаємось до головного меню", 
-                                           reply_markup=get_main_menu(getattr(me, 'language', 'ua')))
-                
-            receiver_id = match.user_2_id if match.user_1_id == me.id else match.user_1_id
-            receiver = await session.scalar(select(User).where(User.id == receiver_id))
-    
-            # Надсилаємо повідомлення одержувачу
-            if receiver:
-                try:
-                    # Create keyboard for the receiver to reply with an AI assistant button
-                    receiver_kb = ReplyKeyboardMarkup(resize_keyboard=True)
-                    receiver_kb.add(KeyboardButton(f"💬 {me.first_name} ({thread_id})"))
-                    receiver_kb.add(KeyboardButton("🤖 AI Порада"), KeyboardButton("⬅️ Вийти з чату"))
-                    
-                    # Важливо! Встановлюємо стан отримувача вручну, щоб він міг відповідати
-                    from aiogram import Bot
-                    from aiogram.dispatcher import FSMContext
-                    from aiogram.dispatcher import Dispatcher
-                    
-                    # Отримуємо dispatcher з бота
-                    dp = Dispatcher.get_current()
-                    if dp:
-                        # Створюємо state для отримувача
-                        receiver_state = FSMContext(dp.storage, receiver.telegram_id, receiver.telegram_id)
-                        
-                        # Встановлюємо стан і thread_id для отримувача
-                        await receiver_state.set_state(ChatState.in_chat.state)
-                        await receiver_state.update_data(thread_id=thread_id)
-                        print(f"✅ Встановлено стан для отримувача {receiver.telegram_id}")
-                    
-                    # Надсилаємо повідомлення
-                    sent_msg = await message.bot.send_message(
-                        chat_id=int(receiver.telegram_id),
-                        text=f"💬 Повідомлення від {me.first_name}:\n\n{text}",
-                        reply_markup=receiver_kb
-                    )
-                    
-                    # Додаємо додаткову інструкцію для отримувача
-                    await message.bot.send_message(
-                        chat_id=int(receiver.telegram_id),
-                        text=f"🔹 Для відповіді {me.first_name} просто напишіть текст у цьому чаті"
-                    )
-                    
-                    # Update sender's keyboard to include AI advice button
-                    kb = ReplyKeyboardMarkup(resize_keyboard=True)
-                    kb.add(KeyboardButton("🤖 AI Порада"), KeyboardButton("⬅️ Вийти з чату"))
-                    await message.answer("✅ Повідомлення надіслано", reply_markup=kb)
-                except Exception as e:
-                    print(f"Помилка при відправці повідомлення: {e}")
-                    await message.answer(f"⚠️ Не вдалося доставити повідомлення: {e}")
-            else:
-                await message.answer("⚠️ Користувач не знайдений")
-        except Exception as e:
-            await message.answer(f"❌ Помилка при обробці повідомлення: {str(e)}")
+    try:
+        # Учасники треду з кешу: без запитів до БД на кожне повідомлення
+        thread = await chat_threads.get(thread_id)
+        receiver = thread.counterpart(me.id) if thread else None
+        if receiver is None:
+            await message.answer("❌ Помилка: чат не знайдено. Спробуйте знову.")
+            await state.finish()
+            from app.keyboards.main_menu import get_main_menu
+            return await message.answer("Повертаємось до головного меню", 
+                                       reply_markup=get_main_menu(getattr(me, 'language', 'ua')))
+
+        if block_index.ready:
+            blocked = block_index.blocked_between(me.id, receiver.id)
+        else:
+            blocked = await is_user_blocked(me.id, receiver.id) or await is_user_blocked(receiver.id, me.id)
+        if blocked:
+            return await message.answer("🚫 Повідомлення не доставлено: користувач недоступний.")
+
+        # Повідомлення і список матчів записуються пачкою у фоні (app/services/message_buffer.py)
+        message_buffer.add(thread_id, me.id, receiver.id, text)
 
-        # Commit all changes to database
+        # Важливо! Встановлюємо стан отримувача вручну, щоб він міг відповідати
+        receiver_state = FSMContext(Dispatcher.get_current().storage, receiver.telegram_id, receiver.telegram_id)
+        opened = (
+            await receiver_state.get_state() == ChatState.in_chat.state
+            and (await receiver_state.get_data()).get("thread_id") == thread_id
+        )
+        if not opened:
+            await receiver_state.set_state(ChatState.in_chat.state)
+            await receiver_state.update_data(thread_id=thread_id)
+
+        # Create keyboard for the receiver to reply with an AI assistant button
+        receiver_kb = ReplyKeyboardMarkup(resize_keyboard=True)
+        receiver_kb.add(KeyboardButton(f"💬 {me.first_name} ({thread_id})"))
+        receiver_kb.add(KeyboardButton("🤖 AI Порада"), KeyboardButton("⬅️ Вийти з чату"))
+
+        # Одне повідомлення отримувачу; підказка — лише коли його чат щойно переключено
+        hint = f"\n\n🔹 Для відповіді {me.first_name} просто напишіть текст у цьому чаті" if not opened else ""
         try:
-            await session.commit()
+            await message.bot.send_message(
+                chat_id=int(receiver.telegram_id),
+                text=f"💬 Повідомлення від {me.first_name}:\n\n{text}{hint}",
+                reply_markup=receiver_kb
+            )
         except Exception as e:
-            await session.rollback()
-            await message.answer(f"⚠️ Помилка при збереженні повідомлення: {str(e)}")
+            print(f"Помилка при відправці повідомлення: {e}")
+            await message.answer(f"⚠️ Не вдалося доставити повідомлення: {e}")
+    except Exception as e:
+        await message.answer(f"❌ Помилка при обробці повідомлення: {str(e)}")
 
 # Вихід із чату
 async def exit_chat(message: types.Message, state: FSMContext):
     # Get user language for main menu
     tg_id = str(message.from_user.id)
-    lang = 'ua'  # Default language
-    
-    async for session in get_session():
-        user = await session.scalar(select(User).where(User.telegram_id == tg_id))
-        if user and user.language:
-            lang = user.language
+    lang = await get_user_language(tg_id)
     
     # Import and show the main menu keyboard
     from app.keyboards.main_menu import get_main_menu
@@ -255,7 +353,7 @@ async def handle_report(callback_query: types.CallbackQuery):
         # Save report to database
         async for session in get_session():
             # Get user IDs from database
-            reporter = await session.scalar(select(User).where(User.telegram_id == reporter_id))
+            reporter = await user_identities.get(reporter_id)
             
             if reporter:
                 from app.models.reports import Report
@@ -286,14 +384,26 @@ async def auto_select_chat(message: types.Message, state: FSMContext):
     if "(" in text and ")" in text:
         thread_id = text.split("(")[-1].strip(")")
         logger.info(f"Автоматичний вибір чату з thread_id={thread_id}")
-        
+
+        # Обрати можна лише свій чат
+        me = await user_identities.get(tg_id)
+        if not me or not await _is_member(thread_id, me.id):
+            await message.answer("❌ Чат не знайдено.")
+            return True
+
         # Встановлюємо thread_id у стан
         await state.update_data(thread_id=thread_id)
         await ChatState.in_chat.set()
         
+        # Чат відкрито — непрочитані цього треду скидаються
+        async for session in get_session():
+            await mark_read(session, me.id, thread_id)
+            await session.commit()
+        
         # Показуємо клавіатуру з кнопками для чату
         kb = ReplyKeyboardMarkup(resize_keyboard=True)
-        kb.add(KeyboardButton("🤖 AI Порада"), KeyboardButton("⬅️ Вийти з чату"))
+        kb.add(KeyboardButton("🤖 AI Порада"), KeyboardButton("📜 Історія"))
+        kb.add(KeyboardButton("⬅️ Вийти з чату"))
         
         await message.answer("🔸 Тепер можете написати повідомлення — я передам його співрозмовнику.", reply_markup=kb)
         return True
@@ -318,6 +428,11 @@ def register_chat_handlers(dp: Dispatcher):
     except NameError:
         print("⚠️ Помилка: ai_advice_handler не знайдено. Функція AI поради не буде працювати.")
     
+    # Історія чату — теж до загального обробника повідомлень
+    dp.register_message_handler(chat_history_handler, lambda m: "📜" in m.text, state=ChatState.in_chat)
+    dp.register_callback_query_handler(history_page_handler, is_page_callback(HISTORY_PAGES), state=ChatState.in_chat)
+    dp.register_callback_query_handler(match_page_handler, is_page_callback(MATCH_PAGES), state="*")
+    
     # Автоматичний вибір співрозмовника при натисканні кнопки з thread_id
     dp.register_message_handler(auto_select_chat, lambda m: "💬" in m.text and "(" in m.text and ")" in m.text, state="*")
     
@@ -8,6 +8,8 @@ from app.database import get_session
 from app.models.user import User
 from app.models.payments import Payment, PaymentType, PaymentStatus
 from app.services.stripe import create_checkout_session
+from app.services.user_index import user_index
+from app.services.identity_cache import user_identities
 
 ADMIN_TELEGRAM_ID = 123456789  # 🔁 Заміни на свій Telegram ID
 
@@ -62,6 +64,8 @@ async def confirm_payment(message: types.Message):
         )
         session.add(payment)
         await session.commit()
+        user_index.upsert(user.id, is_premium=True)
+        user_identities.invalidate(tg_id)
 
         await message.answer("🎉 Платіж підтверджено. Ти Premium!", parse_mode="Markdown")
 
@@ -117,6 +121,8 @@ async def transfer_tokens(message: types.Message):
             timestamp=datetime.utcnow()
         ))
         await session.commit()
+        user_identities.invalidate(sender_tg_id)
+        user_identities.invalidate(recipient_tg_id)
 
         await message.answer(f"✅ Ти надіслав {net_amount} токенів. Комісія: {fee} токенів.")
         try:
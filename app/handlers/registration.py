@@ -7,7 +7,7 @@ from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemo
 from app.keyboards.registration import gender_keyboard, orientation_keyboard
 from app.keyboards.registration_menu import get_registration_menu
 from app.keyboards.main_menu import get_main_menu
-from app.services.user_service import create_or_get_user, update_user_field, get_user_language, save_user_photos, get_user_photos
+from app.services.user_service import create_or_get_user, update_user_field, get_user_language, save_user_photos, get_user_photos, save_user_location
 from sqlalchemy import select
 from app.models.user import User
 from app.database import get_session
@@ -414,6 +414,16 @@ async def process_bio(message: types.Message, state: FSMContext):
     await message.answer(f"✅ Біо збережено.")
     await cmd_profile(message, state)
 
+async def process_location(message: types.Message, state: FSMContext):
+    location = message.location
+    success = await save_user_location(str(message.from_user.id), location.latitude, location.longitude)
+
+    if success:
+        await message.answer("✅ Геолокацію збережено. Анкети будуть підбиратися з урахуванням відстані.")
+    else:
+        await message.answer("❌ Не вдалося зберегти геолокацію. Спочатку заповніть анкету.")
+    await cmd_profile(message, state)
+
 async def process_done_button(message: types.Message, state: FSMContext):
     # Получаем данные из состояния
     telegram_id = str(message.from_user.id)
@@ -485,4 +495,5 @@ def register_registration_handlers(dp: Dispatcher):
     dp.register_message_handler(process_bio_button, lambda m: "біо" in m.text.lower(), state="*")
     dp.register_message_handler(process_bio, state=RegistrationStates.waiting_for_bio)
     dp.register_message_handler(process_done_button, lambda m: "готово" in m.text.lower(), state="*")
+    dp.register_message_handler(process_location, content_types=types.ContentType.LOCATION, state="*")
 
@@ -6,7 +6,11 @@ from aiogram.dispatcher.filters.state import State, StatesGroup
 from app.services.user_service import get_user_language
 from app.keyboards.main_menu import get_main_menu
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from app.database import get_session
+from aiogram.utils.markdown import quote_html
+from app.database import get_session, read_session
+from app.booking.models import Place, Reservation
+from app.services.identity_cache import user_identities
+from app.services.pagination import Page, fetch_page, nav_buttons, page_request, is_page_callback
 from sqlalchemy import select
 import logging
 
@@ -15,6 +19,9 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Состояния для работы с бронированиями
+# Ключ списка бронирований в callback_data навигации
+RESERVATION_PAGES = "rs"
+
 class ReservationStates(StatesGroup):
     waiting_for_city = State()  # Ожидание ввода города
     waiting_for_place_type = State()  # Ожидание выбора типа места
@@ -87,21 +94,47 @@ async def on_reservation_my(callback_query: types.CallbackQuery):
     
     # Локализованные сообщения
     texts = {
-        "ua": "📋 *Ваші бронювання:*\n\nУ вас поки немає бронювань.",
-        "ru": "📋 *Ваши бронирования:*\n\nУ вас пока нет бронирований.",
-        "en": "📋 *Your reservations:*\n\nYou don't have any reservations yet.",
-        "de": "📋 *Ihre Buchungen:*\n\nSie haben noch keine Buchungen."
+        "ua": "📋 <b>Ваші бронювання:</b>\n\nУ вас поки немає бронювань.",
+        "ru": "📋 <b>Ваши бронирования:</b>\n\nУ вас пока нет бронирований.",
+        "en": "📋 <b>Your reservations:</b>\n\nYou don't have any reservations yet.",
+        "de": "📋 <b>Ihre Buchungen:</b>\n\nSie haben noch keine Buchungen."
+    }
+    titles = {
+        "ua": "📋 <b>Ваші бронювання:</b>",
+        "ru": "📋 <b>Ваши бронирования:</b>",
+        "en": "📋 <b>Your reservations:</b>",
+        "de": "📋 <b>Ihre Buchungen:</b>"
     }
     
-    # Здесь будем загружать бронирования из базы данных
-    reservations = []
+    # Кнопка "Мои бронирования" открывает первую страницу, навигация — pg:rs:...
+    # (повреждённый курсор — тоже первая страница)
+    direction, after = page_request(callback_query.data)
+    
+    page = Page([], None, None)
+    me = await user_identities.get(telegram_id)
+    if me:
+        async for session in read_session():
+            try:
+                stmt = (
+                    select(Reservation.id, Reservation.reservation_time, Place.name)
+                    .outerjoin(Place, Place.id == Reservation.place_id)
+                    .where(Reservation.user_id == me.id)
+                )
+                page = await fetch_page(session, stmt, [Reservation.id], lambda row: (row.id,), after, direction)
+            except Exception as e:
+                logger.error(f"Ошибка при загрузке бронирований: {e}")
     
-    if not reservations:
+    if not page.items:
         # Если бронирований нет
         message = texts.get(lang, texts["en"])
     else:
         # Если есть бронирования, формируем сообщение
-        pass
+        lines = [titles.get(lang, titles["en"]), ""]
+        for row in page.items:
+            when = row.reservation_time.strftime("%d.%m.%Y %H:%M") if row.reservation_time else "—"
+            # Название заведения вводит администратор — экранируем для HTML
+            lines.append(f"🗓 {when} — {quote_html(row.name) if row.name else '—'}")
+        message = "\n".join(lines)
     
     # Локализованные кнопки
     button_texts = {
@@ -112,9 +145,12 @@ async def on_reservation_my(callback_query: types.CallbackQuery):
     }
     
     markup = InlineKeyboardMarkup()
+    nav = nav_buttons(RESERVATION_PAGES, page)
+    if nav:
+        markup.row(*nav)
     markup.add(InlineKeyboardButton(button_texts.get(lang, button_texts["en"]), callback_data="reservation_back_to_menu"))
     
-    await callback_query.message.edit_text(message, reply_markup=markup, parse_mode="Markdown")
+    await callback_query.message.edit_text(message, reply_markup=markup, parse_mode="HTML")
     await callback_query.answer()
 
 # Обработчик для возврата в основное меню
@@ -229,6 +265,7 @@ def register_reservation_handlers(dp: Dispatcher):
     # Инлайн-кнопки меню бронирования
     dp.register_callback_query_handler(on_reservation_new, lambda c: c.data == "reservation_new", state="*")
     dp.register_callback_query_handler(on_reservation_my, lambda c: c.data == "reservation_my", state="*")
+    dp.register_callback_query_handler(on_reservation_my, is_page_callback(RESERVATION_PAGES), state="*")
     dp.register_callback_query_handler(on_reservation_back, lambda c: c.data == "reservation_back", state="*")
     dp.register_callback_query_handler(on_reservation_back_to_menu, lambda c: c.data == "reservation_back_to_menu", state="*")
     
@@ -7,6 +7,10 @@ from app.services.token_service import get_user_balance, update_user_balance, tr
 from app.services.user_service import get_user_by_telegram_id, get_user_language
 from app.keyboards.main_menu import get_main_menu
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+from app.services.pagination import nav_buttons, page_request, is_page_callback
+
+# Ключ списка истории токенов в callback_data навигации
+TOKEN_HISTORY_PAGES = "th"
 
 # Состояния для операций с токенами
 class TokenStates(StatesGroup):
@@ -371,15 +375,19 @@ async def on_cancel_token_operation(callback_query: types.CallbackQuery, state:
     await callback_query.answer()
 
 # Обработчик для отображения истории операций с токенами
+# (кнопка "token_history" — первая страница, кнопки навигации — pg:th:...)
 async def on_token_history(callback_query: types.CallbackQuery):
     telegram_id = str(callback_query.from_user.id)
     
     # Получаем язык пользователя
     lang = await get_user_language(telegram_id)
     
-    # Получаем историю операций с токенами
-    from app.services.token_service import get_token_history
-    history = await get_token_history(telegram_id, limit=10)
+    # Получаем страницу истории операций с токенами
+    from app.services.token_service import get_token_history_page
+    # Кнопка истории — первая страница, навигация — pg:th:... (повреждённый курсор — тоже первая)
+    direction, after = page_request(callback_query.data)
+    page = await get_token_history_page(telegram_id, after, direction)
+    history = page.items
     
     # Локализованные заголовки и сообщения
     headers = {
@@ -460,8 +468,11 @@ async def on_token_history(callback_query: types.CallbackQuery):
         message += f"Статус: {op_status}\n"
         message += f"Дата: {timestamp}\n\n"
     
-    # Добавляем кнопку возврата к балансу
+    # Навигация по страницам и кнопка возврата к балансу
     markup = InlineKeyboardMarkup()
+    nav = nav_buttons(TOKEN_HISTORY_PAGES, page)
+    if nav:
+        markup.row(*nav)
     markup.add(InlineKeyboardButton(h["back"], callback_data="token_back_to_balance"))
     
     # Отправляем сообщение с поддержкой Markdown
@@ -493,6 +504,7 @@ def register_token_handlers(dp: Dispatcher):
     dp.register_callback_query_handler(on_buy_tokens, lambda c: c.data.startswith("buy_tokens_"), state="*")
     dp.register_callback_query_handler(on_cancel_token_operation, lambda c: c.data == "cancel_token_operation", state="*")
     dp.register_callback_query_handler(on_token_history, lambda c: c.data == "token_history", state="*")
+    dp.register_callback_query_handler(on_token_history, is_page_callback(TOKEN_HISTORY_PAGES), state="*")
     dp.register_callback_query_handler(on_token_back_to_balance, lambda c: c.data == "token_back_to_balance", state="*")
     
     # Обработчики состояний для переводов
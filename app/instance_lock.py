@@ -0,0 +1,88 @@
+# файл: app/instance_lock.py
+"""
+Один процесс бота на базу — известное ограничение, а не свойство хранилища FSM.
+
+Хранилище FSM (app/fsm_storage.py) можно делить между процессами, но
+индексы в памяти (like_index, block_index, user_index), множества
+просмотренных анкет, очередь кандидатов и буферы записи живут в процессе и
+между процессами не синхронизируются: второй процесс не видел бы чужих
+лайков и блокировок, пропускал бы матчи и показывал бы уже просмотренные
+анкеты. Поэтому бот держит сессионную advisory-блокировку на отдельном
+соединении: второй процесс с той же базой ждёт, пока первый не остановится
+(удобно при перезапуске без простоя), и только потом начинает опрос Telegram.
+"""
+
+import asyncio
+import logging
+import asyncpg
+from app.config import POSTGRES_URL
+
+logger = logging.getLogger(__name__)
+
+# 'bot ' — отличается от ключа блокировки миграций (app/migrations.py)
+_LOCK_KEY = 0x626F7420
+# Как часто проверять блокировку и соединение, секунды
+_CHECK_INTERVAL = 5
+
+
+class InstanceLock:
+    def __init__(self):
+        self._conn = None
+
+    @property
+    def held(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def _try_acquire(self) -> bool:
+        dsn = POSTGRES_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+        conn = await asyncpg.connect(dsn)
+        if await conn.fetchval("SELECT pg_try_advisory_lock($1)", _LOCK_KEY):
+            self._conn = conn
+            return True
+        await conn.close()
+        return False
+
+    async def acquire(self):
+        """
+        Ждёт, пока другой процесс бота не освободит блокировку (при старте бота)
+        """
+        if self.held:
+            return
+        waiting = False
+        while not await self._try_acquire():
+            if not waiting:
+                waiting = True
+                logger.warning("⏳ Другой процесс бота уже работает с этой базой, ждём его остановки...")
+            await asyncio.sleep(_CHECK_INTERVAL)
+        logger.info("🔒 Блокировка процесса бота получена")
+
+    async def run_watchdog(self, on_lost):
+        """
+        Следит за соединением с блокировкой. Если оно оборвалось и блокировку
+        успел взять другой процесс, вызывает on_lost() — этот процесс должен остановиться
+        """
+        while True:
+            await asyncio.sleep(_CHECK_INTERVAL)
+            if self.held:
+                continue
+            try:
+                if await self._try_acquire():
+                    logger.warning("🔒 Соединение с блокировкой процесса восстановлено")
+                    continue
+            except Exception as e:
+                logger.error(f"Не удалось восстановить блокировку процесса: {e}")
+                continue
+            logger.critical("Блокировку процесса бота получил другой процесс — останавливаемся")
+            on_lost()
+            return
+
+    async def release(self):
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+
+instance_lock = InstanceLock()
@@ -12,6 +12,7 @@ def get_registration_menu(lang: str):
             "city":     "📍 Місто",
             "photos":   "📷 Фото",
             "bio":      "📝 Біо",
+            "location": "🗺 Геолокація",
             "done":     "✅ Готово"
         },
         "ru": {
@@ -22,6 +23,7 @@ def get_registration_menu(lang: str):
             "city":     "📍 Город",
             "photos":   "📷 Фото",
             "bio":      "📝 Био",
+            "location": "🗺 Геолокация",
             "done":     "✅ Готово"
         },
         "en": {
@@ -32,6 +34,7 @@ def get_registration_menu(lang: str):
             "city":     "📍 City",
             "photos":   "📷 Photos",
             "bio":      "📝 Bio",
+            "location": "🗺 Location",
             "done":     "✅ Done"
         },
         "de": {
@@ -42,6 +45,7 @@ def get_registration_menu(lang: str):
             "city":     "📍 Stadt",
             "photos":   "📷 Fotos",
             "bio":      "📝 Bio",
+            "location": "🗺 Standort",
             "done":     "✅ Fertig"
         }
     }
@@ -54,6 +58,6 @@ def get_registration_menu(lang: str):
     kb.add(KeyboardButton(t["name"]), KeyboardButton(t["gender"]))
     kb.add(KeyboardButton(t["orientation"]), KeyboardButton(t["age"]))
     kb.add(KeyboardButton(t["city"]), KeyboardButton(t["photos"]))
-    kb.add(KeyboardButton(t["bio"]))
+    kb.add(KeyboardButton(t["bio"]), KeyboardButton(t["location"], request_location=True))
     kb.add(KeyboardButton(t["done"]))
     return kb
@@ -0,0 +1,283 @@
+# файл: app/message_partitions.py
+"""
+Обслуживание секций dating_bot.messages (миграция 0009).
+
+- заранее создаёт секции на MESSAGES_PARTITIONS_AHEAD месяцев вперёд;
+- секции старше MESSAGES_HOT_MONTHS выгружает в сжатый JSONL
+  (MESSAGES_ARCHIVE_DIR/messages_YYYY_MM.jsonl.zst или .gz, если пакета
+  zstandard нет), после чего отсоединяет и удаляет;
+- читает архив по запросу: read_archived_thread(thread_id).
+
+Бот запускает обслуживание раз в MESSAGES_MAINTENANCE_INTERVAL секунд;
+вручную:
+    python -m app.message_partitions             # секции вперёд и архивирование
+    python -m app.message_partitions --list      # секции и архивы
+    python -m app.message_partitions --thread T  # сообщения треда из архива
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+from collections import deque
+from datetime import date, datetime
+from app.config import (
+    MESSAGES_HOT_MONTHS, MESSAGES_PARTITIONS_AHEAD, MESSAGES_ARCHIVE_DIR, MESSAGES_MAINTENANCE_INTERVAL
+)
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_PARTITION_NAME = re.compile(r"^messages_(\d{4})_(\d{2})$")
+_ARCHIVE_NAME = re.compile(r"^messages_(\d{4})_(\d{2})\.jsonl\.(zst|gz)$")
+
+# Ключ advisory lock: обслуживание выполняет один процесс
+_LOCK_KEY = 0x6D736770
+
+# Сколько строк читать из секции за один FETCH при выгрузке
+_FETCH_ROWS = 5000
+
+# Сколько ждать блокировок секции и messages при отсоединении; иначе повтор в следующий раз
+_LOCK_TIMEOUT = "5s"
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"messages_{month:%Y_%m}"
+
+
+async def _partitions(conn) -> dict:
+    """
+    Месячные секции: date (первое число месяца) -> имя таблицы
+    """
+    rows = await conn.fetch(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "JOIN pg_namespace n ON n.oid = p.relnamespace "
+        "WHERE n.nspname = 'dating_bot' AND p.relname = 'messages'"
+    )
+    partitions = {}
+    for row in rows:
+        match = _PARTITION_NAME.match(row["relname"])
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = row["relname"]
+    return partitions
+
+
+async def ensure_partitions(conn, months_ahead: int = MESSAGES_PARTITIONS_AHEAD) -> list:
+    """
+    Создаёт недостающие секции от текущего месяца до months_ahead вперёд
+    """
+    existing = await _partitions(conn)
+    current = date.today().replace(day=1)
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(current, offset)
+        if month in existing:
+            continue
+        name = _partition_name(month)
+        try:
+            await conn.execute(
+                f"CREATE TABLE IF NOT EXISTS dating_bot.{name} PARTITION OF dating_bot.messages "
+                f"FOR VALUES FROM ('{month}') TO ('{_add_months(month, 1)}')"
+            )
+            created.append(name)
+        except Exception as e:
+            # Например, строки этого месяца уже лежат в секции DEFAULT
+            logger.error(f"Не удалось создать секцию {name}: {e}")
+    if created:
+        logger.info(f"📦 Созданы секции сообщений: {', '.join(created)}")
+    return created
+
+
+def _archive_path(directory: str, month: date) -> str:
+    extension = "zst" if zstandard is not None else "gz"
+    return os.path.join(directory, f"{_partition_name(month)}.jsonl.{extension}")
+
+
+def _open_archive(path: str, mode: str):
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"Для чтения {path} нужен пакет zstandard")
+        if "w" in mode:
+            return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(level=10))
+        return zstandard.open(path, mode)
+    return gzip.open(path, mode)
+
+
+async def archive_partition(conn, month: date, name: str, directory: str = MESSAGES_ARCHIVE_DIR) -> int:
+    """
+    Выгружает секцию в архив, затем отсоединяет и удаляет её.
+    Возвращает число архивированных строк
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = _archive_path(directory, month)
+    temporary = path + ".tmp"
+    rows = 0
+
+    # Курсор читает секцию порциями: память не зависит от её размера
+    with _open_archive(temporary, "wt") as f:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            async for row in conn.cursor(
+                f"SELECT id, thread_id, sender_id, message_text, created_at "
+                f"FROM dating_bot.{name} ORDER BY thread_id, created_at, id",
+                prefetch=_FETCH_ROWS
+            ):
+                f.write(json.dumps({
+                    "id": row["id"],
+                    "thread_id": row["thread_id"],
+                    "sender_id": row["sender_id"],
+                    "message_text": row["message_text"],
+                    "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+                }, ensure_ascii=False) + "\n")
+                rows += 1
+        f.flush()
+    os.replace(temporary, path)
+
+    async with conn.transaction():
+        # Сначала блокируем секцию: между подсчётом и DETACH в неё уже никто не запишет.
+        # lock_timeout не даёт ожиданию блокировки задержать запись сообщений надолго
+        await conn.execute(f"SET LOCAL lock_timeout = '{_LOCK_TIMEOUT}'")
+        await conn.execute(f"LOCK TABLE dating_bot.{name} IN ACCESS EXCLUSIVE MODE")
+        count = await conn.fetchval(f"SELECT count(*) FROM dating_bot.{name}")
+        if count != rows:
+            # В секцию писали во время выгрузки — повторим в следующий раз
+            raise RuntimeError(f"Секция {name} изменилась во время архивирования ({rows} -> {count})")
+        await conn.execute(f"ALTER TABLE dating_bot.messages DETACH PARTITION dating_bot.{name}")
+        await conn.execute(f"DROP TABLE dating_bot.{name}")
+
+    logger.info(f"🗄 Секция {name} архивирована в {path}: {rows} сообщений")
+    return rows
+
+
+async def archive_old_partitions(conn, hot_months: int = MESSAGES_HOT_MONTHS,
+                                 directory: str = MESSAGES_ARCHIVE_DIR) -> list:
+    """
+    Архивирует секции старше hot_months месяцев (текущий месяц входит в hot_months)
+    """
+    oldest_hot = _add_months(date.today().replace(day=1), -(hot_months - 1))
+    archived = []
+    for month, name in sorted((await _partitions(conn)).items()):
+        if month >= oldest_hot:
+            break
+        try:
+            await archive_partition(conn, month, name, directory)
+            archived.append(name)
+        except Exception as e:
+            logger.error(f"Ошибка архивирования секции {name}: {e}")
+    return archived
+
+
+async def maintain() -> dict:
+    """
+    Один проход обслуживания: секции вперёд и архивирование старых
+    """
+    async with engine.connect() as sa_conn:
+        raw = await sa_conn.get_raw_connection()
+        conn = raw.driver_connection
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", _LOCK_KEY):
+            logger.info("Обслуживание секций сообщений уже выполняет другой процесс")
+            return {}
+        try:
+            return {
+                "created": await ensure_partitions(conn),
+                "archived": await archive_old_partitions(conn),
+            }
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _LOCK_KEY)
+
+
+async def run_maintenance_loop(interval: float = MESSAGES_MAINTENANCE_INTERVAL):
+    """
+    Фоновая задача бота: обслуживание при старте и затем раз в interval секунд
+    """
+    while True:
+        try:
+            await maintain()
+        except Exception as e:
+            logger.error(f"Ошибка обслуживания секций сообщений: {e}")
+        await asyncio.sleep(interval)
+
+
+def archives(directory: str = MESSAGES_ARCHIVE_DIR) -> list:
+    """
+    [(месяц, путь)] архивов от новых к старым
+    """
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for filename in os.listdir(directory):
+        match = _ARCHIVE_NAME.match(filename)
+        if match:
+            found.append((date(int(match.group(1)), int(match.group(2)), 1), os.path.join(directory, filename)))
+    return sorted(found, reverse=True)
+
+
+def read_archived_thread(thread_id: str, limit: int = 20, before: datetime = None,
+                         directory: str = MESSAGES_ARCHIVE_DIR) -> list:
+    """
+    Последние limit сообщений треда из архива (старше before), от новых к старым.
+
+    Архивы просматриваются от новых месяцев к старым и читаются потоком;
+    чтение останавливается, как только набрано limit сообщений
+    """
+    found = []
+    for month, path in archives(directory):
+        if before is not None and month > before.date():
+            continue
+        # Строки в архиве отсортированы по треду и времени: храним только хвост треда
+        tail = deque(maxlen=limit - len(found))
+        in_thread = False
+        with _open_archive(path, "rt") as f:
+            for line in f:
+                record = json.loads(line)
+                if record["thread_id"] != thread_id:
+                    if in_thread:
+                        break
+                    continue
+                in_thread = True
+                if before is not None and record["created_at"] and datetime.fromisoformat(record["created_at"]) >= before:
+                    continue
+                tail.append(record)
+        found.extend(reversed(tail))
+        if len(found) >= limit:
+            break
+    return found
+
+
+async def _main(args):
+    if args.list:
+        async with engine.connect() as sa_conn:
+            raw = await sa_conn.get_raw_connection()
+            for month, name in sorted((await _partitions(raw.driver_connection)).items()):
+                print(f"partition {name}")
+        for month, path in archives():
+            print(f"archive   {path}")
+    elif args.thread:
+        for record in read_archived_thread(args.thread, args.limit):
+            print(f"{record['created_at']} [{record['sender_id']}] {record['message_text']}")
+    else:
+        print(await maintain())
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Секции и архив сообщений dating_bot")
+    parser.add_argument("--list", action="store_true", help="Показать секции и архивы")
+    parser.add_argument("--thread", default=None, help="Прочитать тред из архива")
+    parser.add_argument("--limit", type=int, default=20)
+    asyncio.run(_main(parser.parse_args()))
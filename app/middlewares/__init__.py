@@ -0,0 +1,7 @@
+# файл: app/middlewares/__init__.py
+
+from app.middlewares.loaders import LoaderMiddleware
+from app.middlewares.session import SessionMiddleware
+from app.middlewares.sql_stats import SqlStatsMiddleware
+
+__all__ = ["LoaderMiddleware", "SessionMiddleware", "SqlStatsMiddleware"]
@@ -0,0 +1,19 @@
+# файл: app/middlewares/loaders.py
+
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from app.services.loaders import begin_scope, end_scope
+
+
+class LoaderMiddleware(BaseMiddleware):
+    """
+    Создаёт свежий набор DataLoader на каждый апдейт, чтобы кеш загрузчиков
+    не переживал обработку одного сообщения или callback
+    """
+
+    async def on_pre_process_update(self, update, data: dict):
+        data["_loaders_token"] = begin_scope()
+
+    async def on_post_process_update(self, update, results, data: dict):
+        token = data.pop("_loaders_token", None)
+        if token is not None:
+            end_scope(token)
@@ -0,0 +1,43 @@
+# файл: app/middlewares/session.py
+
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from app.database import begin_unit_of_work, end_unit_of_work, current_unit_of_work
+
+
+class SessionMiddleware(BaseMiddleware):
+    """
+    Unit of work на апдейт: усі get_session() в задачі апдейту (обробники,
+    сервіси, завантаження кешів і DataLoader) отримують одну сесію, яка
+    фіксується один раз після обробки або відкочується, якщо обробка
+    завершилась помилкою. Задачі, запущені з апдейту (asyncio.gather з
+    корутинами, ensure_future), працюють зі своїми сесіями і з'єднаннями.
+
+    Обробники можуть також прийняти сесію аргументом `session`.
+    """
+
+    async def on_pre_process_update(self, update, data: dict):
+        event = update.message or update.callback_query or update.edited_message or update.inline_query
+        user = getattr(event, "from_user", None)
+        data["_uow_token"] = begin_unit_of_work(str(user.id) if user else None)
+
+    async def on_process_message(self, message, data: dict):
+        self._expose(data)
+
+    async def on_process_callback_query(self, callback_query, data: dict):
+        self._expose(data)
+
+    async def on_pre_process_error(self, update, error, data: dict):
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.failed = True
+
+    async def on_post_process_update(self, update, results, data: dict):
+        token = data.pop("_uow_token", None)
+        if token is not None:
+            await end_unit_of_work(token)
+
+    @staticmethod
+    def _expose(data: dict):
+        uow = current_unit_of_work()
+        if uow is not None:
+            data["session"] = uow.get()
@@ -0,0 +1,19 @@
+# файл: app/middlewares/sql_stats.py
+
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from app.db_metrics import sql_stats
+
+
+class SqlStatsMiddleware(BaseMiddleware):
+    """
+    Трасса SQL-запросов апдейта: число запросов и время в БД по хендлерам,
+    поиск N+1 (одна форма запроса много раз за апдейт)
+    """
+
+    async def on_pre_process_update(self, update, data: dict):
+        data["_sql_trace_token"] = sql_stats.begin_update()
+
+    async def on_post_process_update(self, update, results, data: dict):
+        token = data.pop("_sql_trace_token", None)
+        if token is not None:
+            sql_stats.end_update(token)
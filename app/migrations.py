@@ -0,0 +1,276 @@
+# файл: app/migrations.py
+"""
+Версионированные миграции схемы из каталога migrations/.
+
+Имя файла миграции — NNNN_описание.sql. Применённые версии записываются в
+dating_bot.schema_version, каждая миграция выполняется один раз и целиком
+в одной транзакции вместе с записью версии.
+
+Миграция с директивой `-- migrate: no-transaction` выполняется вне
+транзакции, по одному оператору: так строятся индексы CONCURRENTLY.
+
+Запуск:
+    python -m app.migrations             # применить новые миграции
+    python -m app.migrations --status    # показать состояние
+
+Отпечаток схемы (миграции, schema.sql и модели) хранится в единственной
+строке dating_bot.schema_state: при быстром старте бот сверяет только её.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+_FILE_PATTERN = re.compile(r"^(\d{4})_(\w+)\.sql$")
+_NO_TRANSACTION = re.compile(r"^--\s*migrate:\s*no-transaction\s*$", re.MULTILINE)
+_CONCURRENT_INDEX = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+ON\s+(\w+)\.",
+    re.IGNORECASE
+)
+
+# Ключ advisory lock: миграции применяет только один процесс одновременно
+_LOCK_KEY = 0x6D696772
+
+_CREATE_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS dating_bot.schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    duration_ms INTEGER
+)
+"""
+
+_CREATE_STATE_TABLE = """
+CREATE TABLE IF NOT EXISTS dating_bot.schema_state (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    fingerprint TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class Migration:
+    """Один файл миграции"""
+
+    __slots__ = ("version", "name", "path", "sql", "checksum", "transactional")
+
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, "r", encoding="utf-8") as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+        self.transactional = not _NO_TRANSACTION.search(self.sql)
+
+    def statements(self) -> list:
+        """
+        Операторы миграции по одному (для миграций вне транзакции).
+        Такие миграции не должны содержать блоков DO $$ ... $$
+        """
+        lines = [line for line in self.sql.splitlines() if not line.strip().startswith("--")]
+        return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> list:
+    """
+    Миграции из каталога в порядке версий
+    """
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILE_PATTERN.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+        elif filename.endswith(".sql"):
+            logger.warning(f"Файл миграции без номера версии пропущен: {filename}")
+
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Повторяющиеся номера версий в migrations/")
+    return migrations
+
+
+async def _applied(conn) -> dict:
+    rows = await conn.fetch("SELECT version, checksum, applied_at FROM dating_bot.schema_version")
+    return {row["version"]: row for row in rows}
+
+
+async def _acquire_lock(conn):
+    # Ждём без блокирующего pg_advisory_lock: ожидающий запрос держал бы снимок,
+    # а CREATE INDEX CONCURRENTLY в другом процессе ждёт завершения всех снимков
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", _LOCK_KEY):
+        await asyncio.sleep(1)
+
+
+async def _drop_invalid_index(conn, statement: str):
+    """
+    Прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс, который
+    IF NOT EXISTS пропустил бы — такой индекс удаляется перед повтором
+    """
+    match = _CONCURRENT_INDEX.search(statement)
+    if not match:
+        return
+    name, schema = match.groups()
+    invalid = await conn.fetchval(
+        "SELECT NOT i.indisvalid FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = $1 AND c.relname = $2",
+        schema, name
+    )
+    if invalid:
+        logger.warning(f"Удаляем невалидный индекс {schema}.{name} перед повторным построением")
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema}.{name}")
+
+
+async def _apply(conn, migration: Migration):
+    started = time.perf_counter()
+    record = (
+        "INSERT INTO dating_bot.schema_version (version, name, checksum, duration_ms) "
+        "VALUES ($1, $2, $3, $4)"
+    )
+
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await conn.execute(record, migration.version, migration.name, migration.checksum,
+                               int((time.perf_counter() - started) * 1000))
+    else:
+        # Каждый оператор фиксируется сам; операторы должны быть идемпотентными,
+        # чтобы миграцию можно было повторить после сбоя
+        for statement in migration.statements():
+            await _drop_invalid_index(conn, statement)
+            await conn.execute(statement)
+        await conn.execute(record, migration.version, migration.name, migration.checksum,
+                           int((time.perf_counter() - started) * 1000))
+
+    logger.info(f"✅ Миграция {migration.version:04d}_{migration.name} применена "
+                f"за {time.perf_counter() - started:.2f} с")
+
+
+async def migrate(target: int = None) -> list:
+    """
+    Применяет ещё не применённые миграции (до версии target включительно).
+    Возвращает список применённых версий
+    """
+    migrations = [m for m in discover() if target is None or m.version <= target]
+    applied_now = []
+
+    async with engine.connect() as sa_conn:
+        raw = await sa_conn.get_raw_connection()
+        conn = raw.driver_connection
+        await conn.execute("CREATE SCHEMA IF NOT EXISTS dating_bot")
+        await conn.execute(_CREATE_VERSION_TABLE)
+        await _acquire_lock(conn)
+        try:
+            applied = await _applied(conn)
+            for migration in migrations:
+                row = applied.get(migration.version)
+                if row is not None:
+                    if row["checksum"] != migration.checksum:
+                        logger.warning(f"Миграция {migration.version:04d}_{migration.name} "
+                                       f"изменена после применения")
+                    continue
+                logger.info(f"📦 Применяем миграцию {migration.version:04d}_{migration.name}...")
+                await _apply(conn, migration)
+                applied_now.append(migration.version)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _LOCK_KEY)
+
+    if not applied_now:
+        logger.info("✅ Схема актуальна, новых миграций нет")
+    return applied_now
+
+
+async def status() -> list:
+    """
+    [(migration, applied_at или None), ...] по всем файлам миграций
+    """
+    async with engine.connect() as sa_conn:
+        raw = await sa_conn.get_raw_connection()
+        conn = raw.driver_connection
+        exists = await conn.fetchval("SELECT to_regclass('dating_bot.schema_version') IS NOT NULL")
+        applied = await _applied(conn) if exists else {}
+    return [(migration, applied[migration.version]["applied_at"] if migration.version in applied else None)
+            for migration in discover()]
+
+
+def schema_fingerprint() -> str:
+    """
+    Отпечаток ожидаемой схемы: версии и содержимое миграций, schema.sql и
+    таблицы/колонки моделей SQLAlchemy. Меняется при любом изменении схемы в коде
+    """
+    from app.models import Base
+
+    digest = hashlib.sha256()
+    for migration in discover():
+        digest.update(f"{migration.version}:{migration.checksum}\n".encode())
+    schema_path = os.path.join(os.path.dirname(MIGRATIONS_DIR), "schema.sql")
+    with open(schema_path, "rb") as f:
+        digest.update(f.read())
+    for table in sorted(Base.metadata.tables.values(), key=lambda table: table.fullname):
+        columns = ",".join(f"{column.name}:{column.type!r}" for column in table.columns)
+        digest.update(f"{table.fullname}({columns})\n".encode())
+    return digest.hexdigest()
+
+
+async def schema_is_current() -> bool:
+    """
+    Одна строка из schema_state: совпадает ли отпечаток схемы в базе с кодом
+    """
+    try:
+        async with engine.connect() as sa_conn:
+            raw = await sa_conn.get_raw_connection()
+            stored = await raw.driver_connection.fetchval(
+                "SELECT fingerprint FROM dating_bot.schema_state WHERE id = 1"
+            )
+    except Exception as e:
+        # Таблицы ещё нет (первый запуск) или база недоступна — полная инициализация
+        logger.info(f"Быстрый старт недоступен: {e}")
+        return False
+    return stored == schema_fingerprint()
+
+
+async def mark_schema_current():
+    """
+    Записывает отпечаток схемы после успешной полной инициализации
+    """
+    async with engine.connect() as sa_conn:
+        raw = await sa_conn.get_raw_connection()
+        conn = raw.driver_connection
+        await conn.execute(_CREATE_STATE_TABLE)
+        await conn.execute(
+            "INSERT INTO dating_bot.schema_state (id, fingerprint) VALUES (1, $1) "
+            "ON CONFLICT (id) DO UPDATE SET fingerprint = EXCLUDED.fingerprint, updated_at = CURRENT_TIMESTAMP",
+            schema_fingerprint()
+        )
+
+
+async def _main(args):
+    if args.status:
+        for migration, applied_at in await status():
+            mark = f"applied {applied_at:%Y-%m-%d %H:%M}" if applied_at else "pending"
+            mode = "" if migration.transactional else " (no-transaction)"
+            print(f"{migration.version:04d}_{migration.name}{mode}: {mark}")
+    else:
+        await migrate(args.target)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Миграции схемы dating_bot")
+    parser.add_argument("--status", action="store_true", help="Показать применённые и ожидающие миграции")
+    parser.add_argument("--target", type=int, default=None, help="Применить миграции до этой версии включительно")
+    asyncio.run(_main(parser.parse_args()))
@@ -8,6 +8,8 @@ from app.models.swipes import Swipe
 from app.models.match import Match
 from app.models.reports import Report
 from app.models.messages import Message
+from app.models.seen_snapshots import SeenSnapshot
+from app.models.match_summaries import MatchSummary
 
 # Add more model imports as needed
 
@@ -18,5 +20,7 @@ __all__ = [
     'Swipe', 
     'Match', 
     'Report',
-    'Message'
+    'Message',
+    'SeenSnapshot',
+    'MatchSummary'
 ]
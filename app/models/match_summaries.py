@@ -0,0 +1,31 @@
+# файл: app/models/match_summaries.py
+
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+class MatchSummary(Base):
+    """
+    Строка списка матчей для одного участника (по строке на каждую сторону матча).
+    Денормализована: имя собеседника и последнее сообщение, чтобы список
+    строился одним запросом по индексу (user_id, last_activity_at, match_id)
+    """
+    __tablename__ = "match_summaries"
+    __table_args__ = (
+        Index("idx_match_summaries_user_activity", "user_id", "last_activity_at", "match_id"),
+        Index("idx_match_summaries_thread", "thread_id"),
+        Index("idx_match_summaries_counterpart", "counterpart_id"),
+        {'schema': 'dating_bot'}
+    )
+
+    user_id = Column(Integer, ForeignKey("dating_bot.users.id", ondelete="CASCADE"), primary_key=True)
+    match_id = Column(Integer, ForeignKey("dating_bot.matches.id", ondelete="CASCADE"), primary_key=True)
+    thread_id = Column(String, nullable=False)
+    counterpart_id = Column(Integer, ForeignKey("dating_bot.users.id", ondelete="CASCADE"), nullable=False)
+    counterpart_name = Column(String)
+    last_message_text = Column(Text)
+    last_sender_id = Column(Integer)
+    last_message_at = Column(DateTime(timezone=True))
+    # Время последнего сообщения, а до первого — время создания матча
+    last_activity_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    unread_count = Column(Integer, nullable=False, default=0)
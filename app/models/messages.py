@@ -15,8 +15,11 @@ class Message(Base):
     def __table_args__(cls):
         return {'schema': 'dating_bot'}
 
+    # Таблица секционирована по месяцам created_at (migrations/0009): в базе
+    # первичный ключ (id, created_at), id выдаёт общая последовательность.
+    # thread_id — без внешнего ключа на matches (см. migrations/0009)
     id = Column(Integer, primary_key=True)
-    thread_id = Column(String, ForeignKey("dating_bot.matches.thread_id"))
+    thread_id = Column(String, nullable=False)
     sender_id = Column(Integer, ForeignKey("dating_bot.users.id"))
     message_text = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
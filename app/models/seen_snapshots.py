@@ -0,0 +1,15 @@
+# файл: app/models/seen_snapshots.py
+
+from sqlalchemy import Column, Integer, ForeignKey, LargeBinary, DateTime
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+class SeenSnapshot(Base):
+    """Снимок множества просмотренных анкет пользователя (сериализованный bitmap)"""
+    __tablename__ = "seen_snapshots"
+    __table_args__ = ({'schema': 'dating_bot'})
+
+    user_id = Column(Integer, ForeignKey("dating_bot.users.id", ondelete="CASCADE"), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    last_swipe_id = Column(Integer, nullable=False, default=0)  # свайпы с большим id догружаются из swipes
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())  # TIMESTAMP, как в migrations/0004
@@ -1,6 +1,6 @@
 # файл: app/models/swipes.py
 
-from sqlalchemy import Column, Integer, ForeignKey, Boolean, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Boolean, DateTime, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.ext.declarative import declared_attr
@@ -13,7 +13,11 @@ class Swipe(Base):
     
     @declared_attr
     def __table_args__(cls):
-        return {'schema': 'dating_bot'}
+        return (
+            # Повторный свайп той же анкеты (двойное нажатие) не создаёт новую строку
+            UniqueConstraint("swiper_id", "swiped_id", name="uq_swiper_swiped"),
+            {'schema': 'dating_bot'}
+        )
 
     id = Column(Integer, primary_key=True)
     swiper_id = Column(Integer, ForeignKey("dating_bot.users.id", ondelete="CASCADE"))
@@ -46,4 +46,6 @@ class User(Base):
     token_balance = Column(Integer, default=0)
     is_premium = Column(Boolean, default=False)
     is_admin = Column(Boolean, default=False)
+    latitude = Column(Float)  # Геолокація з Telegram (необов'язково)
+    longitude = Column(Float)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,280 @@
+# файл: app/services/answer_vectors.py
+
+import logging
+import numpy as np
+from sqlalchemy import text
+from app.config import ANSWER_BRUTE_FORCE_MAX, ANSWER_LSH_TABLES, ANSWER_LSH_BITS
+from app.database import get_session
+from app.services.user_index import user_index
+
+logger = logging.getLogger(__name__)
+
+# Вопросы с большим числом разных ответов (свободный текст) в вектор не попадают
+MAX_OPTIONS_PER_QUESTION = 16
+
+# Число единичных бит в каждом байте (для NumPy без bitwise_count)
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def _popcount_rows(words: np.ndarray) -> np.ndarray:
+    """Число единичных бит в каждой строке матрицы uint64"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[words.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+class AnswerVocabulary:
+    """
+    Раскладка бит вектора: каждому варианту ответа (question_id, answer) — свой бит
+    """
+
+    def __init__(self):
+        self._bits = {}
+        self._options = {}
+
+    def __len__(self) -> int:
+        return len(self._bits)
+
+    def bit(self, question_id: int, answer: str, create: bool = True):
+        key = (question_id, answer)
+        bit = self._bits.get(key)
+        if bit is None and create:
+            options = self._options.setdefault(question_id, 0)
+            if options >= MAX_OPTIONS_PER_QUESTION:
+                return None
+            self._options[question_id] = options + 1
+            bit = len(self._bits)
+            self._bits[key] = bit
+        return bit
+
+
+class _LshTables:
+    """
+    Локальный ANN-индекс: L таблиц случайных гиперплоскостей (SimHash) над
+    центрированными векторами ответов. Кандидаты из совпавших корзин затем
+    переоцениваются точно.
+    """
+
+    def __init__(self, dims: int, tables: int, bits: int, mean: np.ndarray, seed: int = 17):
+        rng = np.random.default_rng(seed)
+        self.bits = bits
+        self.mean = mean.astype(np.float32)
+        self.planes = rng.standard_normal((tables, dims, bits)).astype(np.float32)
+        self.weights = (1 << np.arange(bits, dtype=np.int64))
+        self.buckets = [dict() for _ in range(tables)]
+        self.signature_of_row = {}
+
+    def signatures(self, dense: np.ndarray) -> np.ndarray:
+        """Подписи (rows x tables) для распакованных векторов"""
+        centered = dense.astype(np.float32) - self.mean
+        projected = np.einsum("nd,tdb->ntb", centered, self.planes) > 0
+        return projected.astype(np.int64) @ self.weights
+
+    def add(self, rows: np.ndarray, dense: np.ndarray):
+        for row, signature in zip(rows.tolist(), self.signatures(dense).tolist()):
+            self.remove(row)
+            for table, key in enumerate(signature):
+                self.buckets[table].setdefault(key, []).append(row)
+            self.signature_of_row[row] = signature
+
+    def remove(self, row: int):
+        signature = self.signature_of_row.pop(row, None)
+        if signature is None:
+            return
+        for table, key in enumerate(signature):
+            bucket = self.buckets[table].get(key)
+            if bucket is not None and row in bucket:
+                bucket.remove(row)
+
+    def query(self, dense: np.ndarray, probe: bool = True) -> np.ndarray:
+        """
+        Строки из корзин запроса (с повторами); с probe — ещё и из соседних
+        корзин (подпись отличается одним битом), что заметно повышает полноту
+        """
+        signature = self.signatures(dense[None, :])[0].tolist()
+        flips = [0] + ([1 << bit for bit in range(self.bits)] if probe else [])
+        rows = []
+        for table, key in enumerate(signature):
+            buckets = self.buckets[table]
+            for flip in flips:
+                rows.extend(buckets.get(key ^ flip, ()))
+        return np.asarray(rows, dtype=np.int64)
+
+
+class AnswerIndex:
+    """
+    Упакованные (битовые) векторы ответов анкеты, выровненные по строкам
+    колоночного индекса анкет.
+
+    Совместимость — косинусная близость бинарных векторов: число совпавших
+    вариантов ответа, делённое на sqrt(|a| * |b|). Небольшие пулы
+    просчитываются полным перебором, большие — через LSH-таблицы.
+    """
+
+    def __init__(self, index, brute_force_max: int = ANSWER_BRUTE_FORCE_MAX,
+                 lsh_tables: int = ANSWER_LSH_TABLES, lsh_bits: int = ANSWER_LSH_BITS):
+        self.index = index
+        self.brute_force_max = brute_force_max
+        self.lsh_tables = lsh_tables
+        self.lsh_bits = lsh_bits
+        self.vocabulary = AnswerVocabulary()
+        # Строка — упакованные биты, выровненные до целых uint64
+        self.vectors = np.zeros((0, 0), dtype=np.uint8)
+        self.counts = np.zeros(0, dtype=np.int16)
+        self._lsh = None
+        self.ready = False
+
+    def _ensure_shape(self, rows: int, bits: int):
+        width = (bits + 63) // 64 * 8
+        rows = max(rows, self.vectors.shape[0])
+        if rows > self.vectors.shape[0] or width > self.vectors.shape[1]:
+            capacity = max(rows, 2 * self.vectors.shape[0])
+            vectors = np.zeros((capacity, max(width, self.vectors.shape[1])), dtype=np.uint8)
+            vectors[:self.vectors.shape[0], :self.vectors.shape[1]] = self.vectors
+            counts = np.zeros(capacity, dtype=np.int16)
+            counts[:len(self.counts)] = self.counts
+            self.vectors, self.counts = vectors, counts
+            if width > self._lsh_width():
+                # Размерность выросла — LSH перестраивается при следующем запросе
+                self._lsh = None
+
+    def _lsh_width(self) -> int:
+        return self._lsh.planes.shape[1] // 8 if self._lsh is not None else 0
+
+    async def load(self):
+        """
+        Строит векторы по всем ответам из user_answers (при старте бота)
+        """
+        answers = {}
+        async for session in get_session():
+            # Колонки по schema.sql (user_id, question_id, answer_text)
+            result = await session.stream(text(
+                "SELECT user_id, question_id, answer_text FROM dating_bot.user_answers "
+                "WHERE answer_text IS NOT NULL ORDER BY user_id"
+            ))
+            async for user_id, question_id, answer in result:
+                answers.setdefault(user_id, []).append((question_id, answer))
+
+        for user_id, user_answers in answers.items():
+            self.set_answers(user_id, user_answers)
+
+        self.ready = True
+        logger.info(f"Индекс ответов анкеты загружен: {len(answers)} пользователей, {len(self.vocabulary)} вариантов")
+
+    async def refresh(self, user_id: int):
+        """
+        Перечитывает ответы одного пользователя (после прохождения анкеты)
+        """
+        async for session in get_session():
+            result = await session.execute(
+                text("SELECT question_id, answer_text FROM dating_bot.user_answers "
+                     "WHERE user_id = :user_id AND answer_text IS NOT NULL"),
+                {"user_id": user_id}
+            )
+            self.set_answers(user_id, result.all())
+
+    def set_answers(self, user_id: int, answers):
+        """
+        Кодирует ответы [(question_id, answer), ...] в вектор пользователя
+        """
+        row = self.index.row_of(user_id)
+        if row is None:
+            return
+
+        bits = []
+        for question_id, answer in answers:
+            bit = self.vocabulary.bit(question_id, str(answer).strip().lower())
+            if bit is not None:
+                bits.append(bit)
+
+        self._ensure_shape(row + 1, len(self.vocabulary))
+        dense = np.zeros(self.vectors.shape[1] * 8, dtype=np.uint8)
+        dense[bits] = 1
+        self.vectors[row] = np.packbits(dense)
+        self.counts[row] = len(set(bits))
+
+        if self._lsh is not None:
+            if self.counts[row]:
+                self._lsh.add(np.array([row]), self._dense(np.array([row])))
+            else:
+                self._lsh.remove(row)
+
+    def has_answers(self, user_id: int) -> bool:
+        row = self.index.row_of(user_id)
+        return row is not None and row < len(self.counts) and self.counts[row] > 0
+
+    def _dense(self, rows: np.ndarray) -> np.ndarray:
+        return np.unpackbits(self.vectors[rows], axis=1)
+
+    def similarity(self, user_id: int, rows: np.ndarray) -> np.ndarray:
+        """
+        Совместимость пользователя с кандидатами (0..1); NaN, если у одной из
+        сторон нет ответов
+        """
+        result = np.full(len(rows), np.nan)
+        me = self.index.row_of(user_id)
+        if me is None or me >= len(self.counts) or not self.counts[me] or len(rows) == 0:
+            return result
+
+        known = rows < len(self.counts)
+        rows_known = rows[known]
+        words = self.vectors.view(np.uint64)
+        common = _popcount_rows(words[rows_known] & words[me])
+        norms = np.sqrt(self.counts[rows_known].astype(np.float64) * int(self.counts[me]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[known] = np.where(norms > 0, common / norms, np.nan)
+        return result
+
+    def _build_lsh(self):
+        answered = np.flatnonzero(self.counts > 0)
+        dims = self.vectors.shape[1] * 8
+        mean = np.zeros(dims)
+        for start in range(0, len(answered), 50000):
+            mean += self._dense(answered[start:start + 50000]).sum(axis=0)
+        mean /= max(len(answered), 1)
+
+        self._lsh = _LshTables(dims, self.lsh_tables, self.lsh_bits, mean)
+        for start in range(0, len(answered), 50000):
+            chunk = answered[start:start + 50000]
+            self._lsh.add(chunk, self._dense(chunk))
+
+    def top_k(self, user_id: int, rows: np.ndarray, k: int) -> np.ndarray:
+        """
+        До k самых совместимых строк из rows (по убыванию совместимости).
+
+        Пулы до brute_force_max считаются точно; для больших кандидаты берутся
+        из LSH и переоцениваются, а недостающие добираются из rows по порядку.
+        """
+        if not self.has_answers(user_id) or len(rows) <= k:
+            # Без ответов ранжировать не по чему — пул всё равно ограничен k
+            return rows[:k]
+
+        if len(rows) <= self.brute_force_max:
+            candidates = rows
+        else:
+            if self._lsh is None:
+                self._build_lsh()
+            me = self.index.row_of(user_id)
+            found = self._lsh.query(self._dense(np.array([me]))[0])
+            # Пересечение с rows и удаление повторов через маски, без сортировки
+            size = max(len(self.counts), int(rows.max()) + 1)
+            allowed = np.zeros(size, dtype=bool)
+            allowed[rows] = True
+            hit = np.zeros(size, dtype=bool)
+            hit[found] = True
+            candidates = np.flatnonzero(hit & allowed)
+
+        scores = np.nan_to_num(self.similarity(user_id, candidates), nan=-1.0)
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            best = candidates[top[np.argsort(-scores[top], kind="stable")]]
+        else:
+            best = candidates[np.argsort(-scores, kind="stable")]
+
+        if len(best) < k:
+            rest = rows[~np.isin(rows, best)]
+            best = np.concatenate([best, rest[:k - len(best)]])
+        return best
+
+
+answer_index = AnswerIndex(user_index)
@@ -7,32 +7,47 @@ from app.models.messages import Message
 from app.models.user import User
 from app.models.match import Match
 from sqlalchemy import select
+from app.services.loaders import load_users
+from app.services.hot_queries import THREAD_RECENT_MESSAGES
 
 load_dotenv()
 
-# Initialize the OpenAI client with proper error handling
+# Клиент OpenAI создаётся при первом запросе: импорт пакета openai занимает
+# заметную часть холодного старта бота
 client = None
-try:
-    from openai import OpenAI
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    if client.api_key is None or client.api_key == "":
+_client_checked = False
+
+
+def get_client():
+    global client, _client_checked
+    if _client_checked:
+        return client
+    _client_checked = True
+    if not os.getenv("OPENAI_API_KEY"):
         print("⚠️ OpenAI API key is not set in environment variables, AI analysis will be disabled")
-        client = None
-    else:
+        return None
+    try:
+        from openai import OpenAI
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         print("✅ OpenAI client initialized successfully")
-except ImportError:
-    print("⚠️ OpenAI package not installed or incompatible, AI analysis will be disabled")
-except Exception as e:
-    print(f"⚠️ Error initializing OpenAI client: {e}, AI analysis will be disabled")
+    except ImportError:
+        print("⚠️ OpenAI package not installed or incompatible, AI analysis will be disabled")
+    except Exception as e:
+        print(f"⚠️ Error initializing OpenAI client: {e}, AI analysis will be disabled")
+    return client
 
 ASSISTANT_ANALYSIS_ID = os.getenv("OPENAI_ASSISTANT_ID_ANALYSIS")
 
+# Скільки останніх повідомлень треду потрапляє в аналіз (обмеження токенів)
+ANALYSIS_HISTORY_LIMIT = 20
+
 async def analyze_chat(thread_id: str, user_id: int = None):
     """
     Analyze the entire chat thread when explicitly requested.
     Returns advice based on the chat history.
     """
     # Skip analysis if OpenAI client is not initialized
+    client = get_client()
     if client is None:
         return "⚠️ AI аналіз недоступний (API ключ не налаштовано)"
     
@@ -41,11 +56,10 @@ async def analyze_chat(thread_id: str, user_id: int = None):
     user_info = {}
     
     async for session in get_session():
-        # Get messages from this thread
-        messages = await session.scalars(
-            select(Message).where(Message.thread_id == thread_id).order_by(Message.created_at)
-        )
-        messages = messages.all()
+        # Останні ANALYSIS_HISTORY_LIMIT повідомлень треду (від нових до старих, з LIMIT),
+        # далі — у хронологічному порядку
+        messages = await THREAD_RECENT_MESSAGES.fetch(session, thread_id=thread_id, limit=ANALYSIS_HISTORY_LIMIT)
+        messages.reverse()
         
         if not messages:
             return "Історія повідомлень порожня. Немає що аналізувати."
@@ -53,8 +67,7 @@ async def analyze_chat(thread_id: str, user_id: int = None):
         # Get user information for context
         match = await session.scalar(select(Match).where(Match.thread_id == thread_id))
         if match:
-            user1 = await session.scalar(select(User).where(User.id == match.user_1_id))
-            user2 = await session.scalar(select(User).where(User.id == match.user_2_id))
+            user1, user2 = await load_users([match.user_1_id, match.user_2_id])
             if user1:
                 user_info[user1.id] = {"name": user1.first_name, "gender": user1.gender, "age": user1.age}
             if user2:
@@ -62,11 +75,11 @@ async def analyze_chat(thread_id: str, user_id: int = None):
         
         # Format the chat history
         for msg in messages:
-            sender = user_info.get(msg.sender_id, {"name": "Користувач"})
-            chat_history.append(f"{sender['name']}: {msg.message_text}")
+            sender = user_info.get(msg["sender_id"], {"name": "Користувач"})
+            chat_history.append(f"{sender['name']}: {msg['message_text']}")
     
     # Create the prompt with the chat history
-    chat_text = "\n".join(chat_history[-20:])  # Get the last 20 messages to avoid token limits
+    chat_text = "\n".join(chat_history)
     
     prompt = f"""
     Проаналізуй наступну розмову між двома людьми у чаті знайомств та надай дружню пораду:
@@ -0,0 +1,68 @@
+# файл: app/services/block_index.py
+
+import logging
+from sqlalchemy import select
+from app.database import get_session
+from app.models.blocked_users import BlockedUser
+
+logger = logging.getLogger(__name__)
+
+
+class BlockIndex:
+    """
+    Множество блокировок (blocker_id, blocked_id) в памяти.
+
+    Загружается в фоне после старта бота и обновляется block_service, поэтому
+    пересылка сообщений проверяет блокировки без запроса к БД. Изменения за
+    время загрузки записываются в журнал и применяются поверх загруженных пар.
+    """
+
+    def __init__(self):
+        self._pairs = set()
+        self._journal = None
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+    async def load(self):
+        """
+        Загружает все блокировки (при старте бота)
+        """
+        stmt = select(BlockedUser.blocker_id, BlockedUser.blocked_id).execution_options(yield_per=10000)
+        self._journal = []
+        pairs = set()
+        try:
+            async for session in get_session():
+                result = await session.stream(stmt)
+                async for blocker_id, blocked_id in result:
+                    pairs.add((blocker_id, blocked_id))
+        except BaseException:
+            self._journal = None
+            raise
+
+        journal, self._journal = self._journal, None
+        for method, pair in journal:
+            getattr(pairs, method)(pair)
+        self._pairs = pairs
+        self.ready = True
+        logger.info(f"Индекс блокировок загружен: {len(pairs)} блокировок")
+
+    def add(self, blocker_id: int, blocked_id: int):
+        if self._journal is not None:
+            self._journal.append(("add", (blocker_id, blocked_id)))
+        self._pairs.add((blocker_id, blocked_id))
+
+    def discard(self, blocker_id: int, blocked_id: int):
+        if self._journal is not None:
+            self._journal.append(("discard", (blocker_id, blocked_id)))
+        self._pairs.discard((blocker_id, blocked_id))
+
+    def blocked_between(self, user_a: int, user_b: int) -> bool:
+        """
+        True, если один из пользователей заблокировал другого
+        """
+        return (user_a, user_b) in self._pairs or (user_b, user_a) in self._pairs
+
+
+block_index = BlockIndex()
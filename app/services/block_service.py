@@ -1,9 +1,12 @@
 # файл: app/services/block_service.py
 
-from app.database import get_session
+from app.database import get_session, read_session
 from app.models.blocked_users import BlockedUser
 from app.models.user import User
 from sqlalchemy import select, delete, text
+from app.services.candidate_queue import candidate_queue, on_user_blocked
+from app.services.like_index import like_index
+from app.services.block_index import block_index
 import logging
 
 # Настройка логирования
@@ -68,6 +71,9 @@ async def block_user(blocker_telegram_id: str, blocked_user_id: int, reason: str
             
             session.add(block)
             await session.commit()
+            on_user_blocked(blocker.id, blocked_user_id)
+            like_index.forget_pair(blocker.id, blocked_user_id)
+            block_index.add(blocker.id, blocked_user_id)
             
             logger.info(f"Пользователь {blocker.id} заблокировал пользователя {blocked_user_id}")
             return True
@@ -107,6 +113,10 @@ async def unblock_user(blocker_telegram_id: str, blocked_user_id: int) -> bool:
             await session.commit()
             
             if result.rowcount > 0:
+                block_index.discard(blocker.id, blocked_user_id)
+                # Разблокированный снова может попасть в ленту
+                candidate_queue.invalidate(blocker.id)
+                candidate_queue.invalidate(blocked_user_id)
                 logger.info(f"Пользователь {blocker.id} разблокировал пользователя {blocked_user_id}")
                 return True
             else:
@@ -142,6 +152,27 @@ async def is_user_blocked(user_id: int, by_user_id: int) -> bool:
         logger.error(f"Ошибка при проверке блокировки пользователя: {e}")
         return False
 
+async def get_block_relations(user_id: int) -> set:
+    """
+    Возвращает id всех, кого заблокировал пользователь, и всех, кто заблокировал его
+    
+    Args:
+        user_id: ID пользователя в БД
+    
+    Returns:
+        set: Множество ID пользователей
+    """
+    try:
+        async for session in get_session():
+            result = await session.execute(
+                select(BlockedUser.blocked_id).where(BlockedUser.blocker_id == user_id)
+                .union(select(BlockedUser.blocker_id).where(BlockedUser.blocked_id == user_id))
+            )
+            return set(result.scalars().all())
+    except Exception as e:
+        logger.error(f"Ошибка при получении блокировок пользователя: {e}")
+        return set()
+
 async def get_blocked_users(telegram_id: str):
     """
     Получает список заблокированных пользователей
@@ -155,7 +186,7 @@ async def get_blocked_users(telegram_id: str):
     blocked_users = []
     
     try:
-        async for session in get_session():
+        async for session in read_session():
             # Получаем ID пользователя
             user = await session.scalar(
                 select(User).where(User.telegram_id == telegram_id)
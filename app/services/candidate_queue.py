@@ -0,0 +1,296 @@
+# файл: app/services/candidate_queue.py
+
+import asyncio
+import logging
+from collections import OrderedDict, deque
+import numpy as np
+from sqlalchemy import bindparam
+from app.config import (
+    CANDIDATE_BATCH_SIZE, CANDIDATE_LOW_WATER, CANDIDATE_MAX_USERS, CANDIDATE_MAX_SCAN_PAGES,
+    RANKING_POOL_SIZE, RANKED_BATCHES_AHEAD
+)
+from app.database import get_session
+from app.models.user import User
+from app.services.matching import build_candidate_query
+from app.services.seen_set import seen_sets
+from app.services.user_index import user_index
+from app.services.ranking import get_ranker
+from app.services.answer_vectors import answer_index
+
+logger = logging.getLogger(__name__)
+
+_NO_RANKED = np.empty(0, dtype=np.int64)
+
+
+class _UserQueue:
+    """Очередь кандидатов одного пользователя"""
+
+    __slots__ = ("pending", "served", "ranked", "ranked_pos", "ranked_at", "dropped", "version", "cursor")
+
+    def __init__(self, served_size: int):
+        self.pending = deque()
+        # Отранжированные, но ещё не выданные в pending кандидаты (кеш оценок):
+        # несколько пачек наперёд, ranked[ranked_pos:] ещё не выданы
+        self.ranked = _NO_RANKED
+        self.ranked_pos = 0
+        self.ranked_at = 0
+        # Убранные из ranked кандидаты (блокировки) — пропускаются при выдаче
+        self.dropped = set()
+        # Недавно показанные кандидаты: свайп по ним ещё может быть не записан
+        self.served = deque(maxlen=served_size)
+        self.version = 0
+        # Последний просмотренный id при проходе по users (keyset-пагинация)
+        self.cursor = 0
+
+
+class CandidateQueue:
+    """
+    Ограниченное in-process хранилище очередей кандидатов для ленты свайпов.
+
+    Для каждого пользователя хранится пачка id подходящих кандидатов, выбранная
+    одним запросом. Свайпы обслуживаются из очереди, а при падении ниже
+    low_water очередь асинхронно дозаполняется в фоне.
+    """
+
+    def __init__(self, batch_size: int = CANDIDATE_BATCH_SIZE, low_water: int = CANDIDATE_LOW_WATER,
+                 max_users: int = CANDIDATE_MAX_USERS, ranked_ahead: int = RANKED_BATCHES_AHEAD):
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.max_users = max_users
+        self.ranked_ahead = ranked_ahead
+        self._queues = OrderedDict()
+        self._refills = {}
+        # Кто и когда (номер поколения) изменил анкету — такие кандидаты
+        # в отранжированных пулах считаются устаревшими
+        self._generation = 0
+        self._changed = OrderedDict()
+
+    def _get_queue(self, user_id: int) -> _UserQueue:
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = _UserQueue(served_size=self.batch_size)
+            self._queues[user_id] = queue
+            # Вытесняем давно неактивных пользователей (LRU)
+            while len(self._queues) > self.max_users:
+                evicted_id, _ = self._queues.popitem(last=False)
+                task = self._refills.pop(evicted_id, None)
+                if task:
+                    task.cancel()
+        else:
+            self._queues.move_to_end(user_id)
+        return queue
+
+    async def next_candidate(self, user_id: int):
+        """
+        Возвращает id следующего кандидата для пользователя или None, если кандидатов нет
+        """
+        queue = self._get_queue(user_id)
+
+        if not queue.pending:
+            # Очередь пуста — заполняем синхронно (первый показ или всё просмотрено)
+            task = self._refills.get(user_id)
+            if task:
+                await asyncio.wait([task])
+            if not queue.pending:
+                await self._refill(user_id)
+
+        if not queue.pending:
+            return None
+
+        candidate_id = queue.pending.popleft()
+        queue.served.append(candidate_id)
+
+        if len(queue.pending) < self.low_water and user_id not in self._refills:
+            self._refills[user_id] = asyncio.create_task(self._background_refill(user_id))
+
+        return candidate_id
+
+    async def _background_refill(self, user_id: int):
+        try:
+            await self._refill(user_id)
+        except Exception as e:
+            logger.error(f"Ошибка при фоновом пополнении очереди кандидатов для {user_id}: {e}")
+        finally:
+            self._refills.pop(user_id, None)
+
+    async def _refill(self, user_id: int):
+        queue = self._get_queue(user_id)
+        version = queue.version
+        exclude = set(queue.pending) | set(queue.served)
+
+        candidate_ids, cursor = await self._fetch_batch(user_id, exclude, queue.cursor)
+
+        # Очередь могли сбросить, пока шёл запрос — тогда результат устарел
+        if self._queues.get(user_id) is not queue or queue.version != version:
+            return
+
+        queue.cursor = cursor
+        known = set(queue.pending)
+        queue.pending.extend(cid for cid in candidate_ids if cid not in known)
+
+    async def _fetch_batch(self, user_id: int, exclude: set, cursor: int):
+        """
+        Выбирает следующую пачку кандидатов, проходя по users в порядке id.
+
+        Уже просмотренные анкеты отсеиваются в памяти через seen_sets вместо
+        анти-join по swipes. Дойдя до конца таблицы, проход начинается сначала,
+        чтобы подхватить новых пользователей.
+        """
+        from app.services.search_settings_service import get_user_search_settings
+
+        seen = await seen_sets.get(user_id)
+
+        if user_index.ready and user_id in user_index:
+            queue = self._get_queue(user_id)
+            batch = self._take_ranked(queue, seen, exclude)
+            if len(batch) < self.batch_size:
+                batch += await self._fetch_batch_from_index(user_id, seen, exclude | set(batch), queue)
+            return batch, cursor
+
+        async for session in get_session():
+            me = await session.get(User, user_id)
+            if not me:
+                return [], cursor
+
+            settings = await get_user_search_settings(user_id)
+
+            # Запрос строится один раз на пачку: курсор — параметр, а не новое выражение на каждую страницу
+            stmt = (
+                build_candidate_query(me, settings, columns=[User.id], exclude_swiped=False)
+                .where(User.id > bindparam("cursor"))
+                .order_by(User.id)
+                .limit(self.batch_size)
+            )
+
+            batch = []
+            wrapped = cursor == 0
+            for _ in range(CANDIDATE_MAX_SCAN_PAGES):
+                page = (await session.scalars(stmt, {"cursor": cursor})).all()
+
+                for candidate_id in page:
+                    cursor = candidate_id
+                    if candidate_id not in seen and candidate_id not in exclude:
+                        batch.append(candidate_id)
+                        if len(batch) >= self.batch_size:
+                            return batch, cursor
+
+                if len(page) < self.batch_size:
+                    # Дошли до конца таблицы
+                    if wrapped:
+                        break
+                    cursor = 0
+                    wrapped = True
+
+            return batch, cursor
+        return [], cursor
+
+    def _take_ranked(self, queue: _UserQueue, seen, exclude: set) -> list:
+        """
+        Берёт следующую пачку из уже отранжированного пула пользователя
+        """
+        batch = []
+        while queue.ranked_pos < len(queue.ranked) and len(batch) < self.batch_size:
+            candidate_id = int(queue.ranked[queue.ranked_pos])
+            queue.ranked_pos += 1
+            if candidate_id in seen or candidate_id in exclude or candidate_id in queue.dropped:
+                continue
+            if self._changed.get(candidate_id, 0) > queue.ranked_at:
+                continue
+            batch.append(candidate_id)
+        return batch
+
+    async def _fetch_batch_from_index(self, user_id: int, seen, exclude: set, queue: _UserQueue = None) -> list:
+        """
+        Выбирает пачку кандидатов из колоночного индекса анкет без запроса к users.
+
+        Если подходящих кандидатов больше RANKING_POOL_SIZE, в пул попадают
+        самые совместимые по ответам анкеты. Пул оценивается ранжировщиком
+        одним векторным проходом; лучшие уходят в пачку, а следующие
+        ranked_ahead пачек остаются в queue.ranked для следующих пополнений.
+        """
+        from app.services.search_settings_service import get_user_search_settings
+        from app.services.block_service import get_block_relations
+
+        settings = await get_user_search_settings(user_id)
+        blocked = await get_block_relations(user_id)
+
+        rows = user_index.candidate_rows(user_id, settings)
+        ids = user_index.ids[rows]
+        skip = np.concatenate([seen.to_numpy(), np.fromiter(exclude | blocked, dtype=np.int64)])
+        rows = rows[~np.isin(ids, skip)]
+        if len(rows) == 0:
+            return []
+
+        rows = answer_index.top_k(user_id, rows, RANKING_POOL_SIZE)[:RANKING_POOL_SIZE]
+        rows = get_ranker().rank(user_index, user_id, rows)
+        ranked = user_index.ids[rows[:self.batch_size * (self.ranked_ahead + 1)]]
+
+        if queue is not None:
+            queue.ranked = ranked[self.batch_size:].copy()
+            queue.ranked_pos = 0
+            queue.ranked_at = self._generation
+            queue.dropped.clear()
+        return ranked[:self.batch_size].tolist()
+
+    def invalidate(self, user_id: int):
+        """
+        Сбрасывает очередь пользователя (изменились его настройки, анкета или блокировки)
+        """
+        queue = self._queues.pop(user_id, None)
+        if queue:
+            queue.version += 1
+        task = self._refills.pop(user_id, None)
+        if task:
+            task.cancel()
+
+    def discard(self, user_id: int, candidate_id: int):
+        """
+        Убирает конкретного кандидата из очереди пользователя
+        """
+        queue = self._queues.get(user_id)
+        if queue:
+            if candidate_id in queue.pending:
+                queue.pending.remove(candidate_id)
+            if queue.ranked_pos < len(queue.ranked):
+                queue.dropped.add(candidate_id)
+
+    def forget_candidate(self, candidate_id: int):
+        """
+        Убирает пользователя из очередей всех остальных (его анкета изменилась)
+        """
+        for queue in self._queues.values():
+            if candidate_id in queue.pending:
+                queue.pending.remove(candidate_id)
+
+        self._generation += 1
+        self._changed[candidate_id] = self._generation
+        self._changed.move_to_end(candidate_id)
+        while len(self._changed) > self.max_users:
+            self._changed.popitem(last=False)
+
+    def clear(self):
+        """
+        Сбрасывает очереди всех пользователей (например, после смены ранжировщика)
+        """
+        for user_id in list(self._queues):
+            self.invalidate(user_id)
+
+
+candidate_queue = CandidateQueue()
+
+
+def on_profile_changed(user_id: int):
+    """
+    Сбрасывает закешированных кандидатов после изменения анкеты пользователя
+    """
+    if user_id:
+        candidate_queue.invalidate(user_id)
+        candidate_queue.forget_candidate(user_id)
+
+
+def on_user_blocked(blocker_id: int, blocked_id: int):
+    """
+    Убирает заблокированного из ленты блокирующего и наоборот
+    """
+    candidate_queue.discard(blocker_id, blocked_id)
+    candidate_queue.discard(blocked_id, blocker_id)
@@ -0,0 +1,109 @@
+# файл: app/services/chat_threads.py
+
+import logging
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from app.config import CHAT_THREAD_CACHE_TTL, CHAT_THREAD_CACHE_MAX
+from app.database import get_session
+from app.services.hot_queries import THREAD_MEMBERS
+from app.services.match_summaries import create_for_thread
+from app.services.single_flight import load_once
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadMember(NamedTuple):
+    id: int
+    telegram_id: str
+    first_name: str
+
+
+class ThreadInfo(NamedTuple):
+    """Участники треда: всё, что нужно для пересылки сообщения без запросов к БД"""
+    match_id: int
+    thread_id: str
+    user_1: ThreadMember
+    user_2: ThreadMember
+
+    def member(self, user_id: int) -> Optional[ThreadMember]:
+        if user_id == self.user_1.id:
+            return self.user_1
+        if user_id == self.user_2.id:
+            return self.user_2
+        return None
+
+    def counterpart(self, user_id: int) -> Optional[ThreadMember]:
+        """Собеседник user_id или None, если user_id не участник треда"""
+        if user_id == self.user_1.id:
+            return self.user_2
+        if user_id == self.user_2.id:
+            return self.user_1
+        return None
+
+
+class ThreadCache:
+    """
+    thread_id -> ThreadInfo с TTL и LRU-вытеснением.
+
+    Пары матча не меняются, поэтому TTL нужен только для имён. Одновременные
+    запросы одного треда ждут одну загрузку.
+    """
+
+    def __init__(self, ttl: float = CHAT_THREAD_CACHE_TTL, max_size: int = CHAT_THREAD_CACHE_MAX):
+        self.ttl = ttl
+        self.max_size = max_size
+        # thread_id -> (истекает, ThreadInfo)
+        self._entries = OrderedDict()
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, thread_id: str) -> Optional[ThreadInfo]:
+        """
+        Участники треда или None, если матча нет
+        """
+        entry = self._entries.get(thread_id)
+        if entry is not None:
+            expires_at, info = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(thread_id)
+                self.hits += 1
+                return info
+            del self._entries[thread_id]
+
+        self.misses += 1
+        return await load_once(self._loading, thread_id, lambda: self._load(thread_id))
+
+    async def _load(self, thread_id: str) -> Optional[ThreadInfo]:
+        async for session in get_session():
+            row = await THREAD_MEMBERS.fetchrow(session, thread_id=thread_id)
+            if row is None:
+                # Несуществующие треды не кешируются: матч мог появиться только что
+                return None
+            # Буфер сообщений только обновляет строки списка матчей — создаём их заранее
+            await create_for_thread(session, thread_id)
+            await session.commit()
+
+        info = ThreadInfo(
+            match_id=row["id"],
+            thread_id=thread_id,
+            user_1=ThreadMember(row["user_1_id"], row["telegram_1"], row["name_1"]),
+            user_2=ThreadMember(row["user_2_id"], row["telegram_2"], row["name_2"]),
+        )
+        self._entries[thread_id] = (time.monotonic() + self.ttl, info)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return info
+
+    def invalidate(self, thread_id: str):
+        self._entries.pop(thread_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+chat_threads = ThreadCache()
@@ -1 +1,115 @@
-﻿pass
+# файл: app/services/geo.py
+
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Размер ячейки сетки в градусах (~55 км по широте)
+GRID_CELL_DEG = 0.5
+
+
+def haversine_km(lat: float, lon: float, lats, lons):
+    """
+    Векторизованное расстояние (км) от точки до массивов координат
+    """
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoGrid:
+    """
+    Пространственный индекс: строки колоночного индекса, разложенные по ячейкам
+    сетки широта/долгота. Запрос по радиусу считает haversine только по
+    соседним ячейкам, а не по всем пользователям.
+    """
+
+    def __init__(self, cell_deg: float = GRID_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._cells = {}
+        self._cell_of_row = {}
+        # Строки без координат: их нельзя отфильтровать по расстоянию
+        self.unlocated = set()
+
+    def cell_of(self, lat: float, lon: float):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def place(self, row: int, lat: float = None, lon: float = None):
+        """
+        Кладёт строку в ячейку по координатам (или в unlocated, если их нет)
+        """
+        self.remove(row)
+        if lat is None or lon is None or math.isnan(lat) or math.isnan(lon):
+            self.unlocated.add(row)
+            return
+        cell = self.cell_of(lat, lon)
+        self._cells.setdefault(cell, set()).add(row)
+        self._cell_of_row[row] = cell
+
+    def remove(self, row: int):
+        self.unlocated.discard(row)
+        cell = self._cell_of_row.pop(row, None)
+        if cell is not None:
+            rows = self._cells.get(cell)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self._cells[cell]
+
+    def rows_near(self, lat: float, lon: float, radius_km: float):
+        """
+        Строки из ячеек, пересекающих квадрат вокруг точки с полустороной radius_km
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        cos_lat = max(math.cos(math.radians(lat)), 0.01)
+        dlon = min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+
+        lat_min, lon_min = self.cell_of(lat - dlat, lon - dlon)
+        lat_max, lon_max = self.cell_of(lat + dlat, lon + dlon)
+        cells_per_turn = int(round(360 / self.cell_deg))
+
+        rows = []
+        for cell_lat in range(lat_min, lat_max + 1):
+            for cell_lon in range(lon_min, lon_max + 1):
+                # Переход через 180-й меридиан
+                wrapped = (cell_lon + cells_per_turn // 2) % cells_per_turn - cells_per_turn // 2
+                rows.extend(self._cells.get((cell_lat, wrapped), ()))
+        return np.fromiter(set(rows), dtype=np.int64)
+
+    def rows_within(self, lat: float, lon: float, radius_km: float, lats, lons):
+        """
+        Строки в радиусе radius_km от точки и расстояния до них (км)
+        """
+        rows = self.rows_near(lat, lon, radius_km)
+        if len(rows) == 0:
+            return rows, np.zeros(0)
+        distances = haversine_km(lat, lon, lats[rows], lons[rows])
+        inside = distances <= radius_km
+        return rows[inside], distances[inside]
+
+
+def bounding_box(lat: float, lon: float, radius_km: float):
+    """
+    Границы (lat_min, lat_max, lon_min, lon_max) квадрата вокруг точки для SQL-фильтра
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def longitude_ranges(lon_min: float, lon_max: float) -> list:
+    """
+    Диапазоны долготы [(от, до)] для границ bounding_box: квадрат, который
+    пересекает ±180°, делится на два диапазона по разные стороны меридиана
+    """
+    if lon_max - lon_min >= 360:
+        return [(-180.0, 180.0)]
+    if lon_min < -180:
+        return [(lon_min + 360, 180.0), (-180.0, lon_max)]
+    if lon_max > 180:
+        return [(lon_min, 180.0), (-180.0, lon_max - 360)]
+    return [(lon_min, lon_max)]
@@ -0,0 +1,162 @@
+# файл: app/services/hot_queries.py
+"""
+Реестр горячих запросов.
+
+Запрос описывается один раз (Core select или text) и сразу компилируется
+диалектом asyncpg в SQL с параметрами $1, $2, ... Выполняется он прямо на
+asyncpg-соединении сессии: ни построения выражения, ни ключа кеша SQLAlchemy,
+ни компиляции на каждый вызов, а на стороне asyncpg работает кеш
+подготовленных выражений соединения (statement_cache_size, см. app/db_pool.py).
+
+Параметры передаются как есть, без bind-процессоров SQLAlchemy, поэтому в
+горячие запросы годятся только простые типы (числа, строки, массивы чисел).
+Результат — записи asyncpg (доступ по ключу: row["id"]). События engine
+такие запросы не видят, поэтому они сами учитываются в app/db_metrics.py.
+"""
+
+import time
+from sqlalchemy import select, text, bindparam, any_, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+from app.models.user import User
+from app.models.user_photos import UserPhoto
+from app.models.swipes import Swipe
+from app.models.messages import Message
+from app.models.match import Match
+from sqlalchemy.orm import aliased
+from app.db_metrics import sql_stats
+
+_DIALECT = asyncpg_dialect()
+
+# name -> HotQuery
+registry = {}
+
+
+class HotQuery:
+    """Запрос, скомпилированный один раз при импорте"""
+
+    __slots__ = ("name", "sql", "params", "defaults", "calls")
+
+    def __init__(self, name: str, statement):
+        if name in registry:
+            raise ValueError(f"Горячий запрос {name} уже зарегистрирован")
+        compiled = statement.compile(dialect=_DIALECT)
+        self.name = name
+        self.sql = str(compiled)
+        # Порядок именованных параметров соответствует $1, $2, ...
+        self.params = tuple(compiled.positiontup or ())
+        # Значения, зашитые в выражение (например LIMIT 1)
+        self.defaults = {
+            param: compiled.binds[param].value
+            for param in self.params if not compiled.binds[param].required
+        }
+        self.calls = 0
+        registry[name] = self
+
+    def args(self, values: dict) -> tuple:
+        try:
+            return tuple(values[param] if param in values else self.defaults[param] for param in self.params)
+        except KeyError as e:
+            raise TypeError(f"Горячий запрос {self.name}: не передан параметр {e}") from None
+
+    async def _connection(self, session):
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        return raw.driver_connection
+
+    async def fetch(self, session, **values) -> list:
+        self.calls += 1
+        conn = await self._connection(session)
+        started = time.perf_counter()
+        try:
+            return await conn.fetch(self.sql, *self.args(values))
+        finally:
+            sql_stats.observe(self.sql, time.perf_counter() - started)
+
+    async def fetchrow(self, session, **values):
+        self.calls += 1
+        conn = await self._connection(session)
+        started = time.perf_counter()
+        try:
+            return await conn.fetchrow(self.sql, *self.args(values))
+        finally:
+            sql_stats.observe(self.sql, time.perf_counter() - started)
+
+    async def fetchval(self, session, **values):
+        self.calls += 1
+        conn = await self._connection(session)
+        started = time.perf_counter()
+        try:
+            return await conn.fetchval(self.sql, *self.args(values))
+        finally:
+            sql_stats.observe(self.sql, time.perf_counter() - started)
+
+
+def _ids(name: str = "ids"):
+    return bindparam(name, type_=ARRAY(Integer))
+
+
+# Снимок пользователя для кеша идентичности (app/services/identity_cache.py)
+USER_IDENTITY = HotQuery(
+    "user_identity",
+    select(
+        User.id, User.telegram_id, User.first_name, User.language, User.gender, User.orientation,
+        User.age, User.city, User.is_premium, User.is_admin, User.token_balance,
+    ).where(User.telegram_id == bindparam("telegram_id"))
+)
+
+# Фото пачки анкет (app/services/loaders.py)
+PHOTOS_BY_USERS = HotQuery(
+    "photos_by_users",
+    select(UserPhoto.user_id, UserPhoto.file_id)
+    .where(UserPhoto.user_id == any_(_ids()))
+    .order_by(UserPhoto.id)
+)
+
+# Взаимный лайк: лайкнул ли target пользователя user
+MUTUAL_LIKE = HotQuery(
+    "mutual_like",
+    select(Swipe.id).where(
+        Swipe.swiper_id == bindparam("target_id"),
+        Swipe.swiped_id == bindparam("user_id"),
+        Swipe.is_like.is_(True)
+    ).limit(1)
+)
+
+# Заведения по типу (и городу) — app/booking/services_db.py
+_VENUE_COLUMNS = "SELECT id, name, link, city, latitude, longitude FROM dating_bot.places"
+
+VENUES_BY_TYPE = HotQuery(
+    "venues_by_type",
+    text(f"{_VENUE_COLUMNS} WHERE type = :place_type")
+)
+
+VENUES_BY_TYPE_AND_CITY = HotQuery(
+    "venues_by_type_and_city",
+    text(f"{_VENUE_COLUMNS} WHERE type = :place_type AND city ILIKE :city_pattern")
+)
+
+# Последние сообщения треда: от новых к старым по idx_messages_thread_recent (migrations/0009)
+THREAD_RECENT_MESSAGES = HotQuery(
+    "thread_recent_messages",
+    select(Message.id, Message.sender_id, Message.message_text, Message.created_at)
+    .where(Message.thread_id == bindparam("thread_id"))
+    .order_by(Message.created_at.desc(), Message.id.desc())
+    .limit(bindparam("limit", type_=Integer))
+)
+
+# Участники треда для пересылки сообщений (app/services/chat_threads.py)
+_user_1 = aliased(User)
+_user_2 = aliased(User)
+
+THREAD_MEMBERS = HotQuery(
+    "thread_members",
+    select(
+        Match.id, Match.user_1_id, Match.user_2_id,
+        _user_1.telegram_id.label("telegram_1"), _user_1.first_name.label("name_1"),
+        _user_2.telegram_id.label("telegram_2"), _user_2.first_name.label("name_2"),
+    )
+    .join(_user_1, _user_1.id == Match.user_1_id)
+    .join(_user_2, _user_2.id == Match.user_2_id)
+    .where(Match.thread_id == bindparam("thread_id"))
+)
@@ -0,0 +1,155 @@
+# файл: app/services/identity_cache.py
+
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from app.config import IDENTITY_CACHE_TTL, IDENTITY_CACHE_MAX
+from app.database import get_session
+from app.services.hot_queries import USER_IDENTITY
+from app.services.single_flight import load_once
+
+logger = logging.getLogger(__name__)
+
+# Отсутствие анкеты кешируется недолго: её могут создать из другого процесса
+_NEGATIVE_TTL = 30
+
+# Монотонный счётчик версий снимков (балансы сравниваются по нему)
+_versions = itertools.count(1)
+
+
+class UserIdentity(NamedTuple):
+    """
+    Неизменяемый снимок пользователя для хендлеров.
+
+    Баланс токенов — только для отображения: списания всегда идут через
+    token_service по актуальной строке в БД. balance_version растёт с каждой
+    перезагрузкой снимка после изменения баланса.
+    """
+    id: int
+    telegram_id: str
+    first_name: str
+    language: str
+    gender: Optional[str]
+    orientation: Optional[str]
+    age: Optional[int]
+    city: Optional[str]
+    is_premium: bool
+    is_admin: bool
+    token_balance: int
+    balance_version: int
+
+
+class IdentityCache:
+    """
+    telegram_id -> UserIdentity с TTL и LRU-вытеснением.
+
+    Одновременные запросы одного telegram_id ждут одну загрузку; данные,
+    инвалидированные во время загрузки, в кеш не попадают.
+    """
+
+    def __init__(self, ttl: float = IDENTITY_CACHE_TTL, max_size: int = IDENTITY_CACHE_MAX):
+        self.ttl = ttl
+        self.max_size = max_size
+        # telegram_id -> (истекает, UserIdentity | None)
+        self._entries = OrderedDict()
+        self._telegram_of_user = {}
+        self._loading = {}
+        self._stale = set()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, telegram_id) -> Optional[UserIdentity]:
+        """
+        Снимок пользователя или None, если анкеты нет
+        """
+        telegram_id = str(telegram_id)
+        entry = self._entries.get(telegram_id)
+        if entry is not None:
+            expires_at, identity = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(telegram_id)
+                self.hits += 1
+                return identity
+            self._drop(telegram_id)
+
+        self.misses += 1
+        return await load_once(self._loading, telegram_id, lambda: self._load(telegram_id))
+
+    async def _load(self, telegram_id: str) -> Optional[UserIdentity]:
+        self._stale.discard(telegram_id)
+        try:
+            async for session in get_session():
+                row = await USER_IDENTITY.fetchrow(session, telegram_id=telegram_id)
+
+            identity = None
+            if row is not None:
+                identity = UserIdentity(
+                    id=row["id"],
+                    telegram_id=row["telegram_id"],
+                    first_name=row["first_name"],
+                    language=row["language"] or "ua",
+                    gender=row["gender"],
+                    orientation=row["orientation"],
+                    age=row["age"],
+                    city=row["city"],
+                    is_premium=bool(row["is_premium"]),
+                    is_admin=bool(row["is_admin"]),
+                    token_balance=row["token_balance"] or 0,
+                    balance_version=next(_versions),
+                )
+            if telegram_id not in self._stale:
+                self._put(telegram_id, identity)
+            return identity
+        finally:
+            self._stale.discard(telegram_id)
+
+    def _put(self, telegram_id: str, identity: Optional[UserIdentity]):
+        self._drop(telegram_id)
+        ttl = self.ttl if identity is not None else min(self.ttl, _NEGATIVE_TTL)
+        self._entries[telegram_id] = (time.monotonic() + ttl, identity)
+        if identity is not None:
+            self._telegram_of_user[identity.id] = telegram_id
+        while len(self._entries) > self.max_size:
+            evicted, (_, old) = self._entries.popitem(last=False)
+            if old is not None:
+                self._telegram_of_user.pop(old.id, None)
+
+    def _drop(self, telegram_id: str):
+        entry = self._entries.pop(telegram_id, None)
+        if entry is not None and entry[1] is not None:
+            self._telegram_of_user.pop(entry[1].id, None)
+
+    def invalidate(self, telegram_id):
+        """
+        Забывает снимок (анкета, язык, флаги или баланс изменились)
+        """
+        if not telegram_id:
+            return
+        telegram_id = str(telegram_id)
+        if telegram_id in self._loading:
+            self._stale.add(telegram_id)
+        self._drop(telegram_id)
+
+    def invalidate_user(self, user_id: int):
+        """
+        То же по внутреннему id (когда telegram_id под рукой нет)
+        """
+        telegram_id = self._telegram_of_user.get(user_id)
+        if telegram_id is not None:
+            self.invalidate(telegram_id)
+        else:
+            # Снимок может как раз загружаться — такие загрузки не кешируем
+            self._stale.update(self._loading)
+
+    def clear(self):
+        self._stale.update(self._loading)
+        self._entries.clear()
+        self._telegram_of_user.clear()
+
+
+user_identities = IdentityCache()
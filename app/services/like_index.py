@@ -0,0 +1,157 @@
+# файл: app/services/like_index.py
+
+import logging
+from sqlalchemy import select, not_, exists
+from sqlalchemy.orm import aliased
+from app.database import get_session
+from app.models.swipes import Swipe
+
+logger = logging.getLogger(__name__)
+
+
+class LikeIndex:
+    """
+    Обратный индекс лайков без ответа: кого лайкнули -> кто лайкнул.
+
+    Проверка взаимности и регистрация лайка выполняются без await между ними,
+    поэтому из двух одновременных встречных лайков матч обнаружит ровно один.
+
+    Индекс загружается в фоне, пока бот уже принимает апдейты: изменения за
+    время загрузки записываются в журнал и применяются поверх загруженных лайков.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._journal = None
+        self.ready = False
+
+    def __len__(self) -> int:
+        return sum(len(likers) for likers in self._pending.values())
+
+    async def load(self):
+        """
+        Загружает лайки, на которые ещё не ответили (при старте бота)
+        """
+        reverse = aliased(Swipe)
+        stmt = (
+            select(Swipe.swiper_id, Swipe.swiped_id)
+            .where(Swipe.is_like == True)
+            .where(
+                not_(
+                    exists()
+                    .where(reverse.swiper_id == Swipe.swiped_id)
+                    .where(reverse.swiped_id == Swipe.swiper_id)
+                )
+            )
+            .execution_options(yield_per=10000)
+        )
+
+        self._journal = []
+        pending = {}
+        try:
+            async for session in get_session():
+                result = await session.stream(stmt)
+                async for swiper_id, swiped_id in result:
+                    pending.setdefault(swiped_id, set()).add(swiper_id)
+        except BaseException:
+            self._journal = None
+            raise
+
+        self._pending = pending
+        journal, self._journal = self._journal, None
+        for method, args in journal:
+            method(*args)
+        self.ready = True
+        logger.info(f"Индекс лайков загружен: {len(self)} лайков без ответа")
+
+    def register_like(self, liker_id: int, liked_id: int) -> bool:
+        """
+        Регистрирует лайк. Возвращает True, если он взаимный (liked_id уже лайкнул liker_id).
+        Во время загрузки лайк только журналируется (взаимность проверяет SQL)
+        """
+        if self._journal is not None:
+            self._journal.append((self.register_like, (liker_id, liked_id)))
+            return False
+
+        likers = self._pending.get(liker_id)
+        if likers and liked_id in likers:
+            likers.discard(liked_id)
+            if not likers:
+                del self._pending[liker_id]
+            return True
+
+        self._pending.setdefault(liked_id, set()).add(liker_id)
+        return False
+
+    def register_dislike(self, user_id: int, disliked_id: int):
+        """
+        Дизлайк — это ответ на лайк, он больше не ждёт взаимности
+        """
+        if self._journal is not None:
+            self._journal.append((self.register_dislike, (user_id, disliked_id)))
+            return
+
+        likers = self._pending.get(user_id)
+        if likers:
+            likers.discard(disliked_id)
+            if not likers:
+                del self._pending[user_id]
+
+    def forget_like(self, liker_id: int, liked_id: int):
+        """
+        Убирает лайк без ответа (например, свайп так и не записался в БД)
+        """
+        if self._journal is not None:
+            self._journal.append((self.forget_like, (liker_id, liked_id)))
+            return
+
+        likers = self._pending.get(liked_id)
+        if likers:
+            likers.discard(liker_id)
+            if not likers:
+                del self._pending[liked_id]
+
+    def _add_like(self, liker_id: int, liked_id: int):
+        if self._journal is not None:
+            self._journal.append((self._add_like, (liker_id, liked_id)))
+            return
+        self._pending.setdefault(liked_id, set()).add(liker_id)
+
+    async def restore_like(self, liker_id: int, liked_id: int):
+        """
+        Возвращает в индекс лайк liker_id -> liked_id, если он записан в БД и на
+        него ещё не ответили (ответный свайп, снявший его из индекса, не записался)
+        """
+        reverse = aliased(Swipe)
+        stmt = select(
+            exists()
+            .where(Swipe.swiper_id == liker_id)
+            .where(Swipe.swiped_id == liked_id)
+            .where(Swipe.is_like == True)
+            .where(
+                not_(
+                    exists()
+                    .where(reverse.swiper_id == liked_id)
+                    .where(reverse.swiped_id == liker_id)
+                )
+            )
+        )
+        async for session in get_session():
+            if await session.scalar(stmt):
+                self._add_like(liker_id, liked_id)
+
+    def forget_pair(self, user_a: int, user_b: int):
+        """
+        Убирает лайки между двумя пользователями (например, после блокировки)
+        """
+        self.register_dislike(user_a, user_b)
+        self.register_dislike(user_b, user_a)
+
+    def likers_of(self, user_id: int) -> set:
+        """
+        Кто лайкнул пользователя и ещё не получил ответа
+        """
+        return set(self._pending.get(user_id, ()))
+
+
+like_index = LikeIndex()
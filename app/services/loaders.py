@@ -0,0 +1,206 @@
+# файл: app/services/loaders.py
+
+import asyncio
+import logging
+from contextvars import ContextVar
+from sqlalchemy import select, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from app.database import get_session, read_session
+from app.models.user import User
+from app.models.search_settings import SearchSettings
+from app.services.hot_queries import PHOTOS_BY_USERS
+
+logger = logging.getLogger(__name__)
+
+
+class DataLoader:
+    """
+    Объединяет все запросы по ключам, сделанные в одном такте event loop,
+    в один вызов batch_fn(keys) -> {key: value}.
+
+    Пачку выполняет первая ожидающая задача — с сессией своего апдейта
+    (get_session() внутри batch_fn), а не отдельная фоновая задача.
+    Результаты кешируются на время жизни загрузчика (один апдейт Telegram).
+    """
+
+    def __init__(self, batch_fn, default=None, cache: bool = True):
+        self._batch_fn = batch_fn
+        self._default = default
+        self._use_cache = cache
+        self._cache = {}
+        self._queue = []
+        self._dispatching = False
+
+    async def load(self, key):
+        return (await self.load_many([key]))[0]
+
+    async def load_many(self, keys) -> list:
+        futures = [self._enqueue(key) for key in keys]
+        await self._dispatch()
+        return list(await asyncio.gather(*futures))
+
+    def _enqueue(self, key) -> asyncio.Future:
+        if self._use_cache:
+            future = self._cache.get(key)
+            if future is not None:
+                return future
+
+        future = asyncio.get_event_loop().create_future()
+        if self._use_cache:
+            self._cache[key] = future
+        self._queue.append((key, future))
+        return future
+
+    def clear(self, key=None):
+        """
+        Забывает закешированное значение (или все значения)
+        """
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+    async def _dispatch(self):
+        """
+        Выполняет накопленные ключи в текущей задаче. Сначала уступает один такт,
+        чтобы ключи других задач из того же такта попали в ту же пачку
+        """
+        if not self._queue or self._dispatching:
+            return
+
+        self._dispatching = True
+        try:
+            await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            # Пачку ждут и другие задачи — её доделывает фоновая задача
+            self._dispatching = False
+            batch, self._queue = self._queue, []
+            asyncio.ensure_future(self._run(batch))
+            raise
+        self._dispatching = False
+        batch, self._queue = self._queue, []
+        await self._run(batch)
+
+    async def _run(self, batch: list):
+        keys = list(dict.fromkeys(key for key, _ in batch))
+        try:
+            results = await self._batch_fn(keys)
+        except BaseException as e:
+            if isinstance(e, Exception):
+                logger.error(f"Ошибка пакетной загрузки {len(keys)} ключей: {e}")
+            error = e if isinstance(e, Exception) else RuntimeError("пакетная загрузка отменена")
+            for key, future in batch:
+                self._cache.pop(key, None)
+                if not future.done():
+                    future.set_exception(error)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for key, future in batch:
+            if not future.done():
+                value = results.get(key)
+                future.set_result(value if value is not None else self._copy_default())
+
+    def _copy_default(self):
+        return list(self._default) if isinstance(self._default, list) else self._default
+
+
+def _ids_param(ids):
+    return bindparam("ids", list(ids), type_=ARRAY(Integer))
+
+
+async def _batch_users(ids: list) -> dict:
+    async for session in get_session():
+        result = await session.scalars(select(User).where(User.id == any_(_ids_param(ids))))
+        return {user.id: user for user in result}
+    return {}
+
+
+async def _batch_photos(user_ids: list) -> dict:
+    photos = {}
+    async for session in get_session():
+        for user_id, file_id in await PHOTOS_BY_USERS.fetch(session, ids=list(user_ids)):
+            photos.setdefault(user_id, []).append(file_id)
+    return photos
+
+
+async def _batch_settings(user_ids: list) -> dict:
+    # Настройки поиска читаются с реплики (после своих изменений — с primary)
+    async for session in read_session():
+        result = await session.scalars(
+            select(SearchSettings).where(SearchSettings.user_id == any_(_ids_param(user_ids)))
+        )
+        return {settings.user_id: settings for settings in result}
+    return {}
+
+
+class Loaders:
+    """Набор загрузчиков одного апдейта"""
+
+    def __init__(self, cache: bool = True):
+        self.users = DataLoader(_batch_users, cache=cache)
+        self.photos = DataLoader(_batch_photos, default=[], cache=cache)
+        self.settings = DataLoader(_batch_settings, cache=cache)
+
+
+# Загрузчики текущего апдейта (выставляются LoaderMiddleware)
+_current = ContextVar("loaders", default=None)
+# Вне апдейта (фоновые задачи) запросы объединяются, но не кешируются
+_shared = None
+
+
+def current_loaders() -> Loaders:
+    global _shared
+    loaders = _current.get()
+    if loaders is None:
+        if _shared is None:
+            _shared = Loaders(cache=False)
+        loaders = _shared
+    return loaders
+
+
+def begin_scope():
+    """
+    Начинает область загрузчиков (один апдейт). Возвращает токен для end_scope
+    """
+    return _current.set(Loaders())
+
+
+def end_scope(token):
+    _current.reset(token)
+
+
+async def load_users(ids) -> list:
+    """
+    Пользователи по id (None для отсутствующих), в порядке ids
+    """
+    return await current_loaders().users.load_many(ids)
+
+
+async def load_user(user_id: int):
+    return await current_loaders().users.load(user_id)
+
+
+async def load_photos(user_ids) -> list:
+    """
+    Списки file_id фотографий для каждого пользователя, в порядке user_ids
+    """
+    return await current_loaders().photos.load_many(user_ids)
+
+
+async def load_settings(user_ids) -> list:
+    """
+    Настройки поиска (None, если не созданы), в порядке user_ids
+    """
+    return await current_loaders().settings.load_many(user_ids)
+
+
+def forget(user_id: int):
+    """
+    Убирает пользователя из кеша текущего апдейта (после изменения его данных)
+    """
+    loaders = current_loaders()
+    loaders.users.clear(user_id)
+    loaders.photos.clear(user_id)
+    loaders.settings.clear(user_id)
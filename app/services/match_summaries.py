@@ -0,0 +1,211 @@
+# файл: app/services/match_summaries.py
+"""
+Список матчей для чтения (dating_bot.match_summaries, миграция 0011).
+
+По строке на каждого участника матча: имя собеседника, последнее сообщение
+и число непрочитанных. Строки создаются вместе с матчем (create_match),
+обновляются в той же транзакции, что и запись сообщений
+(record_messages, app/services/message_buffer.py), а счётчик непрочитанных сбрасывается, когда участник
+открывает чат (mark_read). Имя собеседника меняется вместе с именем в анкете
+(rename_counterpart, app/services/user_service.py). Список матчей — одна страница по индексу
+(user_id, last_activity_at, match_id).
+
+Заполнение для существующих тредов (повторный запуск обновляет имена и
+последние сообщения, счётчики непрочитанных не трогает):
+    python -m app.services.match_summaries backfill
+"""
+
+import argparse
+import asyncio
+import logging
+from sqlalchemy import Boolean, DateTime, Integer, bindparam, case, select, text, update
+from app.database import engine
+from app.models.match_summaries import MatchSummary
+from app.services.pagination import Page, NEXT, fetch_page
+
+logger = logging.getLogger(__name__)
+
+# Сколько символов последнего сообщения хранить для превью
+PREVIEW_LENGTH = 200
+
+# Сообщения AI-анализа пишутся в тред, но собеседнику не показываются
+_AI_ANALYSIS_PREFIX = "🤖 AI АНАЛІЗ"
+
+# Обе стороны матча; {where} сужает выборку (тред, пользователь или все матчи)
+_UPSERT_SQL = """
+INSERT INTO dating_bot.match_summaries (
+    user_id, match_id, thread_id, counterpart_id, counterpart_name,
+    last_message_text, last_sender_id, last_message_at, last_activity_at, unread_count
+)
+SELECT side.user_id, m.id, m.thread_id, side.counterpart_id, u.first_name,
+       left(latest.message_text, {preview}), latest.sender_id, latest.created_at,
+       COALESCE(latest.created_at, m.created_at, CURRENT_TIMESTAMP), 0
+FROM dating_bot.matches m
+CROSS JOIN LATERAL (VALUES (m.user_1_id, m.user_2_id), (m.user_2_id, m.user_1_id)) AS side(user_id, counterpart_id)
+JOIN dating_bot.users u ON u.id = side.counterpart_id
+LEFT JOIN LATERAL (
+    SELECT message_text, sender_id, created_at FROM dating_bot.messages
+    WHERE thread_id = m.thread_id AND message_text NOT LIKE '{ai_prefix}%'
+    ORDER BY created_at DESC, id DESC LIMIT 1
+) latest ON TRUE
+WHERE m.thread_id IS NOT NULL AND side.user_id IS NOT NULL {where}
+ON CONFLICT (user_id, match_id) DO {conflict}
+"""
+
+_REFRESH = """UPDATE SET
+    thread_id = EXCLUDED.thread_id,
+    counterpart_id = EXCLUDED.counterpart_id,
+    counterpart_name = EXCLUDED.counterpart_name,
+    last_message_text = EXCLUDED.last_message_text,
+    last_sender_id = EXCLUDED.last_sender_id,
+    last_message_at = EXCLUDED.last_message_at,
+    last_activity_at = EXCLUDED.last_activity_at"""
+
+
+def _upsert(where: str = "", refresh: bool = False):
+    return text(_UPSERT_SQL.format(
+        preview=PREVIEW_LENGTH, ai_prefix=_AI_ANALYSIS_PREFIX, where=where,
+        conflict=_REFRESH if refresh else "NOTHING"
+    ))
+
+
+async def create_for_thread(session, thread_id: str):
+    """
+    Строки обеих сторон матча (нового или ещё не заполненного); коммит — за вызывающим
+    """
+    await session.execute(_upsert("AND m.thread_id = :thread_id"), {"thread_id": thread_id})
+
+
+async def create_for_user(session, user_id: int) -> int:
+    """
+    Недостающие строки всех матчей пользователя. Возвращает число созданных строк
+    """
+    result = await session.execute(
+        _upsert("AND (m.user_1_id = :user_id OR m.user_2_id = :user_id)"), {"user_id": user_id}
+    )
+    return result.rowcount
+
+
+def _summary_updates(messages) -> list:
+    """
+    Параметры обновления строк (тред, участник) для пачки сообщений в порядке отправки.
+
+    Последнее сообщение пачки — превью треда. Участник, писавший в пачке,
+    прочитал тред: его счётчик — только сообщения собеседника после его
+    последнего сообщения; остальным счётчик увеличивается
+    """
+    threads, last = {}, {}
+    for thread_id, sender_id, receiver_id, message_text, sent_at in messages:
+        sides = threads.setdefault(thread_id, {})
+        sides[sender_id] = [True, 0]
+        sides.setdefault(receiver_id, [False, 0])[1] += 1
+        last[thread_id] = (sender_id, message_text[:PREVIEW_LENGTH], sent_at)
+
+    params = []
+    for thread_id, sides in threads.items():
+        last_sender_id, last_text, last_sent_at = last[thread_id]
+        for user_id, (reset, delta) in sides.items():
+            params.append({
+                "b_thread_id": thread_id, "b_user_id": user_id,
+                "b_text": last_text, "b_sender_id": last_sender_id, "b_sent_at": last_sent_at,
+                "b_reset": reset, "b_delta": delta,
+            })
+    return params
+
+
+_RECORD_MESSAGES = (
+    update(MatchSummary.__table__)
+    .where(
+        MatchSummary.__table__.c.thread_id == bindparam("b_thread_id"),
+        MatchSummary.__table__.c.user_id == bindparam("b_user_id"),
+    )
+    .values(
+        last_message_text=bindparam("b_text"),
+        last_sender_id=bindparam("b_sender_id"),
+        last_message_at=bindparam("b_sent_at", type_=DateTime(timezone=True)),
+        last_activity_at=bindparam("b_sent_at", type_=DateTime(timezone=True)),
+        unread_count=case(
+            (bindparam("b_reset", type_=Boolean), bindparam("b_delta", type_=Integer)),
+            else_=MatchSummary.__table__.c.unread_count + bindparam("b_delta", type_=Integer)
+        ),
+    )
+)
+
+
+async def record_messages(session, messages):
+    """
+    Новые сообщения [(thread_id, sender_id, receiver_id, текст, время отправки)] в порядке отправки.
+    Выполняется в транзакции, сохраняющей сообщения; строки тредов уже созданы
+    (create_for_thread), коммит — за вызывающим
+    """
+    params = _summary_updates(messages)
+    if params:
+        await session.execute(_RECORD_MESSAGES, params)
+
+
+async def rename_counterpart(session, user_id: int, name: str):
+    """
+    Пользователь сменил имя: обновляет его в списках матчей собеседников.
+    Выполняется в транзакции, меняющей имя; коммит — за вызывающим
+    """
+    await session.execute(
+        update(MatchSummary)
+        .where(
+            MatchSummary.counterpart_id == user_id,
+            MatchSummary.counterpart_name.is_distinct_from(name)
+        )
+        .values(counterpart_name=name)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def mark_read(session, user_id: int, thread_id: str):
+    """
+    Пользователь открыл чат: сбрасывает его счётчик непрочитанных; коммит — за вызывающим
+    """
+    await session.execute(
+        update(MatchSummary)
+        .where(
+            MatchSummary.user_id == user_id,
+            MatchSummary.thread_id == thread_id,
+            MatchSummary.unread_count != 0
+        )
+        .values(unread_count=0)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def summary_page(session, user_id: int, after: tuple = None, direction: str = NEXT) -> Page:
+    """
+    Страница списка матчей пользователя, недавняя активность первой
+    """
+    stmt = select(MatchSummary).where(MatchSummary.user_id == user_id)
+    return await fetch_page(
+        session, stmt, [MatchSummary.last_activity_at, MatchSummary.match_id],
+        lambda row: (row.MatchSummary.last_activity_at, row.MatchSummary.match_id),
+        after, direction
+    )
+
+
+async def backfill() -> int:
+    """
+    Строит строки для всех матчей и обновляет имена и последние сообщения
+    """
+    async with engine.begin() as conn:
+        result = await conn.execute(_upsert(refresh=True))
+    logger.info(f"✅ match_summaries: записано {result.rowcount} строк")
+    return result.rowcount
+
+
+async def _main(args):
+    try:
+        await backfill()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Список матчей для чтения (match_summaries)")
+    parser.add_argument("command", choices=("backfill",))
+    asyncio.run(_main(parser.parse_args()))
@@ -1 +1,131 @@
-﻿pass
+# файл: app/services/matching.py
+
+import uuid
+from sqlalchemy import select, not_, exists, or_
+from sqlalchemy.dialects.postgresql import insert
+from app.models.user import User
+from app.models.match import Match
+from app.models.swipes import Swipe
+from app.models.blocked_users import BlockedUser
+from app.services.geo import bounding_box, longitude_ranges
+from app.services.match_summaries import create_for_thread
+
+
+def build_candidate_query(me: User, settings=None, columns=None, exclude_swiped: bool = True):
+    """
+    Строит запрос подходящих кандидатов для ленты свайпов (без LIMIT)
+
+    Args:
+        me: Текущий пользователь
+        settings: Настройки поиска (SearchSettings) или None для стандартных фильтров
+        columns: Что выбирать (по умолчанию вся модель User)
+        exclude_swiped: Исключать уже просмотренных в SQL; False, если фильтрация
+            идёт в памяти через app.services.seen_set
+    """
+    stmt = select(*(columns or [User])).where(User.id != me.id)
+
+    if exclude_swiped:
+        stmt = stmt.where(
+            not_(
+                exists().where(Swipe.swiper_id == me.id).where(Swipe.swiped_id == User.id)
+            )
+        )
+
+    stmt = (
+        stmt
+        # Исключаем пользователей, которые заблокировали текущего пользователя
+        .where(
+            not_(
+                exists().where(BlockedUser.blocker_id == User.id).where(BlockedUser.blocked_id == me.id)
+            )
+        )
+        # Исключаем пользователей, которых заблокировал текущий пользователь
+        .where(
+            not_(
+                exists().where(BlockedUser.blocker_id == me.id).where(BlockedUser.blocked_id == User.id)
+            )
+        )
+    )
+
+    # Если настроек нет, используем стандартные фильтры, иначе применяем пользовательские
+    if not settings:
+        # Спочатку визначаємо, хто може подобатися поточному користувачеві
+        if me.orientation == "гетеро":
+            # Гетеро людям подобається протилежна стать
+            if me.gender == "чоловік":
+                stmt = stmt.where(User.gender == "жінка")
+            elif me.gender == "жінка":
+                stmt = stmt.where(User.gender == "чоловік")
+        elif me.orientation == "гомо":
+            # Гомо людям подобається та ж стать
+            stmt = stmt.where(User.gender == me.gender)
+
+        # Тепер фільтруємо за орієнтацією потенційних партнерів:
+        # показуємо тільки тих, кому теоретично може сподобатися поточний користувач
+        if me.gender == "чоловік":
+            stmt = stmt.where(
+                (User.orientation == "бі") |
+                ((User.gender == "жінка") & (User.orientation == "гетеро")) |
+                ((User.gender == "чоловік") & (User.orientation == "гомо"))
+            )
+        elif me.gender == "жінка":
+            stmt = stmt.where(
+                (User.orientation == "бі") |
+                ((User.gender == "чоловік") & (User.orientation == "гетеро")) |
+                ((User.gender == "жінка") & (User.orientation == "гомо"))
+            )
+
+        # За замовчуванням показуємо людей у віковому діапазоні ±5 років
+        if me.age:
+            stmt = stmt.where(User.age >= max(18, me.age - 5))
+            stmt = stmt.where(User.age <= me.age + 5)
+    else:
+        # Фильтрация по возрасту
+        stmt = stmt.where(User.age >= settings.min_age)
+        stmt = stmt.where(User.age <= settings.max_age)
+
+        # Фильтрация по полу (если указан конкретный пол)
+        if settings.preferred_gender:
+            stmt = stmt.where(User.gender == settings.preferred_gender)
+
+        # Проверяем, нужно ли фильтровать по городу
+        if settings.city_filter and me.city:
+            stmt = stmt.where(User.city == me.city)
+
+        # Фильтрация по расстоянию (грубо, по квадрату); анкеты без координат не отсекаются
+        if settings.max_distance and me.latitude is not None and me.longitude is not None:
+            lat_min, lat_max, lon_min, lon_max = bounding_box(me.latitude, me.longitude, settings.max_distance)
+            # У 180-го меридиана квадрат захватывает долготы с другой стороны
+            in_lon = or_(*(User.longitude.between(low, high) for low, high in longitude_ranges(lon_min, lon_max)))
+            stmt = stmt.where(
+                User.latitude.is_(None) |
+                (User.latitude.between(lat_min, lat_max) & in_lon)
+            )
+
+    return stmt
+
+
+async def create_match(session, user_a: int, user_b: int):
+    """
+    Создаёт матч для пары пользователей, если его ещё нет
+
+    Пара хранится упорядоченной (user_1_id < user_2_id), а в БД есть
+    уникальный индекс по паре, поэтому из двух одновременных встречных
+    лайков строку вставляет только один.
+
+    Returns:
+        str: thread_id нового матча или None, если матч уже существует
+    """
+    user_1_id, user_2_id = sorted((user_a, user_b))
+    stmt = (
+        insert(Match)
+        .values(user_1_id=user_1_id, user_2_id=user_2_id, thread_id=str(uuid.uuid4()))
+        .on_conflict_do_nothing()
+        .returning(Match.thread_id)
+    )
+    thread_id = await session.scalar(stmt)
+    if thread_id:
+        # Строки списка матчей обеих сторон — в той же транзакции
+        await create_for_thread(session, thread_id)
+    await session.commit()
+    return thread_id
@@ -0,0 +1,157 @@
+# файл: app/services/message_buffer.py
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from app.config import MESSAGE_BUFFER_MAX, MESSAGE_FLUSH_INTERVAL
+from app.database import get_session
+from app.models.messages import Message
+from app.services.match_summaries import record_messages
+
+logger = logging.getLogger(__name__)
+
+# Ограничение на число строк в одном INSERT (лимит параметров asyncpg — 32767)
+INSERT_CHUNK_SIZE = 1000
+
+# Сколько раз сообщение возвращается в буфер после сбоя записи, прежде чем отбросить его
+MAX_FLUSH_ATTEMPTS = 5
+
+# Потолок буфера на время недоступности БД: сверх него отбрасываются самые старые сообщения
+PENDING_LIMIT = 20000
+
+
+class MessageBuffer:
+    """
+    Буфер отложенной записи сообщений чата.
+
+    Пересылка собеседнику не ждёт БД: сообщение складывается в память и
+    пишется пачкой вместе с обновлением списка матчей (match_summaries) в
+    одной транзакции — по размеру буфера, по таймеру и при остановке бота.
+    Время сообщения фиксируется при добавлении в буфер, а не при записи,
+    поэтому история упорядочена по времени отправки; id выдаются в порядке вставки.
+
+    Сообщение, которое БД отвергает (например, отправитель удалён), не
+    блокирует пачку: такая пачка переписывается по одному сообщению, а
+    отвергнутые сообщения отбрасываются. После сбоя всей записи (нет связи с
+    БД) сообщения возвращаются в буфер не более MAX_FLUSH_ATTEMPTS раз.
+    """
+
+    def __init__(self, max_size: int = MESSAGE_BUFFER_MAX, flush_interval: float = MESSAGE_FLUSH_INTERVAL,
+                 pending_limit: int = PENDING_LIMIT):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.pending_limit = pending_limit
+        # [(thread_id, sender_id, receiver_id, текст, время отправки)]
+        self._pending = []
+        # Число неудачных попыток для возвращённых сообщений — они всегда в начале буфера
+        self._attempts = []
+        self._lock = asyncio.Lock()
+        self._flush_task = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, thread_id: str, sender_id: int, receiver_id: int, message_text: str):
+        """
+        Добавляет сообщение в буфер
+        """
+        self._pending.append((thread_id, sender_id, receiver_id, message_text, datetime.now(timezone.utc)))
+
+        if len(self._pending) >= self.max_size and not (self._flush_task and not self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self.flush())
+
+    def has_pending(self, thread_id: str) -> bool:
+        return any(pending[0] == thread_id for pending in self._pending)
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные сообщения в БД. Возвращает число записанных строк
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, []
+            attempts, self._attempts = self._attempts, []
+
+            try:
+                async for session in get_session():
+                    written = []
+                    for start in range(0, len(batch), INSERT_CHUNK_SIZE):
+                        written += await self._insert_chunk(session, batch[start:start + INSERT_CHUNK_SIZE])
+                    await record_messages(session, written)
+                    await session.commit()
+            except Exception as e:
+                self._requeue(batch, attempts)
+                logger.error(f"Ошибка при записи {len(batch)} сообщений: {e}")
+                return 0
+
+            if len(written) < len(batch):
+                logger.warning(f"Отброшено {len(batch) - len(written)} сообщений, отвергнутых БД")
+            return len(written)
+
+    @staticmethod
+    def _insert_statement(messages):
+        return insert(Message).values([
+            {"thread_id": thread_id, "sender_id": sender_id, "message_text": message_text, "created_at": sent_at}
+            for thread_id, sender_id, _, message_text, sent_at in messages
+        ])
+
+    async def _insert_chunk(self, session, messages) -> list:
+        """
+        Вставляет пачку сообщений; если БД её отвергает, вставляет по одному.
+        Возвращает записанные сообщения в исходном порядке
+        """
+        try:
+            async with session.begin_nested():
+                await session.execute(self._insert_statement(messages))
+            return messages
+        except (IntegrityError, DataError):
+            pass
+
+        written = []
+        for message in messages:
+            try:
+                async with session.begin_nested():
+                    await session.execute(self._insert_statement([message]))
+                written.append(message)
+            except (IntegrityError, DataError) as e:
+                logger.debug(f"Сообщение треда {message[0]} от {message[1]} отвергнуто БД: {e}")
+        return written
+
+    def _requeue(self, batch: list, attempts: list):
+        """
+        Возвращает незаписанную пачку в начало буфера с учётом попыток и потолка буфера
+        """
+        attempts = [count + 1 for count in attempts] + [1] * (len(batch) - len(attempts))
+        kept = [(count, message) for count, message in zip(attempts, batch) if count < MAX_FLUSH_ATTEMPTS]
+        dropped = len(batch) - len(kept)
+
+        # Сообщения, добавленные во время записи, идут после возвращённых
+        self._pending[:0] = [message for _, message in kept]
+        self._attempts = [count for count, _ in kept]
+
+        overflow = len(self._pending) - self.pending_limit
+        if overflow > 0:
+            del self._pending[:overflow]
+            del self._attempts[:overflow]
+            dropped += overflow
+
+        if dropped:
+            logger.error(f"Отброшено {dropped} сообщений после повторных сбоев записи")
+
+    async def run_flush_loop(self):
+        """
+        Периодически сбрасывает буфер (запускается вместе с ботом)
+        """
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка при периодической записи сообщений: {e}")
+
+
+message_buffer = MessageBuffer()
@@ -0,0 +1,178 @@
+# файл: app/services/pagination.py
+"""
+Keyset-пагинация списков с курсором в callback_data.
+
+Страница выбирается условием по ключу сортировки (WHERE (created_at, id) < курсор
+... LIMIT n) вместо OFFSET, поэтому её стоимость не зависит от номера страницы.
+Курсор — ключ крайней строки страницы, упакованный в короткую непрозрачную строку;
+callback_data кнопки навигации: pg:<список>:<n|p>:<курсор> (до 64 байт).
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+from aiogram.types import InlineKeyboardButton
+from sqlalchemy import literal, tuple_
+
+PAGE_SIZE = 10
+
+NEXT = "n"
+PREV = "p"
+
+_CALLBACK_PREFIX = "pg"
+# Telegram ограничивает callback_data 64 байтами
+_CALLBACK_LIMIT = 64
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class Page(NamedTuple):
+    items: list
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def _pack(value):
+    # datetime -> целые микросекунды: короче ISO-строки в callback_data
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return {"t": (value - _EPOCH) // _MICROSECOND}
+    return value
+
+
+def _unpack(value):
+    if isinstance(value, dict) and "t" in value:
+        return _EPOCH + value["t"] * _MICROSECOND
+    return value
+
+
+def _restore(value, key):
+    # Колонки времени в моделях объявлены с поясом: asyncpg передаёт параметр как
+    # timestamptz, и время курсора без пояса было бы прочитано как локальное
+    if isinstance(value, datetime) and getattr(key.type, "timezone", False):
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def encode_cursor(values: tuple) -> str:
+    raw = json.dumps([_pack(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Ключ из курсора; ValueError, если курсор повреждён
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return tuple(_unpack(value) for value in json.loads(raw))
+    except Exception as e:
+        raise ValueError(f"Некорректный курсор страницы: {cursor!r}") from e
+
+
+def callback_data(list_key: str, direction: str, cursor: str) -> str:
+    data = f"{_CALLBACK_PREFIX}:{list_key}:{direction}:{cursor}"
+    if len(data.encode()) > _CALLBACK_LIMIT:
+        raise ValueError(f"callback_data длиннее {_CALLBACK_LIMIT} байт: {data}")
+    return data
+
+
+def parse_callback(data: str):
+    """
+    'pg:<список>:<n|p>:<курсор>' -> (список, направление, ключ)
+    """
+    _, list_key, direction, cursor = data.split(":", 3)
+    return list_key, direction, decode_cursor(cursor)
+
+
+def page_request(data: str) -> tuple:
+    """
+    (направление, ключ) для обработчика списка: из callback_data кнопки
+    навигации или (NEXT, None) — первая страница, если это не кнопка
+    навигации или курсор повреждён/подделан
+    """
+    if not data or not data.startswith(f"{_CALLBACK_PREFIX}:"):
+        return NEXT, None
+    try:
+        _, direction, after = parse_callback(data)
+    except ValueError:
+        return NEXT, None
+    if direction not in (NEXT, PREV):
+        return NEXT, None
+    return direction, after
+
+
+def _valid_key(after: tuple, keys: list) -> bool:
+    """
+    Ключ из курсора подходит к колонкам сортировки: то же число значений и их типы
+    """
+    if len(after) != len(keys):
+        return False
+    for value, key in zip(after, keys):
+        try:
+            expected = key.type.python_type
+        except NotImplementedError:
+            continue
+        if isinstance(value, bool) or not isinstance(value, expected):
+            return False
+    return True
+
+
+def is_page_callback(list_key: str):
+    """Фильтр для register_callback_query_handler"""
+    prefix = f"{_CALLBACK_PREFIX}:{list_key}:"
+    return lambda c: c.data is not None and c.data.startswith(prefix)
+
+
+def nav_buttons(list_key: str, page: Page, prev_text: str = "◀️", next_text: str = "▶️") -> list:
+    """
+    Кнопки «назад/вперёд» для страницы (пустой список, если страница единственная)
+    """
+    buttons = []
+    if page.prev_cursor:
+        buttons.append(InlineKeyboardButton(prev_text, callback_data=callback_data(list_key, PREV, page.prev_cursor)))
+    if page.next_cursor:
+        buttons.append(InlineKeyboardButton(next_text, callback_data=callback_data(list_key, NEXT, page.next_cursor)))
+    return buttons
+
+
+async def fetch_page(session, stmt, keys: list, key_of, after: tuple = None, direction: str = NEXT,
+                     limit: int = PAGE_SIZE) -> Page:
+    """
+    Страница stmt, отсортированного по keys по убыванию (новые первыми).
+
+    keys — колонки ключа сортировки (последняя должна быть уникальной, например id),
+    key_of(row) — значения ключа строки результата, after — ключ из курсора.
+    direction=NEXT — строки после курсора (старше), PREV — перед ним (новее).
+    """
+    if after is not None and not _valid_key(after, keys):
+        # Курсор не от этого списка — первая страница
+        after, direction = None, NEXT
+
+    if after is not None:
+        # Параметры с типами колонок ключа (курсор хранит время в UTC без пояса)
+        bound = tuple_(*(literal(_restore(value, key), key.type) for key, value in zip(keys, after)))
+        condition = tuple_(*keys) < bound if direction == NEXT else tuple_(*keys) > bound
+        stmt = stmt.where(condition)
+
+    # Назад идём по возрастанию от курсора и переворачиваем страницу
+    order = [key.desc() for key in keys] if direction == NEXT else [key.asc() for key in keys]
+    stmt = stmt.order_by(*order).limit(limit + 1)
+
+    rows = (await session.execute(stmt)).all()
+    more = len(rows) > limit
+    rows = list(rows[:limit])
+    if direction == PREV:
+        rows.reverse()
+
+    if not rows:
+        return Page([], None, None)
+
+    first, last = encode_cursor(key_of(rows[0])), encode_cursor(key_of(rows[-1]))
+    if direction == NEXT:
+        # Есть курсор — значит, до этой страницы уже что-то было
+        return Page(rows, last if more else None, first if after is not None else None)
+    return Page(rows, last, first if more else None)
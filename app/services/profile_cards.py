@@ -0,0 +1,120 @@
+# файл: app/services/profile_cards.py
+
+import logging
+import sys
+from collections import OrderedDict
+from aiogram import types
+from app.config import PROFILE_CARD_CACHE_MB
+from app.models.user import User
+from app.services.loaders import load_user, load_photos
+from app.services.single_flight import load_once
+
+logger = logging.getLogger(__name__)
+
+# Примерный размер пустой карточки и одного InputMediaPhoto в памяти
+_CARD_OVERHEAD = 600
+_MEDIA_OVERHEAD = 400
+
+
+class ProfileCard:
+    """
+    Готовая к отправке анкета: подпись, file_id фотографий и медиагруппа
+    """
+
+    __slots__ = ("user_id", "caption", "photo_ids", "media", "size")
+
+    def __init__(self, user_id: int, caption: str, photo_ids: tuple):
+        self.user_id = user_id
+        self.caption = caption
+        self.photo_ids = photo_ids
+        # Медиагруппа нужна только для анкет с несколькими фото
+        self.media = tuple(
+            types.InputMediaPhoto(media=file_id, caption=caption if i == 0 else None)
+            for i, file_id in enumerate(photo_ids)
+        ) if len(photo_ids) > 1 else ()
+        self.size = (
+            _CARD_OVERHEAD
+            + sys.getsizeof(caption)
+            + sum(sys.getsizeof(file_id) for file_id in photo_ids)
+            + _MEDIA_OVERHEAD * len(self.media)
+        )
+
+
+def render_caption(user: User) -> str:
+    """
+    Текст анкеты для ленты
+    """
+    return f"👤 {user.first_name}, {user.age}\n" \
+           f"🏙 {user.city}\n📝 {user.bio or '—'}"
+
+
+class ProfileCardCache:
+    """
+    LRU-кеш карточек анкет с ограничением по памяти.
+
+    Популярные анкеты показываются тысячи раз в день; из кеша они
+    отрисовываются без запросов к users и user_photos.
+    """
+
+    def __init__(self, max_bytes: int = PROFILE_CARD_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._cards = OrderedDict()
+        self._loading = {}
+        # Инвалидации во время загрузки: такую карточку нельзя класть в кеш
+        self._stale = set()
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    async def get(self, user_id: int):
+        """
+        Карточка анкеты или None, если пользователя нет
+        """
+        card = self._cards.get(user_id)
+        if card is not None:
+            self._cards.move_to_end(user_id)
+            return card
+
+        return await load_once(self._loading, user_id, lambda: self._load(user_id))
+
+    async def _load(self, user_id: int):
+        self._stale.discard(user_id)
+        try:
+            # Загрузки карточек из одного такта объединяются в два запроса
+            user = await load_user(user_id)
+            if not user:
+                return None
+            photo_ids, = await load_photos([user_id])
+
+            card = ProfileCard(user_id, render_caption(user), tuple(photo_ids))
+            if user_id not in self._stale:
+                self._put(card)
+            return card
+        finally:
+            self._stale.discard(user_id)
+
+    def _put(self, card: ProfileCard):
+        old = self._cards.pop(card.user_id, None)
+        if old is not None:
+            self.size -= old.size
+        self._cards[card.user_id] = card
+        self.size += card.size
+        while self.size > self.max_bytes and len(self._cards) > 1:
+            _, evicted = self._cards.popitem(last=False)
+            self.size -= evicted.size
+
+    def invalidate(self, user_id: int):
+        """
+        Удаляет карточку (анкета или фото изменились)
+        """
+        if not user_id:
+            return
+        if user_id in self._loading:
+            self._stale.add(user_id)
+        card = self._cards.pop(user_id, None)
+        if card is not None:
+            self.size -= card.size
+
+
+profile_cards = ProfileCardCache()
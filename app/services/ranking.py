@@ -0,0 +1,173 @@
+# файл: app/services/ranking.py
+
+import logging
+import time
+import numpy as np
+from app.config import FEED_RANKER
+from app.services.geo import haversine_km
+
+logger = logging.getLogger(__name__)
+
+# Масштабы признаков
+AGE_SCALE = 5.0             # разница в годах, при которой вклад падает в e раз
+DISTANCE_SCALE_KM = 25.0    # расстояние, при котором вклад падает вдвое
+RECENCY_SCALE = 3 * 86400   # секунды неактивности, при которых вклад падает в e раз
+MAX_PHOTOS = 5
+
+
+class Ranker:
+    """
+    Базовый ранжировщик ленты: получает строки колоночного индекса анкет и
+    возвращает массив оценок (чем больше, тем раньше кандидат в ленте)
+    """
+
+    name = "base"
+
+    def score(self, index, user_id: int, rows: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def rank(self, index, user_id: int, rows: np.ndarray) -> np.ndarray:
+        """
+        Строки, отсортированные по убыванию оценки
+        """
+        if len(rows) == 0:
+            return rows
+        scores = self.score(index, user_id, rows)
+        return rows[np.argsort(-scores, kind="stable")]
+
+
+class IdentityRanker(Ranker):
+    """Без ранжирования: порядок индекса (по id или по расстоянию)"""
+
+    name = "none"
+
+    def score(self, index, user_id: int, rows: np.ndarray) -> np.ndarray:
+        return np.zeros(len(rows))
+
+
+class WeightedRanker(Ranker):
+    """
+    Линейная комбинация признаков, посчитанная векторно по всем кандидатам:
+    близость по возрасту, расстояние, недавняя активность, заполненность
+    анкеты (фото и описание), совместимость по ответам анкеты и вероятность
+    взаимного лайка. Небольшой
+    случайный шум разносит показы между анкетами с близкими оценками, чтобы
+    одни и те же популярные профили не стояли первыми у всех.
+    """
+
+    name = "weighted"
+
+    def __init__(self, age: float = 1.0, distance: float = 1.5, recency: float = 1.0,
+                 completeness: float = 0.8, compatibility: float = 1.2, reciprocal: float = 2.0,
+                 premium: float = 0.3, exploration: float = 0.2):
+        self.weights = {
+            "age": age,
+            "distance": distance,
+            "recency": recency,
+            "completeness": completeness,
+            "compatibility": compatibility,
+            "reciprocal": reciprocal,
+            "premium": premium,
+            "exploration": exploration,
+        }
+
+    def features(self, index, user_id: int, rows: np.ndarray) -> dict:
+        """
+        Признаки кандидатов в диапазоне [0, 1]
+        """
+        me = index.row_of(user_id)
+        features = {}
+
+        my_age = int(index.age[me])
+        age = index.age[rows].astype(np.float32)
+        if my_age >= 0:
+            age_score = np.exp(-np.abs(age - my_age) / AGE_SCALE)
+            features["age"] = np.where(age >= 0, age_score, 0.5)
+        else:
+            features["age"] = np.full(len(rows), 0.5, dtype=np.float32)
+
+        lat, lon = float(index.latitude[me]), float(index.longitude[me])
+        if np.isnan(lat) or np.isnan(lon):
+            features["distance"] = np.full(len(rows), 0.5, dtype=np.float32)
+        else:
+            distances = haversine_km(lat, lon, index.latitude[rows], index.longitude[rows])
+            # Без координат — нейтральная оценка
+            features["distance"] = np.where(
+                np.isnan(distances), 0.5, DISTANCE_SCALE_KM / (DISTANCE_SCALE_KM + np.nan_to_num(distances))
+            )
+
+        # Без известной активности — нейтральная оценка
+        last_active = index.last_active[rows]
+        idle = np.maximum(time.time() - np.nan_to_num(last_active), 0.0)
+        features["recency"] = np.where(np.isnan(last_active), 0.5, np.exp(-idle / RECENCY_SCALE))
+
+        photos = np.minimum(index.photo_count[rows], MAX_PHOTOS) / MAX_PHOTOS
+        features["completeness"] = 0.7 * photos + 0.3 * index.has_bio[rows]
+
+        features["compatibility"] = self._compatibility(user_id, rows)
+        features["reciprocal"] = self._reciprocal(index, user_id, rows)
+        features["premium"] = index.is_premium[rows].astype(np.float32)
+        features["exploration"] = np.random.random(len(rows))
+        return features
+
+    def _compatibility(self, user_id: int, rows: np.ndarray) -> np.ndarray:
+        """
+        Совместимость по ответам анкеты; без ответов — нейтральная оценка
+        """
+        from app.services.answer_vectors import answer_index
+
+        return np.nan_to_num(answer_index.similarity(user_id, rows), nan=0.5)
+
+    def _reciprocal(self, index, user_id: int, rows: np.ndarray) -> np.ndarray:
+        """
+        Вероятность взаимного лайка: 1 для тех, кто уже лайкнул пользователя
+        """
+        from app.services.like_index import like_index
+
+        reciprocal = np.zeros(len(rows), dtype=np.float32)
+        likers = like_index.likers_of(user_id)
+        if likers:
+            liker_rows = [index.row_of(liker_id) for liker_id in likers]
+            liker_rows = np.fromiter((row for row in liker_rows if row is not None), dtype=np.int64)
+            reciprocal[np.isin(rows, liker_rows)] = 1.0
+        return reciprocal
+
+    def score(self, index, user_id: int, rows: np.ndarray) -> np.ndarray:
+        scores = np.zeros(len(rows), dtype=np.float64)
+        for name, value in self.features(index, user_id, rows).items():
+            weight = self.weights.get(name, 0.0)
+            if weight:
+                scores += weight * value
+        return scores
+
+
+RANKERS = {
+    IdentityRanker.name: IdentityRanker,
+    WeightedRanker.name: WeightedRanker,
+}
+
+_ranker = None
+
+
+def get_ranker() -> Ranker:
+    """
+    Текущий ранжировщик ленты (по умолчанию — из FEED_RANKER)
+    """
+    global _ranker
+    if _ranker is None:
+        ranker_class = RANKERS.get(FEED_RANKER)
+        if ranker_class is None:
+            logger.warning(f"⚠️ Неизвестный ранжировщик {FEED_RANKER}, используется {WeightedRanker.name}")
+            ranker_class = WeightedRanker
+        _ranker = ranker_class()
+    return _ranker
+
+
+def set_ranker(ranker: Ranker):
+    """
+    Подменяет ранжировщик ленты (например, для экспериментов)
+    """
+    global _ranker
+    _ranker = ranker
+    from app.services.candidate_queue import candidate_queue
+    candidate_queue.clear()
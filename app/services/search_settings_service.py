@@ -1,17 +1,27 @@
 # файл: app/services/search_settings_service.py
 
-from app.database import get_session
+from app.database import get_session, read_session
 from app.models.search_settings import SearchSettings
 from app.models.user import User
 from sqlalchemy import select, update
+from app.services.candidate_queue import candidate_queue
+from app.services.loaders import load_settings, forget
 
 async def get_user_search_settings(user_id: int) -> SearchSettings:
     """
     Получить настройки поиска для пользователя или создать новые, если их нет
     """
+    try:
+        # Пробуем найти существующие настройки (запросы из одного такта объединяются)
+        settings, = await load_settings([user_id])
+        if settings:
+            return settings
+    except Exception as e:
+        print(f"❌ Ошибка при получении настроек поиска: {e}")
+        return None
+
     async for session in get_session():
         try:
-            # Пробуем найти существующие настройки
             settings = await session.scalar(
                 select(SearchSettings).where(SearchSettings.user_id == user_id)
             )
@@ -71,12 +81,16 @@ async def update_search_settings(user_id=None, telegram_id=None, settings_data:
                         setattr(existing, key, value)
                         
                 await session.commit()
+                forget(user_id)
+                candidate_queue.invalidate(user_id)
                 return True
             else:
                 # Создаем новые настройки
                 settings = SearchSettings(user_id=user_id, **settings_data)
                 session.add(settings)
                 await session.commit()
+                forget(user_id)
+                candidate_queue.invalidate(user_id)
                 return True
                 
         except Exception as e:
@@ -88,7 +102,7 @@ async def get_search_settings_by_telegram_id(telegram_id: str) -> SearchSettings
     """
     Получить настройки поиска по Telegram ID
     """
-    async for session in get_session():
+    async for session in read_session():
         try:
             # Сначала получаем пользователя
             user = await session.scalar(
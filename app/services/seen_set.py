@@ -0,0 +1,202 @@
+# файл: app/services/seen_set.py
+
+import asyncio
+import logging
+from array import array
+import numpy as np
+from collections import OrderedDict
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from app.config import SEEN_SET_MAX_USERS, SEEN_SNAPSHOT_INTERVAL
+from app.database import get_session
+from app.models.swipes import Swipe
+from app.models.seen_snapshots import SeenSnapshot
+from app.services.single_flight import load_once
+
+logger = logging.getLogger(__name__)
+
+# Roaring bitmap, если установлен pyroaring, иначе обычное множество
+try:
+    from pyroaring import BitMap
+except ImportError:
+    BitMap = None
+    logger.warning("⚠️ pyroaring не установлен, множества просмотренных анкет хранятся в set()")
+
+_FORMAT_ROARING = b"R"
+_FORMAT_ARRAY = b"A"
+
+
+class SeenSet:
+    """
+    Множество id анкет, по которым пользователь уже сделал свайп
+    """
+
+    __slots__ = ("ids", "last_swipe_id", "dirty")
+
+    def __init__(self, ids=None, last_swipe_id: int = 0):
+        self.ids = BitMap(ids or []) if BitMap else set(ids or [])
+        self.last_swipe_id = last_swipe_id
+        self.dirty = False
+
+    def add(self, user_id: int, swipe_id: int = None):
+        if user_id not in self.ids:
+            self.ids.add(user_id)
+            self.dirty = True
+        if swipe_id and swipe_id > self.last_swipe_id:
+            self.last_swipe_id = swipe_id
+            self.dirty = True
+
+    def discard(self, user_id: int):
+        if user_id in self.ids:
+            self.ids.discard(user_id)
+            self.dirty = True
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def to_numpy(self) -> np.ndarray:
+        """Просмотренные id массивом (для векторной фильтрации)"""
+        if BitMap:
+            return np.frombuffer(self.ids.to_array(), dtype=np.uint32).astype(np.int64)
+        return np.fromiter(self.ids, dtype=np.int64, count=len(self.ids))
+
+    def to_bytes(self) -> bytes:
+        if BitMap:
+            return _FORMAT_ROARING + self.ids.serialize()
+        return _FORMAT_ARRAY + array("I", sorted(self.ids)).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, last_swipe_id: int = 0) -> "SeenSet":
+        kind, payload = data[:1], data[1:]
+        if kind == _FORMAT_ROARING:
+            if not BitMap:
+                raise ValueError("Снимок в формате roaring, но pyroaring не установлен")
+            ids = BitMap.deserialize(payload)
+        else:
+            ids = array("I")
+            ids.frombytes(payload)
+        return cls(ids, last_swipe_id)
+
+
+class SeenSetStore:
+    """
+    LRU-кеш множеств просмотренных анкет со снимками в seen_snapshots.
+
+    При первом обращении множество читается из снимка, а затем догружаются
+    только свайпы, сделанные после него.
+    """
+
+    def __init__(self, max_users: int = SEEN_SET_MAX_USERS):
+        self.max_users = max_users
+        self._sets = OrderedDict()
+        self._loading = {}
+
+    async def get(self, user_id: int) -> SeenSet:
+        seen = self._sets.get(user_id)
+        if seen is not None:
+            self._sets.move_to_end(user_id)
+            return seen
+
+        # Одна загрузка на пользователя, даже если запросов несколько
+        seen = await load_once(self._loading, user_id, lambda: self._load(user_id))
+
+        self._put(user_id, seen)
+        return seen
+
+    def _put(self, user_id: int, seen: SeenSet):
+        self._sets[user_id] = seen
+        self._sets.move_to_end(user_id)
+        while len(self._sets) > self.max_users:
+            evicted_id, evicted = self._sets.popitem(last=False)
+            if evicted.dirty:
+                asyncio.ensure_future(self._save(evicted_id, evicted))
+
+    def record(self, user_id: int, swiped_id: int, swipe_id: int = None):
+        """
+        Отмечает анкету как просмотренную (если множество уже загружено).
+        swipe_id передаёт буфер свайпов после записи — по нему сдвигается
+        last_swipe_id снимка
+        """
+        seen = self._sets.get(user_id)
+        if seen is not None:
+            seen.add(swiped_id, swipe_id)
+
+    def forget(self, user_id: int, swiped_id: int):
+        """
+        Снимает отметку о просмотре (свайп так и не записался в БД)
+        """
+        seen = self._sets.get(user_id)
+        if seen is not None:
+            seen.discard(swiped_id)
+
+    async def _load(self, user_id: int) -> SeenSet:
+        async for session in get_session():
+            snapshot = await session.get(SeenSnapshot, user_id)
+            if snapshot:
+                try:
+                    seen = SeenSet.from_bytes(snapshot.data, snapshot.last_swipe_id)
+                except Exception as e:
+                    logger.error(f"Снимок просмотренных анкет {user_id} повреждён: {e}")
+                    seen = SeenSet()
+            else:
+                seen = SeenSet()
+
+            result = await session.execute(
+                select(Swipe.id, Swipe.swiped_id)
+                .where(Swipe.swiper_id == user_id)
+                .where(Swipe.id > seen.last_swipe_id)
+            )
+            for swipe_id, swiped_id in result:
+                seen.add(swiped_id, swipe_id)
+
+            # Свайпы, которые ещё лежат в буфере записи
+            from app.services.swipe_buffer import swipe_buffer
+            for swiped_id in swipe_buffer.swiped_by(user_id):
+                seen.add(swiped_id)
+            return seen
+        return SeenSet()
+
+    async def _save(self, user_id: int, seen: SeenSet):
+        data = seen.to_bytes()
+        seen.dirty = False
+        try:
+            async for session in get_session():
+                stmt = insert(SeenSnapshot).values(
+                    user_id=user_id, data=data, last_swipe_id=seen.last_swipe_id
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[SeenSnapshot.user_id],
+                    set_={"data": stmt.excluded.data, "last_swipe_id": stmt.excluded.last_swipe_id, "updated_at": func.now()}
+                )
+                await session.execute(stmt)
+                await session.commit()
+        except Exception as e:
+            seen.dirty = True
+            logger.error(f"Ошибка при сохранении снимка просмотренных анкет {user_id}: {e}")
+
+    async def save_snapshots(self):
+        """
+        Сохраняет все изменённые множества в seen_snapshots
+        """
+        dirty = [(user_id, seen) for user_id, seen in self._sets.items() if seen.dirty]
+        for user_id, seen in dirty:
+            await self._save(user_id, seen)
+        if dirty:
+            logger.info(f"Сохранено {len(dirty)} снимков просмотренных анкет")
+
+    async def run_snapshot_loop(self, interval: int = SEEN_SNAPSHOT_INTERVAL):
+        """
+        Периодически сохраняет снимки (запускается вместе с ботом)
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.save_snapshots()
+            except Exception as e:
+                logger.error(f"Ошибка при периодическом сохранении снимков: {e}")
+
+
+seen_sets = SeenSetStore()
@@ -0,0 +1,34 @@
+# файл: app/services/single_flight.py
+
+import asyncio
+
+
+async def load_once(loading: dict, key, load):
+    """
+    Одна загрузка на ключ для кешей сервисов.
+
+    Первый вызвавший выполняет load() в своей задаче — get_session() отдаёт
+    ему сессию его апдейта (unit of work), и загрузка видит его незафиксированные
+    изменения. Остальные вызовы с тем же ключом ждут этот результат.
+    Пока загрузка идёт, key лежит в loading (по нему кеши отмечают инвалидации).
+    """
+    future = loading.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_event_loop().create_future()
+    loading[key] = future
+    try:
+        result = await load()
+    except BaseException as e:
+        if isinstance(e, asyncio.CancelledError):
+            e = RuntimeError(f"загрузка {key!r} отменена")
+        future.set_exception(e)
+        # Ждущих может не быть — иначе asyncio пишет "exception was never retrieved"
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        loading.pop(key, None)
@@ -5,6 +5,8 @@ import os
 from dotenv import load_dotenv
 from app.models.payments import Payment, PaymentType, PaymentStatus, TariffPlan
 from app.models.user import User
+from app.services.user_index import user_index
+from app.services.identity_cache import user_identities
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -131,6 +133,9 @@ async def confirm_payment(session_id: str, session: AsyncSession) -> bool:
                 user.is_premium = True
         
         await session.commit()
+        user_identities.invalidate_user(user_id)
+        if payment.type == "stripe" and payment.tariff in ["premium", "vip"]:
+            user_index.upsert(user_id, is_premium=True)
         return True
     
     return False
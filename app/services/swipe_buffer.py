@@ -0,0 +1,213 @@
+# файл: app/services/swipe_buffer.py
+
+import asyncio
+import logging
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.dialects.postgresql import insert
+from app.config import SWIPE_BUFFER_MAX, SWIPE_FLUSH_INTERVAL
+from app.database import get_session
+from app.models.swipes import Swipe
+from app.services.seen_set import seen_sets
+from app.services.like_index import like_index
+
+logger = logging.getLogger(__name__)
+
+# Ограничение на число строк в одном INSERT (лимит параметров asyncpg — 32767)
+INSERT_CHUNK_SIZE = 1000
+
+# Сколько раз свайп возвращается в буфер после сбоя записи, прежде чем отбросить его
+MAX_FLUSH_ATTEMPTS = 5
+
+# Потолок буфера на время недоступности БД: сверх него отбрасываются самые старые свайпы
+PENDING_LIMIT = 100000
+
+
+class SwipeBuffer:
+    """
+    Буфер отложенной записи свайпов.
+
+    Свайпы складываются в память (повторный свайп той же пары схлопывается)
+    и пишутся пачками через INSERT ... ON CONFLICT DO NOTHING — по размеру
+    буфера, по таймеру и при остановке бота.
+
+    Строка, которую БД отвергает (анкета удалена, подделанный id), не
+    блокирует пачку: такая пачка переписывается по одной строке, а
+    отвергнутые строки отбрасываются. После сбоя всей записи (нет связи с БД)
+    свайпы возвращаются в буфер не более MAX_FLUSH_ATTEMPTS раз.
+
+    Для отброшенного свайпа откатывается то, что handle_swipe уже отметил в
+    памяти: анкета снова попадает в ленту, а индекс лайков возвращается к БД.
+    """
+
+    def __init__(self, max_size: int = SWIPE_BUFFER_MAX, flush_interval: float = SWIPE_FLUSH_INTERVAL,
+                 pending_limit: int = PENDING_LIMIT):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.pending_limit = pending_limit
+        self._pending = {}
+        # (swiper_id, swiped_id) -> число неудачных попыток записи
+        self._attempts = {}
+        self._lock = asyncio.Lock()
+        self._flush_task = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, swiper_id: int, swiped_id: int, is_like: bool) -> bool:
+        """
+        Добавляет свайп в буфер. Возвращает False, если эта пара уже ожидает записи
+        """
+        key = (swiper_id, swiped_id)
+        if key in self._pending:
+            return False
+        self._pending[key] = is_like
+
+        if len(self._pending) >= self.max_size and not (self._flush_task and not self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self.flush())
+        return True
+
+    def get(self, swiper_id: int, swiped_id: int):
+        """
+        Незаписанный свайп пары: True/False (лайк/дизлайк) или None
+        """
+        return self._pending.get((swiper_id, swiped_id))
+
+    def swiped_by(self, swiper_id: int) -> list:
+        """
+        id анкет с незаписанными свайпами пользователя
+        """
+        return [swiped for (swiper, swiped) in self._pending if swiper == swiper_id]
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные свайпы в БД. Возвращает число отправленных строк
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            rows = [
+                {"swiper_id": swiper_id, "swiped_id": swiped_id, "is_like": is_like}
+                for (swiper_id, swiped_id), is_like in batch.items()
+            ]
+
+            try:
+                async for session in get_session():
+                    inserted, rejected = [], []
+                    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+                        chunk_inserted, chunk_rejected = await self._insert_chunk(
+                            session, rows[start:start + INSERT_CHUNK_SIZE]
+                        )
+                        inserted += chunk_inserted
+                        rejected += chunk_rejected
+                    await session.commit()
+            except Exception as e:
+                logger.error(f"Ошибка при записи {len(rows)} свайпов: {e}")
+                self._requeue(batch)
+                return 0
+
+            for key in batch:
+                self._attempts.pop(key, None)
+            # id записанных свайпов сдвигают last_swipe_id множеств просмотренных анкет
+            for swipe_id, swiper_id, swiped_id in inserted:
+                seen_sets.record(swiper_id, swiped_id, swipe_id)
+            if rejected:
+                logger.warning(f"Отброшено {len(rejected)} свайпов, отвергнутых БД: {rejected[:10]}")
+                self._drop({key: batch[key] for key in rejected})
+            return len(rows) - len(rejected)
+
+    @staticmethod
+    def _insert_statement(rows):
+        stmt = insert(Swipe).values(rows)
+        stmt = stmt.on_conflict_do_nothing(index_elements=["swiper_id", "swiped_id"])
+        return stmt.returning(Swipe.id, Swipe.swiper_id, Swipe.swiped_id)
+
+    async def _insert_chunk(self, session, rows) -> tuple:
+        """
+        Вставляет пачку строк; если БД её отвергает, вставляет строки по одной.
+        Возвращает (id, swiper_id, swiped_id) вставленных строк и ключи отвергнутых
+        """
+        try:
+            async with session.begin_nested():
+                result = await session.execute(self._insert_statement(rows))
+                return result.all(), []
+        except (IntegrityError, DataError):
+            pass
+
+        inserted, rejected = [], []
+        for row in rows:
+            try:
+                async with session.begin_nested():
+                    result = await session.execute(self._insert_statement([row]))
+                    inserted += result.all()
+            except (IntegrityError, DataError) as e:
+                rejected.append((row["swiper_id"], row["swiped_id"]))
+                logger.debug(f"Свайп {row} отвергнут БД: {e}")
+        return inserted, rejected
+
+    def _requeue(self, batch: dict):
+        """
+        Возвращает незаписанную пачку в начало буфера с учётом попыток и потолка буфера
+        """
+        requeued, dropped = {}, {}
+        for key, is_like in batch.items():
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts >= MAX_FLUSH_ATTEMPTS:
+                self._attempts.pop(key, None)
+                dropped[key] = is_like
+                continue
+            self._attempts[key] = attempts
+            requeued[key] = is_like
+
+        # Свайпы, добавленные во время записи, идут после возвращённых
+        for key, is_like in self._pending.items():
+            requeued.setdefault(key, is_like)
+        self._pending = requeued
+
+        overflow = len(self._pending) - self.pending_limit
+        if overflow > 0:
+            for key in list(self._pending)[:overflow]:
+                dropped[key] = self._pending.pop(key)
+                self._attempts.pop(key, None)
+
+        if dropped:
+            logger.error(f"Отброшено {len(dropped)} свайпов после повторных сбоев записи")
+            self._drop(dropped)
+
+    def _drop(self, dropped: dict):
+        """
+        Откатывает в памяти отброшенные свайпы {(swiper_id, swiped_id): is_like}
+        """
+        for (swiper_id, swiped_id), is_like in dropped.items():
+            if (swiper_id, swiped_id) in self._pending:
+                # Пару успели свайпнуть заново — новый свайп ещё будет записан
+                continue
+            seen_sets.forget(swiper_id, swiped_id)
+            if is_like:
+                like_index.forget_like(swiper_id, swiped_id)
+            else:
+                # Дизлайк снял из индекса встречный лайк, если он был — сверяемся с БД
+                asyncio.ensure_future(self._restore_like(swiped_id, swiper_id))
+
+    async def _restore_like(self, liker_id: int, liked_id: int):
+        if (liked_id, liker_id) in self._pending:
+            return
+        try:
+            await like_index.restore_like(liker_id, liked_id)
+        except Exception as e:
+            logger.error(f"Индекс лайков расходится с БД для пары {liker_id} -> {liked_id}: {e}")
+
+    async def run_flush_loop(self):
+        """
+        Периодически сбрасывает буфер (запускается вместе с ботом)
+        """
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка при периодической записи свайпов: {e}")
+
+
+swipe_buffer = SwipeBuffer()
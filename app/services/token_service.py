@@ -1,12 +1,14 @@
 # файл: app/services/token_service.py
 
-from app.database import get_session
+from app.database import get_session, read_session
 from app.models.user import User
 from app.models.payments import Payment
 from app.models.token_withdrawals import TokenWithdrawal
-from sqlalchemy import select, update, and_
+from sqlalchemy import select, update, and_, literal, union_all
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
+from app.services.identity_cache import user_identities
+from app.services.pagination import Page, PAGE_SIZE, NEXT, fetch_page
 import logging
 
 # Настройка логирования
@@ -47,6 +49,7 @@ async def update_user_balance(telegram_id: str, amount: int) -> bool:
             # Обновляем баланс
             user.token_balance += amount
             await session.commit()
+            user_identities.invalidate(telegram_id)
             return True
         except Exception as e:
             await session.rollback()
@@ -97,6 +100,8 @@ async def transfer_tokens(sender_telegram_id: str, receiver_telegram_id: str, am
             session.add(payment)
             
             await session.commit()
+            user_identities.invalidate(sender_telegram_id)
+            user_identities.invalidate(receiver_telegram_id)
             return True
         except Exception as e:
             await session.rollback()
@@ -131,6 +136,7 @@ async def request_withdrawal(telegram_id: str, amount: int) -> bool:
             user.token_balance -= amount
             
             await session.commit()
+            user_identities.invalidate(telegram_id)
             
             # Уведомляем администраторов о новой заявке
             from app.services.notification_service import notify_admins_about_withdrawal
@@ -193,6 +199,7 @@ async def reject_withdrawal(withdrawal_id: int) -> bool:
                 user.token_balance += withdrawal.token_amount
             
             await session.commit()
+            user_identities.invalidate_user(withdrawal.user_id)
             
             # Уведомляем пользователя об отклонении заявки
             from app.services.notification_service import notify_withdrawal_status
@@ -204,67 +211,67 @@ async def reject_withdrawal(withdrawal_id: int) -> bool:
             logger.error(f"Ошибка при отклонении вывода: {str(e)}")
             return False
 
-async def get_token_history(telegram_id: str, limit: int = 10) -> list:
+_OPERATION_TYPES = {"token_purchase": "purchase", "token_transfer": "transfer"}
+
+def _token_history_query(user_id: int):
     """
-    Получить историю операций с токенами для пользователя
+    Платежи и заявки на вывод одним UNION ALL: created_at, source, id, type, amount, status.
+    source различает таблицы, чтобы (created_at, source, id) был уникальным ключом страницы
     """
-    async for session in get_session():
+    payments = select(
+        Payment.created_at.label("created_at"),
+        literal(0).label("source"),
+        Payment.id.label("id"),
+        Payment.type.label("type"),
+        Payment.token_amount.label("amount"),
+        Payment.status.label("status"),
+    ).where(
+        Payment.user_id == user_id,
+        Payment.token_amount.isnot(None)  # Только операции с токенами
+    )
+    withdrawals = select(
+        TokenWithdrawal.created_at,
+        literal(1),
+        TokenWithdrawal.id,
+        literal("withdrawal"),
+        -TokenWithdrawal.token_amount,  # Отрицательное значение для вывода
+        TokenWithdrawal.status,
+    ).where(TokenWithdrawal.user_id == user_id)
+    return union_all(payments, withdrawals).subquery("token_history")
+
+async def get_token_history_page(telegram_id: str, after: tuple = None, direction: str = NEXT,
+                                 limit: int = PAGE_SIZE) -> Page:
+    """
+    Страница истории операций с токенами (новые первыми), items — как в get_token_history
+    """
+    user = await user_identities.get(telegram_id)
+    if not user:
+        return Page([], None, None)
+
+    async for session in read_session():
         try:
-            # Получаем ID пользователя
-            user = await session.scalar(
-                select(User).where(User.telegram_id == telegram_id)
+            history = _token_history_query(user.id)
+            page = await fetch_page(
+                session, select(history),
+                [history.c.created_at, history.c.source, history.c.id],
+                lambda row: (row.created_at, row.source, row.id),
+                after, direction, limit
             )
-            if not user:
-                return []
-                
-            # Получаем платежи пользователя (пополнения и переводы)
-            payments = await session.scalars(
-                select(Payment)
-                .where(Payment.user_id == user.id)
-                .where(Payment.token_amount.isnot(None))  # Фильтруем только операции с токенами
-                .order_by(Payment.timestamp.desc())
-                .limit(limit)
-            )
-            
-            # Получаем заявки на вывод
-            withdrawals = await session.scalars(
-                select(TokenWithdrawal)
-                .where(TokenWithdrawal.user_id == user.id)
-                .order_by(TokenWithdrawal.timestamp.desc())
-                .limit(limit)
-            )
-            
-            # Объединяем результаты
-            result = []
-            
-            for payment in payments:
-                operation_type = ""
-                if payment.type == "token_purchase":
-                    operation_type = "purchase"
-                elif payment.type == "token_transfer":
-                    operation_type = "transfer"
-                    
-                result.append({
-                    "type": operation_type,
-                    "amount": payment.token_amount,
-                    "timestamp": payment.timestamp,
-                    "status": payment.status
-                })
-                
-            for withdrawal in withdrawals:
-                result.append({
-                    "type": "withdrawal",
-                    "amount": -withdrawal.token_amount,  # Отрицательное значение для вывода
-                    "timestamp": withdrawal.timestamp,
-                    "status": withdrawal.status
-                })
-                
-            # Сортируем по времени
-            result.sort(key=lambda x: x["timestamp"], reverse=True)
-            
-            # Ограничиваем результат
-            return result[:limit]
-            
+            items = [{
+                "type": _OPERATION_TYPES.get(row.type, row.type if row.source else ""),
+                "amount": row.amount,
+                "timestamp": row.created_at,
+                "status": row.status
+            } for row in page.items]
+            return page._replace(items=items)
+
         except Exception as e:
             logger.error(f"Ошибка при получении истории токенов: {str(e)}")
-            return []
+            return Page([], None, None)
+
+async def get_token_history(telegram_id: str, limit: int = 10) -> list:
+    """
+    Получить историю операций с токенами для пользователя
+    """
+    page = await get_token_history_page(telegram_id, limit=limit)
+    return page.items
@@ -0,0 +1,286 @@
+# файл: app/services/user_index.py
+
+import logging
+import time
+import numpy as np
+from sqlalchemy import select, func
+from app.database import get_session
+from app.models.user import User
+from app.models.user_photos import UserPhoto
+from app.models.swipes import Swipe
+from app.services.geo import GeoGrid
+
+logger = logging.getLogger(__name__)
+
+# Поля users, которые хранятся в индексе
+INDEXED_FIELDS = ("age", "gender", "orientation", "city", "is_premium", "latitude", "longitude", "bio")
+
+
+class _Interner:
+    """Кодирует строковые значения (стать, орієнтація, місто) в целые коды; None -> 0"""
+
+    def __init__(self, *values):
+        self._codes = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value) -> int:
+        if value is None:
+            return 0
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._codes) + 1
+            self._codes[value] = code
+        return code
+
+    def lookup(self, value) -> int:
+        """Код значения без добавления нового (-1, если значение не встречалось)"""
+        if value is None:
+            return 0
+        return self._codes.get(value, -1)
+
+
+class UserIndex:
+    """
+    Колоночный in-process индекс анкет для векторизованного подбора кандидатов.
+
+    Атрибуты, по которым фильтруется лента, хранятся в массивах NumPy, а
+    правила совместимости из build_candidate_query вычисляются одной маской.
+
+    Индекс загружается в фоне, пока бот уже принимает апдейты: изменения за
+    время загрузки записываются в журнал и применяются поверх строк из БД.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.genders = _Interner("чоловік", "жінка", "інше")
+        self.orientations = _Interner("гетеро", "гомо", "бі", "інше")
+        self.cities = _Interner()
+        self.grid = GeoGrid()
+        self._rows = {}
+        self._size = 0
+        self._allocate(capacity)
+        self._journal = None
+        self.ready = False
+
+    def _allocate(self, capacity: int):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.age = np.full(capacity, -1, dtype=np.int16)
+        self.gender = np.zeros(capacity, dtype=np.int16)
+        self.orientation = np.zeros(capacity, dtype=np.int16)
+        self.city = np.zeros(capacity, dtype=np.int32)
+        self.latitude = np.full(capacity, np.nan, dtype=np.float64)
+        self.longitude = np.full(capacity, np.nan, dtype=np.float64)
+        # Время последнего свайпа; NaN — активность пока неизвестна
+        self.last_active = np.full(capacity, np.nan, dtype=np.float64)
+        self.is_premium = np.zeros(capacity, dtype=bool)
+        # Заполненность анкеты (для ранжирования ленты)
+        self.photo_count = np.zeros(capacity, dtype=np.int8)
+        self.has_bio = np.zeros(capacity, dtype=bool)
+        self.active = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        old = {name: getattr(self, name) for name in (
+            "ids", "age", "gender", "orientation", "city", "latitude",
+            "longitude", "last_active", "is_premium", "photo_count", "has_bio", "active"
+        )}
+        self._allocate(len(self.ids) * 2)
+        for name, column in old.items():
+            getattr(self, name)[:len(column)] = column
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._rows
+
+    def row_of(self, user_id: int):
+        return self._rows.get(user_id)
+
+    async def load(self):
+        """
+        Загружает все анкеты из users (после старта бота)
+        """
+        self._journal = []
+        try:
+            async for session in get_session():
+                columns = [User.id] + [getattr(User, field) for field in INDEXED_FIELDS]
+                result = await session.execute(select(*columns).order_by(User.id))
+                for row in result:
+                    data = row._mapping
+                    self._upsert(
+                        data["id"],
+                        last_active=np.nan,
+                        **{field: data[field] for field in INDEXED_FIELDS}
+                    )
+
+                # Активность — последний свайп (дата регистрации говорит только о возрасте аккаунта)
+                result = await session.execute(
+                    select(Swipe.swiper_id, func.max(Swipe.created_at)).group_by(Swipe.swiper_id)
+                )
+                for user_id, swiped_at in result:
+                    if user_id in self._rows and swiped_at is not None:
+                        self._upsert(user_id, last_active=swiped_at.timestamp())
+
+                result = await session.execute(
+                    select(UserPhoto.user_id, func.count()).group_by(UserPhoto.user_id)
+                )
+                for user_id, count in result:
+                    if user_id in self._rows:
+                        self._upsert(user_id, photo_count=count)
+        finally:
+            journal, self._journal = self._journal, None
+
+        for method, args, fields in journal:
+            method(*args, **fields)
+        self.ready = True
+        logger.info(f"Индекс анкет загружен: {len(self)} пользователей")
+
+    def upsert(self, user_id: int, last_active: float = None, **fields):
+        """
+        Добавляет анкету или обновляет переданные поля
+        """
+        if self._journal is not None:
+            self._journal.append((self._upsert, (user_id, last_active), fields))
+            return
+        self._upsert(user_id, last_active, **fields)
+
+    def _upsert(self, user_id: int, last_active: float = None, **fields):
+        row = self._rows.get(user_id)
+        is_new = row is None
+        if is_new:
+            if self._size == len(self.ids):
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._rows[user_id] = row
+            self.ids[row] = user_id
+            self.active[row] = True
+            self.last_active[row] = time.time() if last_active is None else last_active
+        elif last_active is not None:
+            self.last_active[row] = last_active
+
+        for field, value in fields.items():
+            if field == "age":
+                self.age[row] = value if value is not None else -1
+            elif field == "gender":
+                self.gender[row] = self.genders.code(value)
+            elif field == "orientation":
+                self.orientation[row] = self.orientations.code(value)
+            elif field == "city":
+                self.city[row] = self.cities.code(value)
+            elif field == "is_premium":
+                self.is_premium[row] = bool(value)
+            elif field in ("latitude", "longitude"):
+                getattr(self, field)[row] = value if value is not None else np.nan
+            elif field == "bio":
+                self.has_bio[row] = bool(value and value.strip())
+            elif field == "photo_count":
+                self.photo_count[row] = min(value or 0, 127)
+
+        if is_new or "latitude" in fields or "longitude" in fields:
+            self.grid.place(row, float(self.latitude[row]), float(self.longitude[row]))
+
+    def remove(self, user_id: int):
+        if self._journal is not None:
+            self._journal.append((self.remove, (user_id,), {}))
+            return
+        row = self._rows.get(user_id)
+        if row is not None:
+            self.active[row] = False
+            self.grid.remove(row)
+
+    def touch(self, user_id: int):
+        """Отмечает активность пользователя"""
+        if self._journal is not None:
+            self._journal.append((self.touch, (user_id,), {}))
+            return
+        row = self._rows.get(user_id)
+        if row is not None:
+            self.last_active[row] = time.time()
+
+    def candidate_mask(self, user_id: int, settings=None, rows=None):
+        """
+        Маска подходящих кандидатов (те же правила, что и в build_candidate_query,
+        кроме свайпов и блокировок)
+
+        Args:
+            user_id: ID пользователя, для которого строится лента
+            settings: Настройки поиска или None для стандартных фильтров
+            rows: Проверяемые строки индекса (по умолчанию все)
+        """
+        if rows is None:
+            rows = slice(0, self._size)
+        me = self._rows[user_id]
+        mask = self.active[rows] & (self.ids[rows] != user_id)
+
+        age = self.age[rows]
+        gender = self.gender[rows]
+        orientation = self.orientation[rows]
+        my_age = int(self.age[me])
+        my_gender = int(self.gender[me])
+        my_orientation = int(self.orientation[me])
+
+        if not settings:
+            male, female = self.genders.code("чоловік"), self.genders.code("жінка")
+            hetero, homo, bi = (self.orientations.code(value) for value in ("гетеро", "гомо", "бі"))
+
+            if my_orientation == hetero:
+                if my_gender == male:
+                    mask &= gender == female
+                elif my_gender == female:
+                    mask &= gender == male
+            elif my_orientation == homo:
+                # NULL = NULL в SQL не совпадает
+                mask &= (gender == my_gender) & (gender != 0)
+
+            if my_gender == male:
+                mask &= (orientation == bi) | ((gender == female) & (orientation == hetero)) | \
+                        ((gender == male) & (orientation == homo))
+            elif my_gender == female:
+                mask &= (orientation == bi) | ((gender == male) & (orientation == hetero)) | \
+                        ((gender == female) & (orientation == homo))
+
+            if my_age >= 0:
+                mask &= (age >= max(18, my_age - 5)) & (age <= my_age + 5)
+        else:
+            if settings.min_age is not None:
+                mask &= (age >= settings.min_age) & (age >= 0)
+            if settings.max_age is not None:
+                mask &= (age <= settings.max_age) & (age >= 0)
+
+            if settings.preferred_gender:
+                mask &= gender == self.genders.lookup(settings.preferred_gender)
+
+            my_city = int(self.city[me])
+            if settings.city_filter and my_city:
+                mask &= self.city[rows] == my_city
+
+        return mask
+
+    def candidate_rows(self, user_id: int, settings=None):
+        """
+        Строки индекса подходящих кандидатов.
+
+        Если у пользователя есть координаты и задан max_distance, проверяются
+        только строки из соседних ячеек геосетки, а кандидаты сортируются по
+        расстоянию; анкеты без координат идут в конце.
+        """
+        me = self._rows[user_id]
+        lat, lon = float(self.latitude[me]), float(self.longitude[me])
+        max_distance = getattr(settings, "max_distance", None) if settings else None
+
+        if not max_distance or np.isnan(lat) or np.isnan(lon):
+            return np.flatnonzero(self.candidate_mask(user_id, settings))
+
+        rows, distances = self.grid.rows_within(lat, lon, max_distance, self.latitude, self.longitude)
+        order = np.argsort(distances, kind="stable")
+        rows = np.concatenate([rows[order], np.fromiter(sorted(self.grid.unlocated), dtype=np.int64)])
+        return rows[self.candidate_mask(user_id, settings, rows)]
+
+    def candidate_ids(self, user_id: int, settings=None):
+        """
+        id подходящих кандидатов (в порядке candidate_rows)
+        """
+        return self.ids[self.candidate_rows(user_id, settings)]
+
+user_index = UserIndex()
@@ -4,8 +4,30 @@ from app.database import get_session
 from app.models.user import User
 from app.models.user_photos import UserPhoto
 from sqlalchemy import select, update, text
+from app.services.candidate_queue import on_profile_changed
+from app.services.user_index import user_index, INDEXED_FIELDS
+from app.services.profile_cards import profile_cards
+from app.services.loaders import load_photos, forget
+from app.services.identity_cache import user_identities
+from app.services.match_summaries import rename_counterpart
 import asyncio
 
+
+def _on_user_changed(user_id: int, telegram_id: str = None, **fields):
+    """
+    Анкета изменилась (после commit): обновляет индекс анкет переданными
+    полями и сбрасывает кеши пользователя — карточку, снимок, загрузчики
+    апдейта и закешированных кандидатов
+    """
+    indexed = {field: value for field, value in fields.items() if field in INDEXED_FIELDS}
+    if indexed:
+        user_index.upsert(user_id, **indexed)
+    profile_cards.invalidate(user_id)
+    user_identities.invalidate(telegram_id)
+    forget(user_id)
+    on_profile_changed(user_id)
+
+
 async def create_user_from_registration(data: dict, telegram_id: str):
     async for session in get_session():
         try:
@@ -49,6 +71,9 @@ async def create_user_from_registration(data: dict, telegram_id: str):
             # Выполняем запрос (INSERT или UPDATE)
             result = await session.execute(text(update_sql), params)
             user_id = result.scalar()
+            if existing_user_id:
+                # Имя в списках матчей собеседников — в той же транзакции
+                await rename_counterpart(session, user_id, params["first_name"])
             
             # Зберігаємо фото
             photos = data.get("photos", [])
@@ -60,6 +85,16 @@ async def create_user_from_registration(data: dict, telegram_id: str):
                 await session.execute(text(photo_sql), {"user_id": user_id, "file_id": file_id})
 
             await session.commit()
+            _on_user_changed(
+                user_id,
+                telegram_id,
+                age=params["age"],
+                gender=params["gender"],
+                orientation=params["orientation"],
+                city=params["city"],
+                bio=params["bio"],
+                photo_count=len(photos[:5])
+            )
             return user_id
         except Exception as e:
             await session.rollback()
@@ -94,8 +129,11 @@ async def create_or_get_user(telegram_id: str) -> User:
                     text(insert_sql), 
                     {"telegram_id": telegram_id, "first_name": "Anonymous"}
                 )
-                await session.commit()
                 user_row = result.fetchone()
+                await session.commit()
+                created = True
+            else:
+                created = False
             
             # Перетворюємо рядок з БД на об'єкт User
             if user_row:
@@ -103,6 +141,8 @@ async def create_or_get_user(telegram_id: str) -> User:
                 for key in User.__table__.columns.keys():
                     if key in user_row._mapping:
                         setattr(user, key, user_row._mapping[key])
+                if created or user.id not in user_index:
+                    _on_user_changed(user.id, telegram_id, **{field: getattr(user, field) for field in INDEXED_FIELDS})
                 return user
             
             return None
@@ -117,13 +157,16 @@ async def update_user_field(user_id: str, field: str, value: any) -> bool:
     """
     async for session in get_session():
         try:
+            changed_user_id = None
+
             # Особлива обробка для поля language
             if field == "language":
                 # Виконуємо безпосередній SQL запит
-                await session.execute(
-                    text("UPDATE dating_bot.users SET language = :lang WHERE telegram_id = :user_id"),
+                result = await session.execute(
+                    text("UPDATE dating_bot.users SET language = :lang WHERE telegram_id = :user_id RETURNING id"),
                     {"lang": value, "user_id": user_id}
                 )
+                changed_user_id = result.scalar()
             # Особлива обробка для полів gender та orientation
             elif field in ["gender", "orientation"]:
                 # Обробляємо, щоб зберігати тільки текстове значення
@@ -132,17 +175,29 @@ async def update_user_field(user_id: str, field: str, value: any) -> bool:
                     update(User)
                     .where(User.telegram_id == user_id)
                     .values(**{field: clean_value})
+                    .returning(User.id)
                 )
-                await session.execute(query)
+                result = await session.execute(query)
+                changed_user_id = result.scalar()
+                value = clean_value
             else:
                 query = (
                     update(User)
                     .where(User.telegram_id == user_id)
                     .values(**{field: value})
+                    .returning(User.id)
                 )
-                await session.execute(query)
+                result = await session.execute(query)
+                changed_user_id = result.scalar()
+                if field == "first_name" and changed_user_id:
+                    # Имя в списках матчей собеседников — в той же транзакции
+                    await rename_counterpart(session, changed_user_id, value)
             
             await session.commit()
+
+            # Анкета изменилась — закешированные кандидаты могут быть уже неподходящими
+            if changed_user_id:
+                _on_user_changed(changed_user_id, user_id, **{field: value})
             return True
         except Exception as e:
             print(f"Помилка при оновленні поля {field}: {e}")
@@ -151,21 +206,39 @@ async def update_user_field(user_id: str, field: str, value: any) -> bool:
         
     return False
 
-async def get_user_language(telegram_id: str) -> str:
+async def save_user_location(telegram_id: str, latitude: float, longitude: float) -> bool:
     """
-    Повертає мову користувача
+    Сохраняет геолокацию пользователя (из Telegram location share)
     """
     async for session in get_session():
         try:
             result = await session.execute(
-                text("SELECT language FROM dating_bot.users WHERE telegram_id = :telegram_id"),
-                {"telegram_id": telegram_id}
+                update(User)
+                .where(User.telegram_id == telegram_id)
+                .values(latitude=latitude, longitude=longitude)
+                .returning(User.id)
             )
-            language = result.scalar()
-            return language or "ua"  # За замовчуванням українська
+            user_id = result.scalar()
+            await session.commit()
+
+            if user_id:
+                _on_user_changed(user_id, telegram_id, latitude=latitude, longitude=longitude)
+            return user_id is not None
         except Exception as e:
-            print(f"❌ Помилка при отриманні мови користувача: {e}")
-            return "ua"  # За замовчуванням українська
+            await session.rollback()
+            print(f"❌ Ошибка при сохранении геолокации: {e}")
+            return False
+
+async def get_user_language(telegram_id: str) -> str:
+    """
+    Повертає мову користувача (зі снімка в кеші, без запиту до БД)
+    """
+    try:
+        identity = await user_identities.get(telegram_id)
+        return identity.language if identity else "ua"  # За замовчуванням українська
+    except Exception as e:
+        print(f"❌ Помилка при отриманні мови користувача: {e}")
+        return "ua"  # За замовчуванням українська
 
 async def save_user_photos(telegram_id: str, photo_file_ids: list) -> bool:
     """
@@ -198,6 +271,7 @@ async def save_user_photos(telegram_id: str, photo_file_ids: list) -> bool:
                 await session.execute(text(insert_sql), {"user_id": user_id, "file_id": file_id})
                 
             await session.commit()
+            _on_user_changed(user_id, telegram_id, photo_count=len(photo_file_ids[:5]))
             return True
         except Exception as e:
             await session.rollback()
@@ -229,25 +303,11 @@ async def get_user_by_telegram_id(telegram_id: str) -> User:
 async def get_user_photos(user_id: int):
     """
     Получает список file_id фотографий пользователя по его ID
+    (запросы из одного такта объединяются в один)
     """
-    photo_file_ids = []
-    print(f"📸 Запрос фотографий для пользователя с ID {user_id}")
-    
-    async for session in get_session():
-        try:
-            # Используем более простой запрос без сортировки по uploaded_at
-            sql = """
-            SELECT file_id FROM dating_bot.user_photos 
-            WHERE user_id = :user_id
-            """
-            result = await session.execute(text(sql), {"user_id": user_id})
-            rows = result.fetchall()
-            
-            for row in rows:
-                photo_file_ids.append(row[0])
-            
-            print(f"📸 Найдено {len(photo_file_ids)} фотографий для пользователя с ID {user_id}: {photo_file_ids}")
-            return photo_file_ids
-        except Exception as e:
-            print(f"❌ Ошибка при получении фотографий пользователя: {e}")
-            return []
+    try:
+        photo_file_ids, = await load_photos([user_id])
+        return photo_file_ids
+    except Exception as e:
+        print(f"❌ Ошибка при получении фотографий пользователя: {e}")
+        return []
@@ -7,6 +7,7 @@ from sqlalchemy import select
 from app.database import get_session
 from app.models.payments import Payment, PaymentStatus
 from app.models.user import User
+from app.services.identity_cache import user_identities
 from app.config import STRIPE_WEBHOOK_SECRET
 
 router = APIRouter()
@@ -53,5 +54,6 @@ async def stripe_webhook(
                 elif payment.type == "stripe":
                     user.is_premium = True
                 await session.commit()
+                user_identities.invalidate(user.telegram_id)
 
     return {"status": "success"}
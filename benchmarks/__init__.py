@@ -0,0 +1,8 @@
+# файл: benchmarks/__init__.py
+"""
+Бенчмарки подбора анкет:
+
+- bench_ranking  — микробенчмарк ранжировщика ленты (без БД)
+- bench_answers  — поиск совместимых анкет: полный перебор против LSH (без БД)
+- run            — полный прогон на синтетической популяции в Postgres (COPY + замеры, JSON)
+"""
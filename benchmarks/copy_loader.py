@@ -0,0 +1,62 @@
+# файл: benchmarks/copy_loader.py
+"""
+Массовая загрузка синтетической популяции в Postgres через COPY (asyncpg)
+"""
+
+import time
+import asyncpg
+from benchmarks.population import USER_COLUMNS, PHOTO_COLUMNS, SWIPE_COLUMNS, BLOCK_COLUMNS
+
+SCHEMA = "dating_bot"
+
+# Таблицы, которые очищаются перед загрузкой (зависимые удаляются каскадно)
+BENCH_TABLES = ("users", "user_photos", "swipes", "blocked_users", "matches", "seen_snapshots")
+
+
+def asyncpg_dsn(url: str) -> str:
+    """postgresql+asyncpg://... (формат SQLAlchemy) -> postgresql://... (формат asyncpg)"""
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def _copy(conn, table: str, columns, chunks, on_progress=None) -> dict:
+    rows = 0
+    started = time.perf_counter()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        await conn.copy_records_to_table(table, records=chunk, columns=list(columns), schema_name=SCHEMA)
+        rows += len(chunk)
+        if on_progress:
+            on_progress(table, rows)
+    elapsed = time.perf_counter() - started
+    return {"rows": rows, "seconds": round(elapsed, 3), "rows_per_second": round(rows / elapsed) if elapsed else None}
+
+
+async def load_population(url: str, population, on_progress=None) -> dict:
+    """
+    Очищает таблицы бенчмарка и загружает в них популяцию.
+    Возвращает статистику загрузки по таблицам
+    """
+    conn = await asyncpg.connect(asyncpg_dsn(url))
+    try:
+        tables = ", ".join(f"{SCHEMA}.{table}" for table in BENCH_TABLES)
+        await conn.execute(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+
+        stats = {
+            "users": await _copy(conn, "users", USER_COLUMNS, population.user_rows(), on_progress),
+            "user_photos": await _copy(conn, "user_photos", PHOTO_COLUMNS, population.photo_rows(), on_progress),
+            "swipes": await _copy(conn, "swipes", SWIPE_COLUMNS, population.swipe_rows(), on_progress),
+            "blocked_users": await _copy(conn, "blocked_users", BLOCK_COLUMNS, population.block_rows(), on_progress),
+        }
+
+        # id пользователей заданы явно — сдвигаем последовательность
+        await conn.execute(
+            f"SELECT setval(pg_get_serial_sequence('{SCHEMA}.users', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {SCHEMA}.users))"
+        )
+        started = time.perf_counter()
+        await conn.execute(f"ANALYZE {SCHEMA}.users, {SCHEMA}.user_photos, {SCHEMA}.swipes, {SCHEMA}.blocked_users")
+        stats["analyze_seconds"] = round(time.perf_counter() - started, 3)
+        return stats
+    finally:
+        await conn.close()
@@ -0,0 +1,192 @@
+# файл: benchmarks/population.py
+"""
+Генератор синтетической популяции для бенчмарков: пользователи, фото,
+свайпы и блокировки с правдоподобными распределениями.
+
+Данные генерируются пачками и детерминированно (по seed и номеру пачки),
+поэтому даже 1M пользователей и десятки миллионов свайпов не держатся в
+памяти целиком.
+"""
+
+from datetime import datetime
+import numpy as np
+
+# Город, широта, долгота, относительный вес (крупные города — больше анкет)
+CITIES = [
+    ("Київ", 50.4501, 30.5234, 30), ("Харків", 49.9935, 36.2304, 12), ("Одеса", 46.4825, 30.7233, 10),
+    ("Дніпро", 48.4647, 35.0462, 9), ("Львів", 49.8397, 24.0297, 9), ("Запоріжжя", 47.8388, 35.1396, 6),
+    ("Вінниця", 49.2331, 28.4682, 4), ("Полтава", 49.5883, 34.5514, 3), ("Чернігів", 51.4982, 31.2893, 3),
+    ("Ужгород", 48.6208, 22.2879, 2), ("Берлін", 52.5200, 13.4050, 8), ("Франкфурт", 50.1109, 8.6821, 5),
+    ("Мюнхен", 48.1351, 11.5820, 4), ("Варшава", 52.2297, 21.0122, 6), ("Прага", 50.0755, 14.4378, 3),
+]
+GENDERS = [("чоловік", 0.49), ("жінка", 0.49), ("інше", 0.02)]
+ORIENTATIONS = [("гетеро", 0.85), ("гомо", 0.06), ("бі", 0.07), ("інше", 0.02)]
+LANGUAGES = [("ua", 0.6), ("ru", 0.2), ("en", 0.1), ("de", 0.1)]
+NAMES = ["Олена", "Андрій", "Марія", "Олександр", "Ірина", "Дмитро", "Анна", "Максим", "Софія", "Іван"]
+
+USER_COLUMNS = (
+    "id", "telegram_id", "first_name", "age", "gender", "orientation", "city", "bio",
+    "is_premium", "language", "latitude", "longitude", "created_at",
+)
+PHOTO_COLUMNS = ("user_id", "file_id")
+SWIPE_COLUMNS = ("swiper_id", "swiped_id", "is_like", "created_at")
+BLOCK_COLUMNS = ("blocker_id", "blocked_id", "reason")
+
+_TABLE_USERS, _TABLE_PHOTOS, _TABLE_SWIPES, _TABLE_BLOCKS = range(4)
+
+
+def _choice(rng, options, size):
+    values = np.array([value for value, _ in options], dtype=object)
+    weights = np.array([weight for _, weight in options], dtype=np.float64)
+    return values[rng.choice(len(values), size=size, p=weights / weights.sum())]
+
+
+class Population:
+    """
+    Описание синтетической популяции
+
+    Args:
+        users: Число пользователей (id 1..users)
+        swipes_per_user: Среднее число свайпов на пользователя (распределение с тяжёлым хвостом)
+        photos_per_user: Среднее число фото (0..5)
+        block_rate: Доля пользователей, заблокировавших кого-то
+        like_rate: Доля лайков среди свайпов
+        located_rate: Доля анкет с геолокацией
+        seed: Зерно генератора
+    """
+
+    def __init__(self, users: int, swipes_per_user: float = 20, photos_per_user: float = 2.5,
+                 block_rate: float = 0.01, like_rate: float = 0.35, located_rate: float = 0.7,
+                 seed: int = 42, now: datetime = None):
+        self.users = users
+        self.swipes_per_user = swipes_per_user
+        self.photos_per_user = photos_per_user
+        self.block_rate = block_rate
+        self.like_rate = like_rate
+        self.located_rate = located_rate
+        self.seed = seed
+        self.now = now or datetime.utcnow().replace(microsecond=0)
+        # Популярность: ранги анкет, перемешанные по id
+        self._popular = np.random.default_rng([seed, 99]).permutation(users) + 1
+
+    def _rng(self, table: int, chunk: int):
+        return np.random.default_rng([self.seed, table, chunk])
+
+    def _chunks(self, chunk_size: int):
+        for number, start in enumerate(range(1, self.users + 1, chunk_size)):
+            yield number, np.arange(start, min(start + chunk_size, self.users + 1), dtype=np.int64)
+
+    def _popular_targets(self, rng, size: int) -> np.ndarray:
+        """Цели свайпов: популярные анкеты получают непропорционально много"""
+        rank = np.minimum((self.users * rng.random(size) ** 2.5).astype(np.int64), self.users - 1)
+        return self._popular[rank]
+
+    def _days_ago(self, days: np.ndarray) -> list:
+        """Моменты времени (datetime) за days дней до now"""
+        seconds = (days * 86400).astype("timedelta64[s]")
+        return (np.datetime64(self.now, "s") - seconds).astype("datetime64[us]").tolist()
+
+    def describe(self) -> dict:
+        return {
+            "users": self.users,
+            "swipes_per_user": self.swipes_per_user,
+            "photos_per_user": self.photos_per_user,
+            "block_rate": self.block_rate,
+            "like_rate": self.like_rate,
+            "located_rate": self.located_rate,
+            "seed": self.seed,
+        }
+
+    def user_rows(self, chunk_size: int = 50000):
+        """Пачки строк users в порядке USER_COLUMNS"""
+        city_weights = np.array([weight for *_, weight in CITIES], dtype=np.float64)
+        city_weights /= city_weights.sum()
+
+        for number, ids in self._chunks(chunk_size):
+            rng = self._rng(_TABLE_USERS, number)
+            size = len(ids)
+
+            # Возраст: основная масса 20-35 с длинным хвостом до 70
+            age = np.clip(18 + rng.gamma(2.2, 5.5, size), 18, 70).astype(int)
+            city_index = rng.choice(len(CITIES), size=size, p=city_weights)
+            located = rng.random(size) < self.located_rate
+            lat = np.array([CITIES[i][1] for i in city_index]) + rng.normal(0, 0.08, size)
+            lon = np.array([CITIES[i][2] for i in city_index]) + rng.normal(0, 0.12, size)
+            has_bio = rng.random(size) < 0.6
+            premium = rng.random(size) < 0.04
+            created = rng.exponential(90, size)
+
+            columns = (
+                ids.tolist(),
+                [str(1_000_000_000 + user_id) for user_id in ids.tolist()],
+                [NAMES[i] for i in rng.integers(0, len(NAMES), size).tolist()],
+                age.tolist(),
+                _choice(rng, GENDERS, size).tolist(),
+                _choice(rng, ORIENTATIONS, size).tolist(),
+                [CITIES[i][0] for i in city_index.tolist()],
+                ["Люблю подорожі, каву та довгі прогулянки" if bio else None for bio in has_bio.tolist()],
+                premium.tolist(),
+                _choice(rng, LANGUAGES, size).tolist(),
+                [value if ok else None for value, ok in zip(lat.tolist(), located.tolist())],
+                [value if ok else None for value, ok in zip(lon.tolist(), located.tolist())],
+                self._days_ago(created),
+            )
+            yield list(zip(*columns))
+
+    def photo_rows(self, chunk_size: int = 50000):
+        """Пачки строк user_photos"""
+        for number, ids in self._chunks(chunk_size):
+            rng = self._rng(_TABLE_PHOTOS, number)
+            counts = np.minimum(rng.poisson(self.photos_per_user, len(ids)), 5)
+            owners = np.repeat(ids, counts)
+            yield [
+                (user_id, f"AgACAgIAAxk{user_id:09d}p{index}")
+                for user_id, index in zip(owners.tolist(), _positions(counts).tolist())
+            ]
+
+    def swipe_rows(self, chunk_size: int = 20000):
+        """Пачки строк swipes (без повторов пар и свайпов самому себе)"""
+        if self.users < 2:
+            return
+        for number, ids in self._chunks(chunk_size):
+            rng = self._rng(_TABLE_SWIPES, number)
+            # Активность пользователей сильно неравномерна (логнормальное распределение)
+            counts = rng.lognormal(np.log(max(self.swipes_per_user, 1)) - 0.5, 1.0, len(ids))
+            counts = np.minimum(counts.astype(np.int64), self.users - 1)
+            swipers = np.repeat(ids, counts)
+            targets = self._popular_targets(rng, len(swipers))
+
+            keys = np.unique(swipers * (self.users + 1) + targets)
+            swipers, targets = keys // (self.users + 1), keys % (self.users + 1)
+            valid = swipers != targets
+            swipers, targets = swipers[valid], targets[valid]
+
+            likes = rng.random(len(swipers)) < self.like_rate
+            ago = rng.exponential(30, len(swipers))
+            yield list(zip(swipers.tolist(), targets.tolist(), likes.tolist(), self._days_ago(ago)))
+
+    def block_rows(self, chunk_size: int = 50000):
+        """Пачки строк blocked_users"""
+        if self.users < 2:
+            return
+        for number, ids in self._chunks(chunk_size):
+            rng = self._rng(_TABLE_BLOCKS, number)
+            blockers = ids[rng.random(len(ids)) < self.block_rate]
+            counts = rng.integers(1, 4, len(blockers))
+            blockers = np.repeat(blockers, counts)
+            blocked = self._popular_targets(rng, len(blockers))
+
+            keys = np.unique(blockers * (self.users + 1) + blocked)
+            blockers, blocked = keys // (self.users + 1), keys % (self.users + 1)
+            valid = blockers != blocked
+            yield [
+                (blocker, target, "benchmark")
+                for blocker, target in zip(blockers[valid].tolist(), blocked[valid].tolist())
+            ]
+
+
+def _positions(counts: np.ndarray) -> np.ndarray:
+    """Номер элемента внутри каждой группы для np.repeat(..., counts)"""
+    total = int(counts.sum())
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(total) - starts
@@ -1,4 +1,4 @@
--- файл: migrations/add_blocked_users.sql
+-- файл: migrations/0001_add_blocked_users.sql
 
 -- Таблица для блокированных пользователей
 CREATE TABLE IF NOT EXISTS dating_bot.blocked_users (
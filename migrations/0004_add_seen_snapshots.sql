@@ -0,0 +1,9 @@
+-- файл: migrations/0004_add_seen_snapshots.sql
+
+-- Снимки множеств просмотренных анкет, чтобы после рестарта не перечитывать всю таблицу swipes
+CREATE TABLE IF NOT EXISTS dating_bot.seen_snapshots (
+    user_id INTEGER PRIMARY KEY REFERENCES dating_bot.users(id) ON DELETE CASCADE,
+    data BYTEA NOT NULL,
+    last_swipe_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
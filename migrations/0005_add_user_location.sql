@@ -0,0 +1,5 @@
+-- файл: migrations/0005_add_user_location.sql
+
+-- Геолокация пользователя (Telegram location share) для фильтра по расстоянию
+ALTER TABLE dating_bot.users ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE dating_bot.users ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
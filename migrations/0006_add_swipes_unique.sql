@@ -0,0 +1,16 @@
+-- файл: migrations/0006_add_swipes_unique.sql
+
+-- Удаляем дубликаты свайпов (двойные нажатия), оставляя самый ранний
+DELETE FROM dating_bot.swipes a
+USING dating_bot.swipes b
+WHERE a.swiper_id = b.swiper_id
+  AND a.swiped_id = b.swiped_id
+  AND a.id > b.id;
+
+-- Один свайп на пару пользователей: нужен для INSERT ... ON CONFLICT DO NOTHING
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_swiper_swiped') THEN
+        ALTER TABLE dating_bot.swipes ADD CONSTRAINT uq_swiper_swiped UNIQUE (swiper_id, swiped_id);
+    END IF;
+END $$;
@@ -0,0 +1,39 @@
+-- файл: migrations/0007_add_matches_pair_unique.sql
+
+-- Один матч на пару пользователей независимо от порядка user_1_id/user_2_id.
+-- Защищает от двойного матча при одновременных встречных лайках.
+
+-- Дубликаты пар (встречные лайки до этой миграции): оставляем матч с наименьшим id,
+-- остальные объединяем с ним
+CREATE TEMP TABLE match_duplicates ON COMMIT DROP AS
+SELECT m.id, m.thread_id, keep.keep_id
+FROM dating_bot.matches m
+JOIN (
+    SELECT LEAST(user_1_id, user_2_id) AS low_id, GREATEST(user_1_id, user_2_id) AS high_id, min(id) AS keep_id
+    FROM dating_bot.matches
+    GROUP BY 1, 2
+    HAVING count(*) > 1
+) keep ON LEAST(m.user_1_id, m.user_2_id) = keep.low_id
+      AND GREATEST(m.user_1_id, m.user_2_id) = keep.high_id
+WHERE m.id <> keep.keep_id;
+
+-- Оставляемому матчу без треда нужен свой тред, чтобы принять переписку дубликатов
+UPDATE dating_bot.matches m
+SET thread_id = gen_random_uuid()::text
+WHERE m.thread_id IS NULL
+  AND m.id IN (SELECT keep_id FROM match_duplicates WHERE thread_id IS NOT NULL);
+
+-- Переписка дубликатов переходит в тред оставляемого матча (messages.thread_id ссылается на matches.thread_id)
+UPDATE dating_bot.messages msg
+SET thread_id = keep.thread_id
+FROM match_duplicates d
+JOIN dating_bot.matches keep ON keep.id = d.keep_id
+WHERE msg.thread_id = d.thread_id;
+
+-- match_summaries появляется только в 0011 и заполняется заново (backfill),
+-- а её строки удаляются вместе с матчем (ON DELETE CASCADE)
+DELETE FROM dating_bot.matches
+WHERE id IN (SELECT id FROM match_duplicates);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_matches_pair
+    ON dating_bot.matches (LEAST(user_1_id, user_2_id), GREATEST(user_1_id, user_2_id));
@@ -0,0 +1,35 @@
+-- файл: migrations/0008_hot_query_indexes.sql
+-- migrate: no-transaction
+
+-- Индексы под горячие запросы. Строятся CONCURRENTLY, без блокировки записи,
+-- поэтому миграция выполняется вне транзакции, по одному оператору.
+-- Если построение прервалось, невалидный индекс удаляется раннером и строится заново.
+
+-- swipes(swiper_id, swiped_id) уже покрыт ограничением uq_swiper_swiped (0006)
+
+-- Входящие лайки: взаимность и загрузка индекса лайков
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_swipes_swiped_like
+    ON dating_bot.swipes (swiped_id, is_like);
+
+-- "Кто меня заблокировал" (обратный порядок к uq_blocker_blocked)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_blocked_users_blocked_blocker
+    ON dating_bot.blocked_users (blocked_id, blocker_id);
+
+-- История чата по треду в порядке времени
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_thread_created
+    ON dating_bot.messages (thread_id, created_at);
+
+-- Матчи пользователя (user_1_id = :id OR user_2_id = :id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_matches_user_1
+    ON dating_bot.matches (user_1_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_matches_user_2
+    ON dating_bot.matches (user_2_id);
+
+-- Подтверждение оплаты по Stripe session id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_payments_stripe_session
+    ON dating_bot.payments (stripe_session_id);
+
+-- Подбор кандидатов через SQL (пока колоночный индекс анкет не загружен)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_city_gender_orientation_age
+    ON dating_bot.users (city, gender, orientation, age);
@@ -0,0 +1,103 @@
+-- файл: migrations/0009_partition_messages.sql
+
+-- Сообщения чата секционируются по месяцам created_at. Старые секции
+-- выгружаются в архив и удаляются (app/message_partitions.py), поэтому в
+-- базе остаются только свежие месяцы и их индексы помещаются в память.
+--
+-- Существующая таблица переименовывается, строки переносятся в новую
+-- секционированную таблицу одной транзакцией (вместе с записью версии).
+--
+-- Простой: на время копирования таблица messages заблокирована (ACCESS
+-- EXCLUSIVE), запись и чтение чата ждут. Бот применяет миграции при старте,
+-- до начала опроса Telegram, поэтому простой — это задержка старта на время
+-- копирования (порядка минуты на несколько миллионов сообщений). Для большой
+-- таблицы миграцию лучше применить заранее, при остановленном боте:
+--     python -m app.migrations --target 9
+--
+-- thread_id:
+-- * NOT NULL, как в schema.sql: сообщение всегда пишется в тред матча.
+--   Строки без треда (возможны в базах, созданных по моделям) не читаются ни
+--   одним экраном и не переносятся — их число выводится в NOTICE;
+-- * без внешнего ключа на matches(thread_id), как в schema.sql. Ключ на
+--   секционированной таблице проверялся бы при каждой вставке, а тред
+--   сообщения и так берётся из matches (app/services/chat_threads.py).
+--   Внешний ключ старой таблицы (если база создана по моделям) удаляется
+--   вместе с ней.
+
+DO $$
+DECLARE
+    old_index TEXT;
+    orphaned BIGINT;
+    month_start DATE;
+    last_month DATE := date_trunc('month', CURRENT_DATE)::date + INTERVAL '2 months';
+BEGIN
+    -- Уже секционирована (повторный запуск на восстановленной базе)
+    IF EXISTS (
+        SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'dating_bot' AND c.relname = 'messages' AND c.relkind = 'p'
+    ) THEN
+        RETURN;
+    END IF;
+
+    IF to_regclass('dating_bot.messages') IS NOT NULL THEN
+        ALTER TABLE dating_bot.messages RENAME TO messages_unpartitioned;
+        -- Индексы старой таблицы (messages_pkey и др.) освобождают имена для новой
+        FOR old_index IN
+            SELECT indexname FROM pg_indexes
+            WHERE schemaname = 'dating_bot' AND tablename = 'messages_unpartitioned'
+        LOOP
+            EXECUTE format('ALTER INDEX dating_bot.%I RENAME TO %I', old_index, left(old_index, 50) || '_unpartitioned');
+        END LOOP;
+    END IF;
+
+    CREATE SEQUENCE IF NOT EXISTS dating_bot.messages_id_seq;
+
+    -- Уникальность в секционированной таблице возможна только вместе с ключом секционирования
+    CREATE TABLE dating_bot.messages (
+        id INTEGER NOT NULL DEFAULT nextval('dating_bot.messages_id_seq'),
+        thread_id TEXT NOT NULL,
+        sender_id INTEGER REFERENCES dating_bot.users(id) ON DELETE CASCADE,
+        message_text TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+
+    ALTER SEQUENCE dating_bot.messages_id_seq OWNED BY dating_bot.messages.id;
+
+    -- Чтение треда: последние сообщения первыми
+    CREATE INDEX idx_messages_thread_recent
+        ON dating_bot.messages (thread_id, created_at DESC, id DESC);
+
+    -- Строки вне созданных секций (часы сервера, ручные вставки) не теряются
+    CREATE TABLE dating_bot.messages_default PARTITION OF dating_bot.messages DEFAULT;
+
+    -- Секции от самого старого сообщения до двух месяцев вперёд
+    month_start := date_trunc('month', CURRENT_DATE)::date;
+    IF to_regclass('dating_bot.messages_unpartitioned') IS NOT NULL THEN
+        SELECT LEAST(COALESCE(date_trunc('month', MIN(created_at))::date, month_start), month_start)
+        INTO month_start FROM dating_bot.messages_unpartitioned;
+    END IF;
+
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE dating_bot.%I PARTITION OF dating_bot.messages FOR VALUES FROM (%L) TO (%L)',
+            'messages_' || to_char(month_start, 'YYYY_MM'), month_start, month_start + INTERVAL '1 month'
+        );
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+
+    IF to_regclass('dating_bot.messages_unpartitioned') IS NOT NULL THEN
+        INSERT INTO dating_bot.messages (id, thread_id, sender_id, message_text, created_at)
+        SELECT id, thread_id, sender_id, message_text, COALESCE(created_at, CURRENT_TIMESTAMP)
+        FROM dating_bot.messages_unpartitioned
+        WHERE thread_id IS NOT NULL;
+
+        SELECT count(*) INTO orphaned FROM dating_bot.messages_unpartitioned WHERE thread_id IS NULL;
+        IF orphaned > 0 THEN
+            RAISE NOTICE 'messages: % rows without thread_id were not copied', orphaned;
+        END IF;
+
+        PERFORM setval('dating_bot.messages_id_seq', COALESCE((SELECT MAX(id) FROM dating_bot.messages), 0) + 1, false);
+        DROP TABLE dating_bot.messages_unpartitioned;
+    END IF;
+END $$;
@@ -0,0 +1,16 @@
+-- файл: migrations/0010_pagination_indexes.sql
+-- migrate: no-transaction
+
+-- Индексы под keyset-пагинацию (app/services/pagination.py): страница
+-- читается по индексу от курсора, без сортировки всех строк пользователя.
+
+-- История токенов: платежи и заявки на вывод по (created_at, id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_payments_user_created
+    ON dating_bot.payments (user_id, created_at DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_token_withdrawals_user_created
+    ON dating_bot.token_withdrawals (user_id, created_at DESC, id DESC);
+
+-- Бронирования пользователя по id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservations_user_id
+    ON dating_bot.reservations (user_id, id DESC);
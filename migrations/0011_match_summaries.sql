@@ -0,0 +1,27 @@
+-- файл: migrations/0011_match_summaries.sql
+
+-- Список матчей для чтения: по строке на каждого участника матча с именем
+-- собеседника, последним сообщением и числом непрочитанных. Обновляется
+-- вместе с сохранением сообщения (app/services/match_summaries.py);
+-- существующие треды заполняет python -m app.services.match_summaries backfill.
+CREATE TABLE IF NOT EXISTS dating_bot.match_summaries (
+    user_id INTEGER NOT NULL REFERENCES dating_bot.users(id) ON DELETE CASCADE,
+    match_id INTEGER NOT NULL REFERENCES dating_bot.matches(id) ON DELETE CASCADE,
+    thread_id TEXT NOT NULL,
+    counterpart_id INTEGER NOT NULL REFERENCES dating_bot.users(id) ON DELETE CASCADE,
+    counterpart_name TEXT,
+    last_message_text TEXT,
+    last_sender_id INTEGER,
+    last_message_at TIMESTAMPTZ,
+    last_activity_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    unread_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, match_id)
+);
+
+-- Страница списка матчей: недавняя активность первой
+CREATE INDEX IF NOT EXISTS idx_match_summaries_user_activity
+    ON dating_bot.match_summaries (user_id, last_activity_at DESC, match_id DESC);
+
+-- Обновление обеих сторон при новом сообщении треда
+CREATE INDEX IF NOT EXISTS idx_match_summaries_thread
+    ON dating_bot.match_summaries (thread_id);
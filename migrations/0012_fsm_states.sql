@@ -0,0 +1,17 @@
+-- файл: migrations/0012_fsm_states.sql
+
+-- Состояния FSM aiogram (app/fsm_storage.py): переживают рестарт бота и
+-- общие для нескольких процессов
+CREATE TABLE IF NOT EXISTS dating_bot.fsm_states (
+    chat_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    state TEXT,
+    data JSONB NOT NULL DEFAULT '{}',
+    bucket JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (chat_id, user_id)
+);
+
+-- Удаление брошенных сценариев по FSM_STATE_TTL
+CREATE INDEX IF NOT EXISTS idx_fsm_states_updated_at
+    ON dating_bot.fsm_states (updated_at);
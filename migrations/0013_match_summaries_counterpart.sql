@@ -0,0 +1,8 @@
+-- файл: migrations/0013_match_summaries_counterpart.sql
+-- migrate: no-transaction
+
+-- Смена имени в анкете обновляет counterpart_name во всех списках матчей
+-- собеседников (rename_counterpart, app/services/match_summaries.py);
+-- индекс нужен и для ON DELETE CASCADE при удалении пользователя.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_match_summaries_counterpart
+    ON dating_bot.match_summaries (counterpart_id);
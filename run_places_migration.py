@@ -17,7 +17,7 @@ POSTGRES_URL = os.getenv("POSTGRES_URL")
 
 async def run_migration():
     # Чтение SQL скрипта
-    migration_path = os.path.join(os.path.dirname(__file__), 'migrations', 'update_places_reservations.sql')
+    migration_path = os.path.join(os.path.dirname(__file__), 'migrations', '0003_update_places_reservations.sql')
     with open(migration_path, 'r', encoding='utf-8') as f:
         migration_sql = f.read()
 
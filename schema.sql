@@ -18,6 +18,8 @@ CREATE TABLE IF NOT EXISTS dating_bot.users (
     is_premium BOOLEAN DEFAULT FALSE,
     is_admin BOOLEAN DEFAULT FALSE,
     language TEXT DEFAULT 'ua',
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -49,7 +51,8 @@ CREATE TABLE IF NOT EXISTS dating_bot.swipes (
     swiper_id INTEGER REFERENCES dating_bot.users(id) ON DELETE CASCADE,
     swiped_id INTEGER REFERENCES dating_bot.users(id) ON DELETE CASCADE,
     is_like BOOLEAN NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_swiper_swiped UNIQUE (swiper_id, swiped_id)
 );
 
 -- Метчі
@@ -61,6 +64,10 @@ CREATE TABLE IF NOT EXISTS dating_bot.matches (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Один метч на пару користувачів незалежно від порядку
+CREATE UNIQUE INDEX IF NOT EXISTS uq_matches_pair
+    ON dating_bot.matches (LEAST(user_1_id, user_2_id), GREATEST(user_1_id, user_2_id));
+
 -- Повідомлення в чаті
 CREATE TABLE IF NOT EXISTS dating_bot.messages (
     id SERIAL PRIMARY KEY,
@@ -155,6 +162,14 @@ CREATE TABLE IF NOT EXISTS dating_bot.search_settings (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Знімки переглянутих анкет (серіалізований bitmap id користувачів)
+CREATE TABLE IF NOT EXISTS dating_bot.seen_snapshots (
+    user_id INTEGER PRIMARY KEY REFERENCES dating_bot.users(id) ON DELETE CASCADE,
+    data BYTEA NOT NULL,
+    last_swipe_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 CREATE TABLE IF NOT EXISTS dating_bot.cinema_purchases (
     id SERIAL PRIMARY KEY,
     user_id INTEGER NOT NULL REFERENCES dating_bot.users(id) ON DELETE CASCADE,
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath('.'))
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, select
+from app.services.pagination import (
+    NEXT, PREV, callback_data, decode_cursor, encode_cursor, fetch_page, page_request, parse_callback, _valid_key
+)
+
+_items = Table(
+    "items", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("created_at", DateTime(timezone=True)),
+)
+KEYS = [_items.c.created_at, _items.c.id]
+
+_naive_items = Table(
+    "naive_items", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("created_at", DateTime),
+)
+
+
+class _Result:
+    def all(self):
+        return []
+
+
+class FakeSession:
+    """Запоминает параметры запроса страницы"""
+
+    def __init__(self):
+        self.params = {}
+
+    async def execute(self, stmt):
+        self.params = stmt.compile().params
+        return _Result()
+
+
+def _bound_time(table, after):
+    session = FakeSession()
+    keys = [table.c.created_at, table.c.id]
+    asyncio.run(fetch_page(session, select(table), keys, lambda row: (row.created_at, row.id), after))
+    return next(value for value in session.params.values() if isinstance(value, datetime))
+
+
+def test_cursor_round_trip():
+    moment = datetime(2026, 3, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor((moment, 42))) == (moment, 42)
+    assert decode_cursor(encode_cursor(("text", 7))) == ("text", 7)
+
+
+def test_aware_datetime_is_stored_as_utc():
+    aware = datetime(2026, 3, 1, 14, 0, tzinfo=timezone.utc)
+    restored, = decode_cursor(encode_cursor((aware,)))
+    assert restored == aware.replace(tzinfo=None)
+
+
+def test_callback_fits_telegram_limit():
+    data = callback_data("mt", NEXT, encode_cursor((datetime(2026, 3, 1, 12, 0), 2 ** 31 - 1)))
+    assert len(data.encode()) <= 64
+    list_key, direction, after = parse_callback(data)
+    assert (list_key, direction) == ("mt", NEXT)
+    assert after[1] == 2 ** 31 - 1
+
+
+def test_damaged_cursor_raises_value_error():
+    for cursor in ("", "%%%", encode_cursor((1,))[:-3] + "!"):
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            continue
+        raise AssertionError(f"курсор {cursor!r} принят")
+
+
+def test_page_request_falls_back_to_first_page():
+    assert page_request("reservation_my") == (NEXT, None)
+    assert page_request("pg:rs:n:not-a-cursor") == (NEXT, None)
+    assert page_request("pg:rs:x:" + encode_cursor((5,))) == (NEXT, None)
+    assert page_request("pg:rs:p:" + encode_cursor((5,))) == (PREV, (5,))
+
+
+def test_foreign_cursor_is_rejected_by_keys():
+    moment = datetime(2026, 3, 1, 12, 0)
+    assert _valid_key((moment, 5), KEYS)
+    assert not _valid_key((5,), KEYS)
+    assert not _valid_key(("5", 5), KEYS)
+    assert not _valid_key((moment, True), KEYS)
+
+
+def test_cursor_time_is_bound_as_utc_for_aware_keys():
+    aware = datetime(2026, 3, 1, 14, 0, tzinfo=timezone.utc)
+    after = decode_cursor(encode_cursor((aware, 5)))
+
+    # Колонка с поясом: время курсора — UTC, а не локальное время процесса
+    assert _bound_time(_items, after) == aware
+    assert _bound_time(_items, after).tzinfo is timezone.utc
+    # Колонка без пояса получает время как есть
+    assert _bound_time(_naive_items, after).tzinfo is None
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"{name}: ok")